@@ -1,7 +1,13 @@
+import hashlib
+import io
 import json
+import os
+import sqlite3
+import tarfile
 import tempfile
 import warnings
 from argparse import ArgumentParser, BooleanOptionalAction
+from concurrent.futures import ThreadPoolExecutor
 from functools import partial
 from multiprocessing import Pool
 from pathlib import Path
@@ -10,7 +16,7 @@ import geopandas as gpd
 import numpy as np
 import pandas as pd
 import shapely
-from imageio.v2 import imread, imwrite
+from imageio.v2 import imread
 from PIL import Image
 from rasterio import features
 from rasterio.features import shapes
@@ -44,6 +50,31 @@ IMAGE_RES_SUFFICIENT_SIZE = 250
 # How many chips to save out per tree
 N_CHIPS_PER_TREE = 10
 
+# Chip encoding configuration
+# Mapping from the file extension used for the chips to the corresponding Pillow format name
+CHIP_FORMATS = {"png": "PNG", "jpg": "JPEG", "webp": "WEBP"}
+CHIP_FORMAT = "png"
+# Encoder quality for the lossy formats (JPEG and WebP), ignored for PNG
+CHIP_QUALITY = 95
+# Number of threads per worker process used to encode and write chips. Pillow releases the GIL
+# while encoding, so this overlaps compression with cropping the next chip.
+N_ENCODE_THREADS = 4
+# When writing chips to tar archives, roll over to a new shard after this many chips
+CHIPS_PER_SHARD = 10000
+# Number of chips per batch when streaming chips in memory with iterate_chips
+CHIP_BATCH_SIZE = 128
+# Number of renders sent to a worker process at a time when extracting shapes. Images are always
+# chipped one at a time, since chunks are contiguous slices of the tasks, so chunking the tasks
+# sorted by cost would send the most expensive images to the same worker.
+CHUNKSIZE = 4
+# Seed for the random selection of chips per tree, so reruns select the same chips
+SEED = 0
+# Folder within the output folder where the completion index and shapes are kept when resuming
+CHIP_INDEX_FOLDER = ".chip-index"
+
+# State shared by all tasks in a worker process, set once per worker by init_chip_worker
+_WORKER_STATE = {}
+
 
 def extract_shapes_from_mask(
     mask_path: str,
@@ -97,35 +128,122 @@ def extract_shapes_from_mask(
     min_dim = np.minimum(width, height)
     shapes_gdf["min_dim"] = min_dim
 
-    # Save out
+    # Save out. Write to a temporary file first so an interrupted run never leaves a partial file
+    # that a resumed run would mistake for a complete one.
     Path(output_path).parent.mkdir(exist_ok=True, parents=True)
-    shapes_gdf.to_file(output_path)
+    partial_path = f"{output_path}.partial"
+    shapes_gdf.to_file(partial_path, driver="GPKG")
+    os.replace(partial_path, output_path)
 
 
-def save_chips(
+def encode_chip(
+    crop: np.ndarray, chip_format: str = CHIP_FORMAT, chip_quality: int = CHIP_QUALITY
+) -> bytes:
+    """
+    Encode a chip into the bytes of an image file.
+
+    Args:
+        crop (np.ndarray): The (H, W, C) chip to encode
+        chip_format (str, optional): File extension of the format to encode to, one of the keys of
+            CHIP_FORMATS. Defaults to CHIP_FORMAT.
+        chip_quality (int, optional): Quality for the lossy formats. Defaults to CHIP_QUALITY.
+
+    Returns:
+        bytes: The encoded image
+    """
+    # PNG is lossless, so the quality setting does not apply
+    save_kwargs = {} if chip_format == "png" else {"quality": chip_quality}
+
+    buffer = io.BytesIO()
+    Image.fromarray(crop).save(buffer, format=CHIP_FORMATS[chip_format], **save_kwargs)
+    return buffer.getvalue()
+
+
+def write_chip(
+    crop: np.ndarray,
+    output_path: Path,
+    chip_format: str = CHIP_FORMAT,
+    chip_quality: int = CHIP_QUALITY,
+) -> str:
+    """
+    Encode a chip and write it to disk. See `encode_chip` for the arguments.
+
+    Returns:
+        str: The SHA-256 checksum of the written file
+    """
+    data = encode_chip(crop, chip_format, chip_quality)
+    output_path.write_bytes(data)
+    return hashlib.sha256(data).hexdigest()
+
+
+def write_chip_shards(
+    chip_batches, output_folder: str, chips_per_shard: int = CHIPS_PER_SHARD
+) -> int:
+    """
+    Pack encoded chips into a sequence of tar shards, rather than writing one file per chip. Member
+    names follow the WebDataset convention of "<key>.<extension>", where the key is the relative
+    path of the chip without the extension.
+
+    Args:
+        chip_batches (iterable): Iterable of lists of (member name, encoded bytes) tuples
+        output_folder (str): Where to write the shards, which are named chips-000000.tar, ...
+        chips_per_shard (int, optional): Start a new shard after this many chips. Defaults to
+            CHIPS_PER_SHARD.
+
+    Returns:
+        int: The number of shards written
+    """
+    Path(output_folder).mkdir(exist_ok=True, parents=True)
+
+    n_shards = 0
+    n_chips_in_shard = 0
+    shard = None
+    try:
+        for chip_batch in chip_batches:
+            for name, data in chip_batch:
+                # Open a new shard if there is no current one or the current one is full
+                if shard is None or n_chips_in_shard >= chips_per_shard:
+                    if shard is not None:
+                        shard.close()
+                    shard = tarfile.open(
+                        Path(output_folder, f"chips-{n_shards:06d}.tar"), "w"
+                    )
+                    n_shards += 1
+                    n_chips_in_shard = 0
+
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                shard.addfile(info, io.BytesIO(data))
+                n_chips_in_shard += 1
+    finally:
+        if shard is not None:
+            shard.close()
+
+    return n_shards
+
+
+def generate_chips(
     image_path: str,
     shapes_path: str,
-    IDs_to_include: pd.Series,
-    output_folder: str,
+    IDs_to_include: np.ndarray,
     IDs_to_labels: dict,
     mask_background: bool = MASK_BACKGROUND,
     mask_buffer_pixels: int = MASK_BUFFER_PIXELS,
     background_value: tuple = BACKGROUND_VALUE,
 ):
     """
-    Use the vector representation of the rendered mask to chip and save one image per tree.
+    Use the vector representation of the rendered mask to chip one image per tree, yielding the
+    chips as they are cropped.
 
     image_path (str):
         Path to an RGB image, which will be chipped
     shapes_path (str):
         A path to a dataframe of shapes representing the rendered trees, containing the
         "polygon_area" and "IDs" attributes
-    IDs_to_include (pd.Series):
-        A series containing which IDs to produce renders for.
-    output_folder (str):
-        Where to write all chips.
+    IDs_to_include (array-like):
+        Which IDs to produce renders for.
     IDs_to_labels (dict):
-        Mapping from integer values in the mask image to the filenames used for the output chips
+        Mapping from integer values in the mask image to the tree IDs used to name the chips
     mask_background (bool, optional):
         Should the content outside of the geometry be set to a background value. Defaults to MASK_BACKGROUND.
     mask_buffer_pixels (int, optional):
@@ -135,6 +253,9 @@ def save_chips(
 
     Raises:
         ValueError: If values in the mask image are not included in the IDs_to_labels keys, meaning they cannot be remapped
+
+    Yields:
+        tuple: The (tree ID, (H, W, C) chip array) for each selected tree in the image
     """
     # Load the shapes
     shapes_gdf = gpd.read_file(shapes_path)
@@ -147,8 +268,8 @@ def save_chips(
 
     # load image
     img = Image.open(image_path)
-    # Convert to numpy array for masking
-    img_array = np.array(img) if mask_background else None
+    # Convert to numpy array for cropping and masking
+    img_array = np.array(img)
 
     # Store the area as an attribute for future use
     shapes_gdf["polygon_area"] = shapes_gdf.area
@@ -178,9 +299,6 @@ def save_chips(
         )
         raise ValueError(f"Not all values were remapped: {un_mapped_values}")
 
-    # Make the output folder
-    Path(output_folder).mkdir(exist_ok=True, parents=True)
-
     # Compute the crop locations
     minx = shapes_gdf.geometry.bounds.minx
     miny = shapes_gdf.geometry.bounds.miny
@@ -217,7 +335,7 @@ def save_chips(
             # Expand the mask
             shapes_gdf.geometry = shapes_gdf.buffer(mask_buffer_pixels)
 
-    # iterate over ids and save out each chip
+    # iterate over ids and yield each chip
     for _, row in shapes_gdf.iterrows():
 
         # extract crop
@@ -243,15 +361,170 @@ def save_chips(
             bg = np.array(background_value, dtype=crop.dtype)
             crop[mask] = bg
 
-        # Create the output path
-        output_path = Path(output_folder, f"{row.IDs}.png")
+        yield row.IDs, crop
+
+
+def init_chip_worker(IDs_to_labels: dict, chip_kwargs: dict):
+    """
+    Pool initializer which stores the state shared by every chipping task in the worker process.
+    This way the potentially large IDs_to_labels mapping is pickled once per worker rather than
+    once per image.
+
+    Args:
+        IDs_to_labels (dict): Mapping from mask IDs to tree IDs, see `generate_chips`
+        chip_kwargs (dict): Keyword arguments passed to `generate_chips` or `save_chips`
+    """
+    _WORKER_STATE["IDs_to_labels"] = IDs_to_labels
+    _WORKER_STATE["chip_kwargs"] = chip_kwargs
+
+
+def load_chips_task(task: tuple) -> list:
+    """
+    Chip one image and return all of its chips in memory. Must run in a worker initialized with
+    `init_chip_worker`.
+
+    Args:
+        task (tuple): The (image path, shapes path, IDs to include) for one image
+
+    Returns:
+        list: The (tree ID, chip array) tuples for the image
+    """
+    image_path, shapes_path, IDs_to_include = task
+    return list(
+        generate_chips(
+            image_path,
+            shapes_path,
+            IDs_to_include,
+            _WORKER_STATE["IDs_to_labels"],
+            **_WORKER_STATE["chip_kwargs"],
+        )
+    )
+
+
+def save_chips_task(task: tuple) -> list:
+    """
+    Chip and save one image. Must run in a worker initialized with `init_chip_worker`.
+
+    Args:
+        task (tuple): The (image path, shapes path, IDs to include, output folder) for one image
+
+    Returns:
+        list: See `save_chips`
+    """
+    image_path, shapes_path, IDs_to_include, output_folder = task
+    return save_chips(
+        image_path,
+        shapes_path,
+        IDs_to_include,
+        output_folder,
+        _WORKER_STATE["IDs_to_labels"],
+        **_WORKER_STATE["chip_kwargs"],
+    )
+
+
+def extract_shapes_task(task: tuple):
+    """
+    Single-argument wrapper around `extract_shapes_from_mask` for use with `Pool.imap_unordered`.
+
+    Args:
+        task (tuple): The (mask path, output path) for one render
+    """
+    extract_shapes_from_mask(*task)
+
+
+def sort_tasks_by_cost(tasks: list) -> list:
+    """
+    Order chipping tasks so the most expensive ones are started first, which keeps a few slow
+    images from running alone at the end. The expected cost is the size of the image file times
+    the number of chips to extract from it.
+
+    Args:
+        tasks (list): Tasks where the first element is the image path and the third is the IDs to
+            chip
+
+    Returns:
+        list: The tasks sorted by decreasing expected cost
+    """
+    costs = [os.path.getsize(task[0]) * len(task[2]) for task in tasks]
+    order = sorted(range(len(tasks)), key=lambda i: costs[i], reverse=True)
+    return [tasks[i] for i in order]
+
+
+def save_chips(
+    image_path: str,
+    shapes_path: str,
+    IDs_to_include: np.ndarray,
+    output_folder: str,
+    IDs_to_labels: dict,
+    mask_background: bool = MASK_BACKGROUND,
+    mask_buffer_pixels: int = MASK_BUFFER_PIXELS,
+    background_value: tuple = BACKGROUND_VALUE,
+    chip_format: str = CHIP_FORMAT,
+    chip_quality: int = CHIP_QUALITY,
+    n_encode_threads: int = N_ENCODE_THREADS,
+    archive: bool = False,
+):
+    """
+    Use the vector representation of the rendered mask to chip and save one image per tree. See
+    `generate_chips` for the arguments which control the chipping.
+
+    output_folder (str):
+        Where to write all chips. If archive is set, nothing is written and this is only used to
+        build the names of the returned chips.
+    chip_format (str, optional):
+        File extension of the format to save chips in, one of the keys of CHIP_FORMATS. Defaults to CHIP_FORMAT.
+    chip_quality (int, optional):
+        Encoder quality for the lossy formats. Defaults to CHIP_QUALITY.
+    n_encode_threads (int, optional):
+        How many threads to use to encode and write chips while the next chips are cropped. Defaults to N_ENCODE_THREADS.
+    archive (bool, optional):
+        Return the encoded chips instead of writing them out, so they can be packed into archive
+        shards by the caller. Defaults to False.
+
+    Returns:
+        list: If archive is set, a list of (output path, encoded bytes) tuples, otherwise a list of
+        (output path, SHA-256 checksum) tuples for the written chips.
+    """
+    chips = generate_chips(
+        image_path,
+        shapes_path,
+        IDs_to_include,
+        IDs_to_labels,
+        mask_background,
+        mask_buffer_pixels,
+        background_value,
+    )
 
-        # save cropped img
-        imwrite(output_path, crop)
+    # Make the output folder
+    if not archive:
+        Path(output_folder).mkdir(exist_ok=True, parents=True)
+
+    # Encoding and writing happens in a thread pool, so it overlaps with cropping the next chips
+    futures = []
+    with ThreadPoolExecutor(n_encode_threads) as encoder:
+        for tree_ID, crop in chips:
+            # Create the output path
+            output_path = Path(output_folder, f"{tree_ID}.{chip_format}")
+
+            if archive:
+                future = encoder.submit(encode_chip, crop, chip_format, chip_quality)
+            else:
+                # save cropped img
+                future = encoder.submit(
+                    write_chip, crop, output_path, chip_format, chip_quality
+                )
+            futures.append((output_path, future))
+
+    # Raise any errors that occured while encoding and collect the encoded chips or checksums
+    return [(str(output_path), f.result()) for output_path, f in futures]
 
 
 def subset_shapes(
-    shapes, n_chips_per_tree, image_res_min_size, image_res_sufficient_size
+    shapes,
+    n_chips_per_tree,
+    image_res_min_size,
+    image_res_sufficient_size,
+    random_state=None,
 ):
     """
     Subset a GeoDataFrame of tree shapes to at most n_chips_per_tree chips per tree ID,
@@ -266,6 +539,8 @@ def subset_shapes(
     image_res_sufficient_size (int):
         Chip size above which all chips are eligible for inclusion. The per-ID size
         threshold is never set higher than this value.
+    random_state (np.random.Generator, optional):
+        Random state used to sample the chips, for a reproducible selection. Defaults to None.
 
     Returns:
         gpd.GeoDataFrame: Filtered and sampled subset of the input shapes.
@@ -293,7 +568,10 @@ def subset_shapes(
     shapes = (
         shapes.groupby("IDs")
         .apply(
-            lambda x: x.sample(n=min(len(x), n_chips_per_tree)), include_groups=False
+            lambda x: x.sample(
+                n=min(len(x), n_chips_per_tree), random_state=random_state
+            ),
+            include_groups=False,
         )
         .reset_index(level=0)
         .reset_index(drop=True)
@@ -302,25 +580,229 @@ def subset_shapes(
     return shapes
 
 
-def process_folder(
+def open_chip_index(index_path) -> sqlite3.Connection:
+    """
+    Open the index used to resume an interrupted chipping run, creating it if needed. It stores the
+    parameters and result of the chip selection, and every chip which has been written along with
+    its checksum. Only the main process accesses the index.
+
+    Args:
+        index_path: Path to the SQLite database
+
+    Returns:
+        sqlite3.Connection: Connection to the index
+    """
+    Path(index_path).parent.mkdir(exist_ok=True, parents=True)
+    conn = sqlite3.connect(index_path)
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS params (name TEXT PRIMARY KEY, value TEXT);
+        CREATE TABLE IF NOT EXISTS selection (
+            render TEXT, mask_ID INTEGER, PRIMARY KEY (render, mask_ID)
+        );
+        CREATE TABLE IF NOT EXISTS chips (
+            image TEXT, tree_ID TEXT, path TEXT, sha256 TEXT, PRIMARY KEY (image, tree_ID)
+        );
+        """)
+    return conn
+
+
+def load_chip_selection(conn: sqlite3.Connection, selection_params: dict):
+    """
+    Load the chip selection stored by a previous run.
+
+    Args:
+        conn (sqlite3.Connection): Connection to the chip index
+        selection_params (dict): Parameters which determine the selection and the chips in this run
+
+    Raises:
+        ValueError: If the stored selection was made, or the chips written, with different
+            parameters
+
+    Returns:
+        dict | None: The selection in the format returned by `select_chips`, or None if no
+        selection has been stored yet.
+    """
+    stored_params = dict(conn.execute("SELECT name, value FROM params").fetchall())
+    if len(stored_params) == 0:
+        return None
+
+    selection_params = {k: json.dumps(v) for k, v in selection_params.items()}
+    if stored_params != selection_params:
+        raise ValueError(
+            f"The chip index was created with different parameters {stored_params}. "
+            "Remove it or use a different output folder to start over."
+        )
+
+    selection = pd.read_sql("SELECT render, mask_ID FROM selection", conn)
+    return {
+        Path(render): group["mask_ID"].to_numpy()
+        for render, group in selection.groupby("render")
+    }
+
+
+def save_chip_selection(
+    conn: sqlite3.Connection, selection_params: dict, IDs_by_render: dict
+):
+    """
+    Store the chip selection and the parameters it was made with, in a single transaction.
+
+    Args:
+        conn (sqlite3.Connection): Connection to the chip index
+        selection_params (dict): Parameters which determined the selection
+        IDs_by_render (dict): The selection in the format returned by `select_chips`
+    """
+    with conn:
+        conn.executemany(
+            "INSERT INTO selection (render, mask_ID) VALUES (?, ?)",
+            (
+                (str(render), int(mask_ID))
+                for render, mask_IDs in IDs_by_render.items()
+                for mask_ID in mask_IDs
+            ),
+        )
+        conn.executemany(
+            "INSERT INTO params (name, value) VALUES (?, ?)",
+            ((k, json.dumps(v)) for k, v in selection_params.items()),
+        )
+
+
+def record_chips(conn: sqlite3.Connection, output_dir, written_chips: list):
+    """
+    Mark chips as complete in the index.
+
+    Args:
+        conn (sqlite3.Connection): Connection to the chip index
+        output_dir: The folder the chips were written to
+        written_chips (list): The (output path, SHA-256 checksum) tuples returned by `save_chips`
+    """
+    records = []
+    for output_path, checksum in written_chips:
+        relative_path = Path(output_path).relative_to(output_dir)
+        records.append(
+            (
+                str(relative_path.parent),
+                relative_path.stem,
+                str(relative_path),
+                checksum,
+            )
+        )
+
+    with conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO chips (image, tree_ID, path, sha256) VALUES (?, ?, ?, ?)",
+            records,
+        )
+
+
+def verify_chip_index(conn: sqlite3.Connection, output_dir) -> int:
+    """
+    Check that every chip recorded in the index exists on disk with the recorded checksum, and
+    remove the entries which do not so they are written again.
+
+    Args:
+        conn (sqlite3.Connection): Connection to the chip index
+        output_dir: The folder the chips were written to
+
+    Returns:
+        int: The number of entries removed
+    """
+    invalid = []
+    for image, tree_ID, path, checksum in conn.execute(
+        "SELECT image, tree_ID, path, sha256 FROM chips"
+    ).fetchall():
+        chip_path = Path(output_dir, path)
+        if (
+            not chip_path.exists()
+            or hashlib.sha256(chip_path.read_bytes()).hexdigest() != checksum
+        ):
+            invalid.append((image, tree_ID))
+
+    with conn:
+        conn.executemany("DELETE FROM chips WHERE image = ? AND tree_ID = ?", invalid)
+
+    return len(invalid)
+
+
+def remove_completed_chips(
+    conn: sqlite3.Connection, IDs_by_render: dict, IDs_to_labels: dict
+) -> dict:
+    """
+    Remove the chips which the index records as complete from a chip selection.
+
+    Args:
+        conn (sqlite3.Connection): Connection to the chip index
+        IDs_by_render (dict): The selection in the format returned by `select_chips`
+        IDs_to_labels (dict): Mapping from mask IDs to tree IDs
+
+    Returns:
+        dict: The selection restricted to the chips which still need to be written
+    """
+    completed = set(conn.execute("SELECT image, tree_ID FROM chips").fetchall())
+
+    remaining = {}
+    for render, mask_IDs in IDs_by_render.items():
+        image = str(render.with_suffix(""))
+        mask_IDs = np.array(
+            [
+                mask_ID
+                for mask_ID in mask_IDs
+                if (image, str(IDs_to_labels[mask_ID])) not in completed
+            ]
+        )
+        if len(mask_IDs) > 0:
+            remaining[render] = mask_IDs
+
+    return remaining
+
+
+def read_IDs_to_labels(renders_folder) -> dict:
+    """
+    Read the mapping from the integer IDs in the rendered masks to the tree IDs.
+
+    Args:
+        renders_folder: Folder of rendered masks containing IDs_to_labels.json
+
+    Returns:
+        dict: Mapping from integer mask IDs to tree IDs
+    """
+    with open(Path(renders_folder, "IDs_to_labels.json"), "r") as file_h:
+        IDs_to_labels = json.load(file_h)
+        IDs_to_labels = {int(k): v for k, v in IDs_to_labels.items()}
+
+    return IDs_to_labels
+
+
+def select_chips(
     images_folder,
     renders_folder,
-    output_dir,
+    shapes_folder,
     images_ext=".JPG",
     renders_ext=".tif",
     n_workers=1,
     ensure_all_images_have_renders=False,
-    mask_background: bool = MASK_BACKGROUND,
-    mask_buffer_pixels: int = MASK_BUFFER_PIXELS,
-    background_value: tuple = BACKGROUND_VALUE,
     image_res_min_size: int = IMAGE_RES_MIN_SIZE,
     image_res_sufficient_size=IMAGE_RES_SUFFICIENT_SIZE,
     n_chips_per_tree=10,
+    chunksize: int = CHUNKSIZE,
+    seed: int = SEED,
+    skip_existing_shapes: bool = False,
 ) -> tuple:
     """
-    Chip every image in a folder based on a folder of mask images with a parellel structure, writing
-    out the results in a parellel structure as the inputs. For more information, inspect the docstring
-    of `chip_images`.
+    Extract the tree shapes from every render in a folder and determine which trees to chip from
+    each image. The selection is deterministic for a given seed.
+
+    Args:
+        images_folder: Folder of images to chip
+        renders_folder: Folder of rendered instance masks with a structure parallel to the images
+        shapes_folder: Where to write the vector representations of the masks. This must persist
+            until the chips have been generated, since they are read back by `generate_chips`.
+        skip_existing_shapes: Don't extract the shapes again for renders which already have a
+            shapes file in shapes_folder, such as when resuming an interrupted run.
+        For the remaining arguments, see `process_folder`.
+
+    Returns:
+        tuple: A dict mapping each render path, relative to renders_folder, to an array of the mask
+        IDs to chip from it, and the IDs_to_labels mapping from mask IDs to tree IDs.
     """
     images_folder = Path(images_folder)
     renders_folder = Path(renders_folder)
@@ -347,28 +829,38 @@ def process_folder(
                 f"{len(additional_images)} images do not have a corresponding renders. The first 10 are {list(additional_images)[:10]}"
             )
 
-    # Where the vector representation of the masks is stored
-    shapes_dir = tempfile.TemporaryDirectory()
-
-    # Create paths within the temp dir to store each file
+    # Create paths within the shapes folder to store each file
     output_files = [
-        Path(shapes_dir.name, f.relative_to(renders_folder)).with_suffix(".gpkg")
+        Path(shapes_folder, f.relative_to(renders_folder)).with_suffix(".gpkg")
         for f in render_files
     ]
 
+    if skip_existing_shapes:
+        extract_args = [
+            (render_file, output_file)
+            for render_file, output_file in zip(render_files, output_files)
+            if not output_file.exists()
+        ]
+        print(
+            f"Reusing shapes for {len(render_files) - len(extract_args)} of {len(render_files)} renders"
+        )
+    else:
+        extract_args = list(zip(render_files, output_files))
+
     # Extract all vector representations of trees across all images
     with Pool(n_workers) as p:
-        futures = [
-            p.apply_async(extract_shapes_from_mask, args)
-            for args in zip(render_files, output_files)
-        ]
-        for f in tqdm(futures, desc="Extracting shapes from masks"):
-            f.get()
+        for _ in tqdm(
+            p.imap_unordered(extract_shapes_task, extract_args, chunksize),
+            total=len(extract_args),
+            desc="Extracting shapes from masks",
+        ):
+            pass
 
     print("Determining a subset of chips to save")
-    # Read only the attributes required to perform subsetting, since the geometry is memory intensive
+    # Read only the attributes required to perform subsetting, since the geometry is memory intensive.
+    # The files are sorted so the random selection below is reproducible.
     all_dimensions = []
-    for f in Path(shapes_dir.name).rglob("*.gpkg"):
+    for f in sorted(Path(shapes_folder).rglob("*.gpkg")):
         gdf = gpd.read_file(f)
         if len(gdf) > 0:
             all_dimensions.append(gdf[["filename", "min_dim", "IDs"]])
@@ -387,6 +879,7 @@ def process_folder(
         raise ValueError("For the paired missions, there should be two unique folders")
 
     all_dimensions_subsetted = []
+    random_state = np.random.default_rng(seed)
     # Iterate over the folders corresponding to oblique and nadir
     for unique_folder in unique_folders:
         all_dimensions_subsetted.append(
@@ -395,55 +888,261 @@ def process_folder(
                 int(n_chips_per_tree / 2),
                 image_res_min_size,
                 image_res_sufficient_size,
+                random_state=random_state,
             )
         )
 
     all_dimensions = pd.concat(all_dimensions_subsetted)
 
-    # Group the dimensions by filename to process each image independently
-    dimensions_by_file = dict(tuple(all_dimensions.groupby("filename")))
+    # Group the dimensions by filename to process each image independently. The IDs are stored as
+    # arrays since they are cheaper to send to the workers than a series.
+    IDs_by_render = {}
+    for render_file, dimensions_subset in all_dimensions.groupby("filename"):
+        render_file = Path(render_file).relative_to(renders_folder)
+        IDs_by_render[render_file] = dimensions_subset["IDs"].to_numpy()
 
-    # Read IDs to labels
-    with open(Path(renders_folder, "IDs_to_labels.json"), "r") as file_h:
-        IDs_to_labels = json.load(file_h)
-        IDs_to_labels = {int(k): v for k, v in IDs_to_labels.items()}
+    return IDs_by_render, read_IDs_to_labels(renders_folder)
 
-    # Build args for parallel save_chips calls
-    # TODO consider a partial function
-    save_chips_args = [
-        (
-            str(
-                Path(
-                    images_folder,
-                    Path(render_file).relative_to(renders_folder),
-                ).with_suffix(images_ext)
-            ),
-            str(
-                Path(
-                    shapes_dir.name,
-                    Path(render_file).relative_to(renders_folder),
-                ).with_suffix(".gpkg")
-            ),
-            dimensions_subset["IDs"],
-            str(
-                Path(
-                    output_dir,
-                    Path(render_file).relative_to(renders_folder).with_suffix(""),
+
+def iterate_chips(
+    images_folder,
+    renders_folder,
+    images_ext=".JPG",
+    renders_ext=".tif",
+    n_workers=1,
+    ensure_all_images_have_renders=False,
+    mask_background: bool = MASK_BACKGROUND,
+    mask_buffer_pixels: int = MASK_BUFFER_PIXELS,
+    background_value: tuple = BACKGROUND_VALUE,
+    image_res_min_size: int = IMAGE_RES_MIN_SIZE,
+    image_res_sufficient_size=IMAGE_RES_SUFFICIENT_SIZE,
+    n_chips_per_tree=10,
+    batch_size: int = CHIP_BATCH_SIZE,
+    chunksize: int = CHUNKSIZE,
+    seed: int = SEED,
+):
+    """
+    Stream the chips selected by `process_folder` in memory rather than writing them to disk, so a
+    consumer such as a classifier can use them directly without re-reading and decoding files.
+    Images are chipped in parallel by n_workers processes. The arguments match `process_folder`.
+
+    Args:
+        batch_size (int, optional): How many chips to include in each yielded batch. The final
+            batch may be smaller. Defaults to CHIP_BATCH_SIZE.
+
+    Yields:
+        list: A batch of (tree ID, (H, W, C) chip array) tuples. Chips have varying sizes.
+    """
+    images_folder = Path(images_folder)
+
+    # The shapes must persist until all chips have been generated
+    with tempfile.TemporaryDirectory() as shapes_folder:
+        IDs_by_render, IDs_to_labels = select_chips(
+            images_folder,
+            renders_folder,
+            shapes_folder,
+            images_ext=images_ext,
+            renders_ext=renders_ext,
+            n_workers=n_workers,
+            ensure_all_images_have_renders=ensure_all_images_have_renders,
+            image_res_min_size=image_res_min_size,
+            image_res_sufficient_size=image_res_sufficient_size,
+            n_chips_per_tree=n_chips_per_tree,
+            chunksize=chunksize,
+            seed=seed,
+        )
+
+        # Only the per-image arguments are sent with each task, the rest is sent once per worker
+        tasks = sort_tasks_by_cost(
+            [
+                (
+                    str(Path(images_folder, render_file).with_suffix(images_ext)),
+                    str(Path(shapes_folder, render_file).with_suffix(".gpkg")),
+                    IDs_to_include,
                 )
-            ),
-            IDs_to_labels,
-            mask_background,
-            mask_buffer_pixels,
-            background_value,
+                for render_file, IDs_to_include in IDs_by_render.items()
+            ]
         )
-        for render_file, dimensions_subset in dimensions_by_file.items()
-    ]
+        chip_kwargs = {
+            "mask_background": mask_background,
+            "mask_buffer_pixels": mask_buffer_pixels,
+            "background_value": background_value,
+        }
+
+        batch = []
+        with Pool(
+            n_workers,
+            initializer=init_chip_worker,
+            initargs=(IDs_to_labels, chip_kwargs),
+        ) as p:
+            for image_chips in tqdm(
+                p.imap_unordered(load_chips_task, tasks, chunksize=1),
+                total=len(tasks),
+                desc="Generating chips",
+            ):
+                batch.extend(image_chips)
+                while len(batch) >= batch_size:
+                    yield batch[:batch_size]
+                    batch = batch[batch_size:]
+
+        if len(batch) > 0:
+            yield batch
 
-    # Save out the chips, parallelizing across files
-    with Pool(n_workers) as p:
-        futures = [p.apply_async(save_chips, args) for args in save_chips_args]
-        for f in tqdm(futures, desc="Saving out chips"):
-            f.get()
+
+def process_folder(
+    images_folder,
+    renders_folder,
+    output_dir,
+    images_ext=".JPG",
+    renders_ext=".tif",
+    n_workers=1,
+    ensure_all_images_have_renders=False,
+    mask_background: bool = MASK_BACKGROUND,
+    mask_buffer_pixels: int = MASK_BUFFER_PIXELS,
+    background_value: tuple = BACKGROUND_VALUE,
+    image_res_min_size: int = IMAGE_RES_MIN_SIZE,
+    image_res_sufficient_size=IMAGE_RES_SUFFICIENT_SIZE,
+    n_chips_per_tree=10,
+    chip_format: str = CHIP_FORMAT,
+    chip_quality: int = CHIP_QUALITY,
+    n_encode_threads: int = N_ENCODE_THREADS,
+    archive: bool = False,
+    chips_per_shard: int = CHIPS_PER_SHARD,
+    chunksize: int = CHUNKSIZE,
+    seed: int = SEED,
+    resume: bool = False,
+    verify_index: bool = False,
+) -> tuple:
+    """
+    Chip every image in a folder based on a folder of mask images with a parellel structure, writing
+    out the results in a parellel structure as the inputs. For more information, inspect the docstring
+    of `chip_images`.
+
+    If archive is set, the chips are instead packed into tar shards in output_dir, where the member
+    names follow the same parallel structure. See `write_chip_shards`. To use the chips without
+    writing them out, see `iterate_chips`.
+
+    If resume is set, the extracted shapes, the chip selection, and each written chip are recorded
+    in an index in output_dir, so a rerun after an interruption only processes the missing work.
+    The selection is made with a fixed seed, so it is the same across runs. If verify_index is also
+    set, chips in the index which are missing or do not match their checksum are written again.
+    """
+    images_folder = Path(images_folder)
+
+    if resume and archive:
+        raise ValueError(
+            "Resuming is only supported when writing chips as individual files"
+        )
+
+    # The parameters which determine the selection, and the content of each chip. Resuming with
+    # different chip parameters would otherwise mix chips of both kinds in the output.
+    selection_params = {
+        "renders_folder": str(renders_folder),
+        "images_ext": images_ext,
+        "renders_ext": renders_ext,
+        "image_res_min_size": image_res_min_size,
+        "image_res_sufficient_size": image_res_sufficient_size,
+        "n_chips_per_tree": n_chips_per_tree,
+        "seed": seed,
+        "mask_background": mask_background,
+        "mask_buffer_pixels": mask_buffer_pixels,
+        "background_value": background_value,
+        "chip_format": chip_format,
+        "chip_quality": chip_quality,
+    }
+
+    if resume:
+        # Keep the shapes with the index so they persist across runs
+        index_folder = Path(output_dir, CHIP_INDEX_FOLDER)
+        shapes_folder = Path(index_folder, "shapes")
+        chip_index = open_chip_index(Path(index_folder, "index.sqlite"))
+        IDs_by_render = load_chip_selection(chip_index, selection_params)
+    else:
+        # Where the vector representation of the masks is stored
+        shapes_dir = tempfile.TemporaryDirectory()
+        shapes_folder = shapes_dir.name
+        IDs_by_render = None
+
+    if IDs_by_render is None:
+        IDs_by_render, IDs_to_labels = select_chips(
+            images_folder,
+            renders_folder,
+            shapes_folder,
+            images_ext=images_ext,
+            renders_ext=renders_ext,
+            n_workers=n_workers,
+            ensure_all_images_have_renders=ensure_all_images_have_renders,
+            image_res_min_size=image_res_min_size,
+            image_res_sufficient_size=image_res_sufficient_size,
+            n_chips_per_tree=n_chips_per_tree,
+            chunksize=chunksize,
+            seed=seed,
+            skip_existing_shapes=resume,
+        )
+        if resume:
+            save_chip_selection(chip_index, selection_params, IDs_by_render)
+    else:
+        print("Using the chip selection from the index")
+        IDs_to_labels = read_IDs_to_labels(renders_folder)
+
+    if resume:
+        if verify_index:
+            n_invalid = verify_chip_index(chip_index, output_dir)
+            print(f"{n_invalid} chips in the index were missing or corrupt")
+
+        n_selected = sum(len(IDs) for IDs in IDs_by_render.values())
+        IDs_by_render = remove_completed_chips(chip_index, IDs_by_render, IDs_to_labels)
+        n_remaining = sum(len(IDs) for IDs in IDs_by_render.values())
+        print(f"{n_selected - n_remaining} of {n_selected} chips are already complete")
+
+    # Only the per-image arguments are sent with each task, the rest is sent once per worker
+    tasks = sort_tasks_by_cost(
+        [
+            (
+                str(Path(images_folder, render_file).with_suffix(images_ext)),
+                str(Path(shapes_folder, render_file).with_suffix(".gpkg")),
+                IDs_to_include,
+                str(Path(output_dir, render_file.with_suffix(""))),
+            )
+            for render_file, IDs_to_include in IDs_by_render.items()
+        ]
+    )
+    chip_kwargs = {
+        "mask_background": mask_background,
+        "mask_buffer_pixels": mask_buffer_pixels,
+        "background_value": background_value,
+        "chip_format": chip_format,
+        "chip_quality": chip_quality,
+        "n_encode_threads": n_encode_threads,
+        "archive": archive,
+    }
+
+    # Save out the chips, parallelizing across files. Results are consumed in completion order so
+    # progress is not held up by a slow image.
+    with Pool(
+        n_workers, initializer=init_chip_worker, initargs=(IDs_to_labels, chip_kwargs)
+    ) as p:
+        results = tqdm(
+            p.imap_unordered(save_chips_task, tasks, chunksize=1),
+            total=len(tasks),
+            desc="Saving out chips",
+        )
+        if not archive:
+            for written_chips in results:
+                if resume:
+                    record_chips(chip_index, output_dir, written_chips)
+        else:
+            # The workers return the encoded chips, which are packed into shards as they arrive.
+            # Make the member names relative to the output folder.
+            chip_batches = (
+                [
+                    (str(Path(name).relative_to(output_dir)), data)
+                    for name, data in result
+                ]
+                for result in results
+            )
+            n_shards = write_chip_shards(chip_batches, output_dir, chips_per_shard)
+            print(f"Wrote chips to {n_shards} shards in {output_dir}")
 
 
 def parse_args():
@@ -452,6 +1151,13 @@ def parse_args():
     parser.add_argument("renders_folder")
     parser.add_argument("output_folder")
     parser.add_argument("--n-workers", type=int, default=1)
+    parser.add_argument(
+        "--chunksize",
+        type=int,
+        default=CHUNKSIZE,
+        help="Number of renders sent to a worker at a time when extracting shapes "
+        "(default: %(default)s).",
+    )
     parser.add_argument("--ensure-all-images-have-renders", action="store_true")
     parser.add_argument(
         "--mask-background",
@@ -491,6 +1197,53 @@ def parse_args():
         default=N_CHIPS_PER_TREE,
         help="Save this many crops per tree",
     )
+    parser.add_argument(
+        "--chip-format",
+        default=CHIP_FORMAT,
+        choices=list(CHIP_FORMATS.keys()),
+        help="Image format to save chips in (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--chip-quality",
+        type=int,
+        default=CHIP_QUALITY,
+        help="Encoder quality for the lossy jpg and webp formats (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--n-encode-threads",
+        type=int,
+        default=N_ENCODE_THREADS,
+        help="Threads per worker used to encode and write chips (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--archive",
+        action="store_true",
+        help="Pack the chips into WebDataset-style tar shards instead of writing individual files.",
+    )
+    parser.add_argument(
+        "--chips-per-shard",
+        type=int,
+        default=CHIPS_PER_SHARD,
+        help="Number of chips per tar shard when --archive is set (default: %(default)s).",
+    )
+
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=SEED,
+        help="Seed for the random selection of chips per tree (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help=f"Record progress in an index in output_folder/{CHIP_INDEX_FOLDER} and skip work that "
+        "was completed by a previous run.",
+    )
+    parser.add_argument(
+        "--verify-index",
+        action="store_true",
+        help="With --resume, write chips again if they are missing or do not match their checksum.",
+    )
 
     args = parser.parse_args()
     return args
@@ -513,4 +1266,13 @@ if __name__ == "__main__":
         image_res_min_size=args.image_res_min_size,
         image_res_sufficient_size=args.image_res_sufficient_size,
         n_chips_per_tree=args.n_chips_per_tree,
+        chip_format=args.chip_format,
+        chip_quality=args.chip_quality,
+        n_encode_threads=args.n_encode_threads,
+        archive=args.archive,
+        chips_per_shard=args.chips_per_shard,
+        chunksize=args.chunksize,
+        seed=args.seed,
+        resume=args.resume,
+        verify_index=args.verify_index,
     )
@@ -0,0 +1,104 @@
+import json
+from argparse import ArgumentParser
+from pathlib import Path
+
+from chip_images import CHIP_BATCH_SIZE, iterate_chips
+
+
+def build_mmpretrain_predictor(config_path: str, model_path: str, device: str = "cpu"):
+    """
+    Create a function which predicts the class of a batch of chips with an MMPretrain model. This
+    mirrors the classify-chips step of the species prediction workflow, but runs on the CPU by
+    default and accepts chip arrays rather than files.
+
+    Args:
+        config_path (str): Path to the MMPretrain model config
+        model_path (str): Path to the model weights
+        device (str, optional): Which device to run inference on. Defaults to "cpu".
+
+    Returns:
+        Callable: Maps a list of (H, W, 3) RGB chip arrays to a list of predicted class names
+    """
+    # MMPretrain is only required for this reference consumer, not for chipping
+    from mmpretrain.apis import ImageClassificationInferencer
+
+    inferencer = ImageClassificationInferencer(
+        model=config_path, pretrained=model_path, device=device
+    )
+
+    def predict_batch(chips):
+        # Arrays are treated as already-loaded images, which MMPretrain expects in BGR order
+        results = inferencer([chip[..., ::-1] for chip in chips], batch_size=len(chips))
+        return [r["pred_class"] for r in results]
+
+    return predict_batch
+
+
+def classify_chip_batches(chip_batches, predict_batch) -> dict:
+    """
+    Run a classifier over streamed batches of chips, such as those produced by `iterate_chips`.
+
+    Args:
+        chip_batches (iterable): Iterable of lists of (tree ID, chip array) tuples
+        predict_batch (Callable): Maps a list of chip arrays to a list of predicted classes
+
+    Returns:
+        dict: Predicted class per chip. This matches the output of the classify-chips workflow
+        step, where each key is a path whose stem is the tree ID. Since the chips are never
+        written, the parent of each key is a running chip index rather than a real folder.
+    """
+    predictions = {}
+    n_chips = 0
+    for chip_batch in chip_batches:
+        tree_IDs, chips = zip(*chip_batch)
+        pred_labels = predict_batch(list(chips))
+
+        for tree_ID, pred_label in zip(tree_IDs, pred_labels):
+            predictions[str(Path(f"{n_chips:09d}", str(tree_ID)))] = pred_label
+            n_chips += 1
+
+    return predictions
+
+
+def parse_args():
+    parser = ArgumentParser(
+        description="Chip images and classify the chips in memory, without writing them to disk."
+    )
+    parser.add_argument("images_folder")
+    parser.add_argument("renders_folder")
+    parser.add_argument("output_path", help="Where to write the per-chip predictions")
+    parser.add_argument("--config-path", required=True, help="MMPretrain config")
+    parser.add_argument("--model-path", required=True, help="MMPretrain weights")
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--n-workers", type=int, default=1)
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=CHIP_BATCH_SIZE,
+        help="Number of chips per inference batch (default: %(default)s).",
+    )
+
+    args = parser.parse_args()
+    return args
+
+
+if __name__ == "__main__":
+    # Parse args
+    args = parse_args()
+
+    predict_batch = build_mmpretrain_predictor(
+        args.config_path, args.model_path, device=args.device
+    )
+    chip_batches = iterate_chips(
+        args.images_folder,
+        args.renders_folder,
+        n_workers=args.n_workers,
+        batch_size=args.batch_size,
+    )
+    predictions = classify_chip_batches(chip_batches, predict_batch)
+
+    # Write out results
+    output_path = Path(args.output_path)
+    output_path.parent.mkdir(exist_ok=True, parents=True)
+    with open(output_path, "w") as file_h:
+        json.dump(predictions, file_h)
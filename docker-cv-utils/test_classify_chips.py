@@ -0,0 +1,69 @@
+import json
+from pathlib import Path
+
+import numpy as np
+from chip_images import iterate_chips
+from classify_chips import classify_chip_batches
+from PIL import Image
+
+# Rectangle (row start, row end, column start, column end) of each tree in every image, and the
+# value of its pixels, which the dummy model maps back to the tree's class
+TREES = {
+    1: ((10, 90, 10, 90), 40),
+    2: ((10, 90, 110, 190), 120),
+    3: ((110, 190, 60, 140), 200),
+}
+IDS_TO_LABELS = {1: "tree_a", 2: "tree_b", 3: "tree_c"}
+CLASSES_BY_VALUE = {40: "pine", 120: "fir", 200: "oak"}
+
+
+def make_dataset(root: Path):
+    """Write two folders of images with parallel renders, like a paired oblique/nadir mission."""
+    for folder in ["nadir", "oblique"]:
+        for i in range(2):
+            image = np.zeros((200, 200, 3), dtype=np.uint8)
+            mask = np.zeros((200, 200), dtype=np.uint16)
+            for ID, ((r0, r1, c0, c1), value) in TREES.items():
+                image[r0:r1, c0:c1] = value
+                mask[r0:r1, c0:c1] = ID
+
+            Path(root, "images", folder).mkdir(parents=True, exist_ok=True)
+            Path(root, "renders", folder).mkdir(parents=True, exist_ok=True)
+            Image.fromarray(image).save(Path(root, "images", folder, f"{i}.png"))
+            Image.fromarray(mask).save(Path(root, "renders", folder, f"{i}.tif"))
+
+    with open(Path(root, "renders", "IDs_to_labels.json"), "w") as file_h:
+        json.dump(IDS_TO_LABELS, file_h)
+
+
+def predict_batch(chips):
+    """Dummy model, which predicts the class from the value at the center of each chip."""
+    return [
+        CLASSES_BY_VALUE[int(chip[chip.shape[0] // 2, chip.shape[1] // 2, 0])]
+        for chip in chips
+    ]
+
+
+def test_classify_streamed_chips(tmp_path):
+    make_dataset(tmp_path)
+    files_before = set(tmp_path.rglob("*"))
+
+    chip_batches = iterate_chips(
+        Path(tmp_path, "images"),
+        Path(tmp_path, "renders"),
+        images_ext=".png",
+        renders_ext=".tif",
+        batch_size=3,
+    )
+    predictions = classify_chip_batches(chip_batches, predict_batch)
+
+    # Every tree in each of the 4 images is chipped once
+    assert len(predictions) == 12
+    expected_classes = {
+        IDS_TO_LABELS[ID]: CLASSES_BY_VALUE[value] for ID, (_, value) in TREES.items()
+    }
+    for key, pred_class in predictions.items():
+        assert pred_class == expected_classes[Path(key).stem]
+
+    # The chips are only held in memory
+    assert set(tmp_path.rglob("*")) == files_before
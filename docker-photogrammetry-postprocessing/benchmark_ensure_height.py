@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Benchmark ensure_height_is_present against the previous, .loc-based implementation on
+synthetic field trees, and check that both give the same trees.
+
+Usage:
+    # 1M synthetic trees:
+    python benchmark_ensure_height.py --n-trees 1000000
+
+Requirements:
+    - geopandas, pandas, numpy
+"""
+
+import argparse
+import time
+
+import pandas as pd
+from postprocessing.preprocess import ensure_height_is_present
+from test_preprocess import ensure_height_is_present_loc, make_trees
+
+
+def time_best(func, repeats):
+    """Run func repeats times, returning the shortest time in seconds and the result."""
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark ensure_height_is_present on synthetic field trees"
+    )
+    parser.add_argument(
+        "--n-trees",
+        type=int,
+        default=1000000,
+        help="Number of synthetic trees (default: 1000000)",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the trees")
+    parser.add_argument(
+        "--repeats",
+        type=int,
+        default=3,
+        help="Number of runs of each implementation; the fastest is reported "
+        "(default: 3)",
+    )
+    args = parser.parse_args()
+
+    trees = make_trees(args.n_trees, args.seed)
+
+    # The previous implementation modifies its input, so it is given a copy each run
+    loc_time, expected = time_best(
+        lambda: ensure_height_is_present_loc(trees.copy()), args.repeats
+    )
+    new_time, result = time_best(lambda: ensure_height_is_present(trees), args.repeats)
+    pd.testing.assert_frame_equal(result, expected)
+
+    print(f"Trees: {len(trees)} ({len(result)} with a height)")
+    print(f".loc implementation: {loc_time:.3f} s")
+    print(f"ensure_height_is_present: {new_time:.3f} s ({loc_time / new_time:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
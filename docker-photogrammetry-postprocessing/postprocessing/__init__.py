@@ -1,6 +1,7 @@
 from .postprocess import (
     create_dir,
     create_thumbnail,
+    crop_open_raster_save_cog,
     crop_raster_save_cog,
     lonlat_to_utm_epsg,
     make_chm,
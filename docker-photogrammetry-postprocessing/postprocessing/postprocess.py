@@ -193,78 +193,95 @@ def crop_raster_save_cog(
         output_filepath (str | Path): Path to save output file after cropping
         mission_polygon (GeoDataFrame): GeoDataFrame containing mission boundary polygon
     """
+    # Read raster
+    with rasterio.open(raster_filepath) as src:
+        crop_open_raster_save_cog(src, output_filepath, mission_polygon)
+
+
+def crop_open_raster_save_cog(
+    src: rasterio.io.DatasetReader,
+    output_filepath: str | Path,
+    mission_polygon: gpd.GeoDataFrame,
+):
+    """
+    Same as `crop_raster_save_cog`, but for a raster which is already open. This allows one
+    dataset handle to be reused when cropping the same raster to many polygons.
+
+    Args:
+        src (rasterio.io.DatasetReader): Open input raster
+        output_filepath (str | Path): Path to save output file after cropping
+        mission_polygon (GeoDataFrame): GeoDataFrame containing mission boundary polygon
+    """
     # Ensure output_filepath is a Path object
     output_filepath = Path(output_filepath)
 
-    # Read raster
-    with rasterio.open(raster_filepath) as src:
-        # Reproject mission polygon to match raster CRS
-        mission_polygon_matched = mission_polygon.to_crs(src.crs)
-
-        # Get geometries for masking
-        # Note, if there are multiple rows in the boundaries geodataframe, this takes only the area
-        # in the interesction of all of them.
-        geometries = [mission_polygon_matched.geometry.intersection_all()]
-
-        # Handle RGB orthomosaics specially (3 or 4 band uint8)
-        colorinterp = None
-        if _is_rgb_orthomosaic(src):
-            cropped_data, cropped_transform, profile, colorinterp = (
-                _crop_rgb_orthomosaic(src, geometries, output_filepath.name)
+    # Reproject mission polygon to match raster CRS
+    mission_polygon_matched = mission_polygon.to_crs(src.crs)
+
+    # Get geometries for masking
+    # Note, if there are multiple rows in the boundaries geodataframe, this takes only the area
+    # in the interesction of all of them.
+    geometries = [mission_polygon_matched.geometry.intersection_all()]
+
+    # Handle RGB orthomosaics specially (3 or 4 band uint8)
+    colorinterp = None
+    if _is_rgb_orthomosaic(src):
+        cropped_data, cropped_transform, profile, colorinterp = _crop_rgb_orthomosaic(
+            src, geometries, output_filepath.name
+        )
+    else:
+        # Standard handling for non-RGB rasters (elevation data, etc.)
+        # Determine nodata value and output dtype
+        output_dtype = None
+        if src.nodata is not None:
+            nodata_value = src.nodata
+        elif src.dtypes[0] == "uint8":
+            # Single-band uint8 without nodata: promote to int16
+            nodata_value = -32767
+            output_dtype = "int16"
+            print(
+                f"  Warning: {output_filepath.name} has no nodata defined. "
+                "Promoting uint8 to int16 to enable nodata masking."
             )
         else:
-            # Standard handling for non-RGB rasters (elevation data, etc.)
-            # Determine nodata value and output dtype
-            output_dtype = None
-            if src.nodata is not None:
-                nodata_value = src.nodata
-            elif src.dtypes[0] == "uint8":
-                # Single-band uint8 without nodata: promote to int16
-                nodata_value = -32767
-                output_dtype = "int16"
-                print(
-                    f"  Warning: {output_filepath.name} has no nodata defined. "
-                    "Promoting uint8 to int16 to enable nodata masking."
-                )
-            else:
-                nodata_value = -9999
+            nodata_value = -9999
 
-            # Convert float64 to float32 to save space
-            if src.dtypes[0] == "float64":
-                output_dtype = "float32"
+        # Convert float64 to float32 to save space
+        if src.dtypes[0] == "float64":
+            output_dtype = "float32"
 
-            # Crop raster to polygon, explicitly setting nodata outside polygon
-            cropped_data, cropped_transform = mask(
-                src, geometries, crop=True, nodata=nodata_value, filled=True
-            )
+        # Crop raster to polygon, explicitly setting nodata outside polygon
+        cropped_data, cropped_transform = mask(
+            src, geometries, crop=True, nodata=nodata_value, filled=True
+        )
 
-            # Update metadata for COG
-            profile = src.profile.copy()
-            profile.update(
-                {
-                    "driver": "COG",
-                    "compress": "deflate",
-                    "tiled": True,
-                    "height": cropped_data.shape[1],
-                    "width": cropped_data.shape[2],
-                    "transform": cropped_transform,
-                    "nodata": nodata_value,
-                    "BIGTIFF": "IF_SAFER",
-                }
-            )
+        # Update metadata for COG
+        profile = src.profile.copy()
+        profile.update(
+            {
+                "driver": "COG",
+                "compress": "deflate",
+                "tiled": True,
+                "height": cropped_data.shape[1],
+                "width": cropped_data.shape[2],
+                "transform": cropped_transform,
+                "nodata": nodata_value,
+                "BIGTIFF": "IF_SAFER",
+            }
+        )
 
-            # Apply dtype conversion if needed
-            if output_dtype is not None:
-                profile["dtype"] = output_dtype
-                cropped_data = cropped_data.astype(output_dtype)
+        # Apply dtype conversion if needed
+        if output_dtype is not None:
+            profile["dtype"] = output_dtype
+            cropped_data = cropped_data.astype(output_dtype)
 
-        # Write output
-        with rasterio.open(output_filepath, "w", **profile) as dst:
-            dst.write(cropped_data)
+    # Write output
+    with rasterio.open(output_filepath, "w", **profile) as dst:
+        dst.write(cropped_data)
 
-            # Set color interpretation for RGBA so GIS software recognizes alpha band
-            if colorinterp is not None:
-                dst.colorinterp = colorinterp
+        # Set color interpretation for RGBA so GIS software recognizes alpha band
+        if colorinterp is not None:
+            dst.colorinterp = colorinterp
 
     print(f"  Saved COG: {output_filepath}")
 
@@ -1,11 +1,23 @@
 import argparse
 import json
+from multiprocessing import Pool
 from pathlib import Path
 
 import geopandas as gpd
 import numpy as np
 import pandas as pd
-from postprocessing import crop_raster_save_cog, transform_to_local_utm
+import pyogrio
+import rasterio
+from postprocessing import crop_open_raster_save_cog, transform_to_local_utm
+
+# Open raster datasets in a worker process of preprocess_batch, keyed by path, so each raster is
+# only opened once per worker no matter how many plots are cropped from it
+_WORKER_RASTERS = {}
+
+# The only attributes of the field trees and plot bounds which are used. Other columns are not
+# read, and are therefore also not included in the saved ground_truth.gpkg.
+FIELD_TREE_COLUMNS = ["plot_id", "height", "height_allometric", "dbh"]
+PLOT_BOUNDS_COLUMNS = ["plot_id"]
 
 
 # Copied from https://github.com/open-forest-observatory/tree-registration-and-matching to avoid dependency.
@@ -24,54 +36,104 @@ def ensure_height_is_present(
         height_col (str): Which column represents the height. Defaults to "height".
 
     Returns:
-        gpd.GeoDataFrame: The ground reference trees with every row having the height attributes
+        gpd.GeoDataFrame: A copy of the ground reference trees with every row having the height
+        attribute
     """
     # First replace any missing height values with pre-computed allometric values
-    nan_height = ground_reference_trees.height.isna()
-    ground_reference_trees.loc[nan_height, height_col] = ground_reference_trees[
-        nan_height
-    ].height_allometric.astype(float)
+    heights = (
+        ground_reference_trees[height_col]
+        .astype(float)
+        .fillna(ground_reference_trees["height_allometric"].astype(float))
+        .to_numpy(copy=True)
+    )
 
     # For any remaining missing height values that have DBH, use an allometric equation to compute
     # the height
-    nan_height = ground_reference_trees[height_col].isna()
+    nan_height = np.isnan(heights)
     # These parameters were fit on paired height, DBH data from Western conifers dataset.
     allometric_height_func = lambda x: 1.3 + np.exp(
         -0.3136489123372108 + 0.84623571 * np.log(x)
     )
-    # Compute the allometric height and assign it
-    allometric_height = allometric_height_func(
-        ground_reference_trees[nan_height].dbh.to_numpy()
-    )
-    ground_reference_trees.loc[nan_height, height_col] = allometric_height
+    # Compute the allometric height only for the trees which need it
+    dbh = ground_reference_trees["dbh"].to_numpy(dtype=float)
+    heights[nan_height] = allometric_height_func(dbh[nan_height])
 
-    # Filter out any trees that still don't have height
-    ground_reference_trees = ground_reference_trees[
-        ~ground_reference_trees[height_col].isna()
-    ]
+    # Filter out any trees that still don't have height. This returns a new frame rather than
+    # modifying the input.
+    return ground_reference_trees.assign(**{height_col: heights})[~np.isnan(heights)]
 
-    return ground_reference_trees
 
+def _sql_literal(value) -> str:
+    """Format a value as a literal for an OGR SQL where clause"""
+    if isinstance(value, str):
+        escaped = value.replace("'", "''")
+        return f"'{escaped}'"
+    return str(value)
 
-def preprocess(
+
+def load_plot_subsets(path: str, plot_ids: list, columns: list | None = None) -> dict:
+    """
+    Read the features for some plots from a file with a plot_id attribute and split them by plot.
+    The plot ID filter is applied by the reader, so only features in the requested plots are
+    loaded, which is fast for files with an index on plot_id. GeoParquet files are read with a
+    row filter, which lets row groups without these plots be skipped.
+
+    Args:
+        path: Path to the vector file
+        plot_ids: Which plot IDs to return subsets for
+        columns: Which attribute columns to read. Columns which are not in the file are skipped.
+            Defaults to None, meaning all columns.
+
+    Returns:
+        dict: Mapping from each plot ID to the features for that plot. Plots without any features
+        are not included.
+    """
+    if Path(path).suffix == ".parquet":
+        # pyarrow is required by geopandas for reading parquet in any case
+        import pyarrow.parquet as pq
+
+        if columns is not None:
+            schema = pq.read_schema(path)
+            geometry_column = json.loads(schema.metadata[b"geo"])["primary_column"]
+            columns = [c for c in columns if c in schema.names] + [geometry_column]
+        features = gpd.read_parquet(
+            path, columns=columns, filters=[("plot_id", "in", list(plot_ids))]
+        )
+    else:
+        if columns is not None:
+            fields = pyogrio.read_info(path)["fields"]
+            columns = [c for c in columns if c in fields]
+        where = f"plot_id IN ({', '.join(_sql_literal(p) for p in plot_ids)})"
+        features = gpd.read_file(path, engine="pyogrio", columns=columns, where=where)
+
+    return {plot_id: subset.copy() for plot_id, subset in features.groupby("plot_id")}
+
+
+def preprocess_plot(
     plot_id: str,
     dataset_dir: Path,
     local_files: dict,
+    field_trees: gpd.GeoDataFrame,
+    plot_bounds: gpd.GeoDataFrame,
     min_tree_height: float,
     output_path: Path | None = None,
+    raster_cache: dict | None = None,
 ):
     """
-    Preprocesses the field trees and rasters for a single plot.
+    Preprocesses the field trees and rasters for a single plot, given the field trees and bounds
+    which have already been subset to that plot.
 
     Args:
-        plot_id: The plot ID to subset the field trees and plot bounds.
+        plot_id: The plot ID, used for reporting.
         dataset_dir: The directory where the preprocessed files will be saved.
-        local_files: JSON string of local file paths (ortho, chm, shift, field_trees, plot_bounds).
+        local_files: Dict of local file paths (ortho, chm, shift, field_trees, plot_bounds).
+        field_trees: The field trees for this plot.
+        plot_bounds: The bounds for this plot.
         min_tree_height: Minimum tree height (meters) used to filter field trees.
         output_path: Path to write the preprocessed file paths JSON. Default to None.
+        raster_cache: If provided, open rasters are stored in and reused from this dict, keyed by
+            path, and are left open. Otherwise each raster is opened and closed for this plot.
     """
-    field_trees_path = local_files["field_trees"]
-    plot_bounds_path = local_files["plot_bounds"]
     shift_file_path = local_files["shift"]
     ortho_path = local_files["ortho"]
     chm_path = local_files["chm"]
@@ -79,23 +141,8 @@ def preprocess(
     # Destination path to save the preprocessed field trees
     ground_truth_path = dataset_dir / "ground_truth.gpkg"
 
-    # Load field trees
-    field_trees = gpd.read_file(field_trees_path)
-    field_trees = field_trees[field_trees["plot_id"] == plot_id].copy()
     print(f"[preprocess] {len(field_trees)} trees for plot_id={plot_id}")
 
-    if len(field_trees) == 0:
-        raise ValueError(f"No trees found for plot_id={plot_id} in {field_trees_path}")
-
-    # Load plot bounds
-    plot_bounds = gpd.read_file(plot_bounds_path)
-    plot_bounds = plot_bounds[plot_bounds["plot_id"] == plot_id].copy()
-
-    if len(plot_bounds) == 0:
-        raise ValueError(
-            f"No plot bounds found for plot_id={plot_id} in {plot_bounds_path}"
-        )
-
     # Load the shift information
     shift_df = pd.read_csv(shift_file_path)
     shift_x = float(shift_df["estimated_shift_x"].iloc[0])
@@ -143,21 +190,22 @@ def preprocess(
     plot_bounds_buffered["geometry"] = plot_bounds_utm.geometry.buffer(20)
     plot_bounds_buffered = plot_bounds_buffered.to_crs(bounds_original_crs)
 
-    print(f"[preprocess] Cropping orthomosaic to plot bounds")
     cropped_ortho = dataset_dir / "cropped_ortho.tif"
-    crop_raster_save_cog(
-        raster_filepath=ortho_path,
-        output_filepath=cropped_ortho,
-        mission_polygon=plot_bounds_buffered,
-    )
-
-    print(f"[preprocess] Cropping CHM to plot bounds")
     cropped_chm = dataset_dir / "cropped_chm.tif"
-    crop_raster_save_cog(
-        raster_filepath=chm_path,
-        output_filepath=cropped_chm,
-        mission_polygon=plot_bounds_buffered,
-    )
+    for raster_name, raster_path, cropped_path in [
+        ("orthomosaic", ortho_path, cropped_ortho),
+        ("CHM", chm_path, cropped_chm),
+    ]:
+        print(f"[preprocess] Cropping {raster_name} to plot bounds")
+        if raster_cache is None:
+            with rasterio.open(raster_path) as src:
+                crop_open_raster_save_cog(src, cropped_path, plot_bounds_buffered)
+        else:
+            if raster_path not in raster_cache:
+                raster_cache[raster_path] = rasterio.open(raster_path)
+            crop_open_raster_save_cog(
+                raster_cache[raster_path], cropped_path, plot_bounds_buffered
+            )
 
     # Check that the cropped files were created successfully
     for f in [cropped_ortho, cropped_chm]:
@@ -182,26 +230,180 @@ def preprocess(
         print("[preprocess] preprocessed-file-paths.json written.")
 
 
+def preprocess(
+    plot_id: str,
+    dataset_dir: Path,
+    local_files: dict,
+    min_tree_height: float,
+    output_path: Path | None = None,
+):
+    """
+    Preprocesses the field trees and rasters for a single plot.
+
+    Args:
+        plot_id: The plot ID to subset the field trees and plot bounds.
+        dataset_dir: The directory where the preprocessed files will be saved.
+        local_files: JSON string of local file paths (ortho, chm, shift, field_trees, plot_bounds).
+        min_tree_height: Minimum tree height (meters) used to filter field trees.
+        output_path: Path to write the preprocessed file paths JSON. Default to None.
+    """
+    field_trees_path = local_files["field_trees"]
+    plot_bounds_path = local_files["plot_bounds"]
+
+    # Load field trees
+    field_trees = load_plot_subsets(
+        field_trees_path, [plot_id], columns=FIELD_TREE_COLUMNS
+    ).get(plot_id)
+    if field_trees is None:
+        raise ValueError(f"No trees found for plot_id={plot_id} in {field_trees_path}")
+
+    # Load plot bounds
+    plot_bounds = load_plot_subsets(
+        plot_bounds_path, [plot_id], columns=PLOT_BOUNDS_COLUMNS
+    ).get(plot_id)
+    if plot_bounds is None:
+        raise ValueError(
+            f"No plot bounds found for plot_id={plot_id} in {plot_bounds_path}"
+        )
+
+    preprocess_plot(
+        plot_id=plot_id,
+        dataset_dir=dataset_dir,
+        local_files=local_files,
+        field_trees=field_trees,
+        plot_bounds=plot_bounds,
+        min_tree_height=min_tree_height,
+        output_path=output_path,
+    )
+
+
+def _preprocess_plot_task(kwargs: dict):
+    """
+    Run `preprocess_plot` in a worker of preprocess_batch, reusing the worker's open rasters.
+
+    Returns:
+        tuple: The plot ID and the error message, which is None on success
+    """
+    try:
+        preprocess_plot(**kwargs, raster_cache=_WORKER_RASTERS)
+        return kwargs["plot_id"], None
+    except Exception as e:
+        return kwargs["plot_id"], f"{type(e).__name__}: {e}"
+
+
+def preprocess_batch(plots: list, min_tree_height: float, n_workers: int = 1):
+    """
+    Preprocess many plots in one invocation, for example all plots of one mission. Each field
+    trees and plot bounds file is read once for all plots, instead of once per plot, and plots are
+    processed in parallel. Each worker process keeps the rasters it has read open, so plots cropped
+    from the same orthomosaic and CHM reuse the open datasets.
+
+    Args:
+        plots: List of dicts with the plot_id, dataset_dir, local_files, and optionally the
+            output_path arguments of `preprocess` for each plot.
+        min_tree_height: Minimum tree height (meters) used to filter field trees.
+        n_workers: Number of plots to process in parallel. Defaults to 1.
+
+    Raises:
+        RuntimeError: If any plot failed. The remaining plots are still processed.
+    """
+    columns_per_key = {
+        "field_trees": FIELD_TREE_COLUMNS,
+        "plot_bounds": PLOT_BOUNDS_COLUMNS,
+    }
+
+    # Determine which plots are needed from each input file, so each file is read once
+    plot_ids_per_file = {}
+    for plot in plots:
+        for key in columns_per_key.keys():
+            plot_ids_per_file.setdefault((key, plot["local_files"][key]), set()).add(
+                plot["plot_id"]
+            )
+
+    subsets_per_file = {}
+    for (key, path), plot_ids in plot_ids_per_file.items():
+        print(f"[preprocess] Reading {len(plot_ids)} plots from {path}")
+        subsets_per_file[(key, path)] = load_plot_subsets(
+            path, list(plot_ids), columns=columns_per_key[key]
+        )
+
+    tasks = []
+    errors = {}
+    for plot in plots:
+        plot_id = plot["plot_id"]
+        local_files = plot["local_files"]
+        field_trees = subsets_per_file[("field_trees", local_files["field_trees"])].get(
+            plot_id
+        )
+        plot_bounds = subsets_per_file[("plot_bounds", local_files["plot_bounds"])].get(
+            plot_id
+        )
+
+        if field_trees is None:
+            errors[plot_id] = f"No trees found in {local_files['field_trees']}"
+        elif plot_bounds is None:
+            errors[plot_id] = f"No plot bounds found in {local_files['plot_bounds']}"
+        else:
+            output_path = plot.get("output_path")
+            tasks.append(
+                {
+                    "plot_id": plot_id,
+                    "dataset_dir": Path(plot["dataset_dir"]),
+                    "local_files": local_files,
+                    "field_trees": field_trees,
+                    "plot_bounds": plot_bounds,
+                    "min_tree_height": min_tree_height,
+                    "output_path": None if output_path is None else Path(output_path),
+                }
+            )
+
+    # Processing plots from the same rasters next to each other improves reuse of open rasters
+    tasks.sort(key=lambda task: task["local_files"]["ortho"])
+
+    with Pool(n_workers) as p:
+        for plot_id, error in p.imap_unordered(_preprocess_plot_task, tasks):
+            if error is not None:
+                errors[plot_id] = error
+
+    if len(errors) > 0:
+        for plot_id, error in errors.items():
+            print(f"[preprocess] ERROR for plot_id={plot_id}: {error}")
+        raise RuntimeError(f"[preprocess] {len(errors)} of {len(plots)} plots failed")
+
+    print(f"[preprocess] Preprocessed {len(plots)} plots")
+
+
 def parse_args():
     parser = argparse.ArgumentParser(
-        description="Preprocess field trees and rasters for a single plot."
+        description="Preprocess field trees and rasters for a single plot, or for a batch of "
+        "plots with --batch-file."
     )
     parser.add_argument(
         "--plot-id",
-        required=True,
         help="Plot ID to subset field trees and plot bounds.",
     )
     parser.add_argument(
         "--dataset-dir",
-        required=True,
         type=Path,
         help="Directory for dataset outputs.",
     )
     parser.add_argument(
         "--local-files",
-        required=True,
         help="JSON string of local file paths (ortho, chm, shift, field_trees, plot_bounds).",
     )
+    parser.add_argument(
+        "--batch-file",
+        type=Path,
+        help="JSON file with a list of plots to preprocess together, each with plot_id, "
+        "dataset_dir, local_files, and optionally output_path keys. Replaces --plot-id, "
+        "--dataset-dir, --local-files, and --output-path.",
+    )
+    parser.add_argument(
+        "--n-workers",
+        type=int,
+        default=1,
+        help="Number of plots to process in parallel with --batch-file.",
+    )
     parser.add_argument(
         "--min-tree-height",
         required=True,
@@ -214,15 +416,33 @@ def parse_args():
         default=None,
         help="Path to write the preprocessed file paths JSON. If omitted, the file is not written.",
     )
-    return parser.parse_args()
+    args = parser.parse_args()
+
+    if args.batch_file is None and (
+        args.plot_id is None or args.dataset_dir is None or args.local_files is None
+    ):
+        parser.error(
+            "--plot-id, --dataset-dir, and --local-files are required without --batch-file"
+        )
+
+    return args
 
 
 if __name__ == "__main__":
     args = parse_args()
-    preprocess(
-        plot_id=args.plot_id,
-        dataset_dir=args.dataset_dir,
-        local_files=json.loads(args.local_files),
-        min_tree_height=args.min_tree_height,
-        output_path=args.output_path,
-    )
+    if args.batch_file is not None:
+        with open(args.batch_file, "r") as f:
+            plots = json.load(f)
+        preprocess_batch(
+            plots=plots,
+            min_tree_height=args.min_tree_height,
+            n_workers=args.n_workers,
+        )
+    else:
+        preprocess(
+            plot_id=args.plot_id,
+            dataset_dir=args.dataset_dir,
+            local_files=json.loads(args.local_files),
+            min_tree_height=args.min_tree_height,
+            output_path=args.output_path,
+        )
@@ -0,0 +1,117 @@
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pytest
+from postprocessing.preprocess import ensure_height_is_present
+
+
+def ensure_height_is_present_loc(ground_reference_trees, height_col="height"):
+    """The previous, .loc-based implementation, which the vectorized one must match."""
+    nan_height = ground_reference_trees.height.isna()
+    ground_reference_trees.loc[nan_height, height_col] = ground_reference_trees[
+        nan_height
+    ].height_allometric.astype(float)
+
+    nan_height = ground_reference_trees[height_col].isna()
+    allometric_height_func = lambda x: 1.3 + np.exp(
+        -0.3136489123372108 + 0.84623571 * np.log(x)
+    )
+    allometric_height = allometric_height_func(
+        ground_reference_trees[nan_height].dbh.to_numpy()
+    )
+    ground_reference_trees.loc[nan_height, height_col] = allometric_height
+
+    ground_reference_trees = ground_reference_trees[
+        ~ground_reference_trees[height_col].isna()
+    ]
+    return ground_reference_trees
+
+
+def make_trees(n_trees, seed=0):
+    """
+    Generate field trees where a quarter each have a height, only an allometric height, only a
+    DBH, and none of them.
+    """
+    rng = np.random.default_rng(seed)
+    kind = rng.integers(0, 4, n_trees)
+    height = np.where(kind == 0, rng.uniform(2, 50, n_trees), np.nan)
+    height_allometric = np.where(kind <= 1, rng.uniform(2, 50, n_trees), np.nan)
+    dbh = np.where(kind <= 2, rng.uniform(5, 120, n_trees), np.nan)
+    return gpd.GeoDataFrame(
+        {
+            "plot_id": rng.integers(0, 100, n_trees),
+            "height": height,
+            "height_allometric": height_allometric,
+            "dbh": dbh,
+        },
+        geometry=gpd.points_from_xy(
+            rng.uniform(0, 1000, n_trees), rng.uniform(0, 1000, n_trees)
+        ),
+        crs=32610,
+    )
+
+
+def test_matches_loc_implementation():
+    trees = make_trees(1000)
+    original = trees.copy()
+    expected = ensure_height_is_present_loc(trees.copy())
+    result = ensure_height_is_present(trees)
+
+    pd.testing.assert_frame_equal(result, expected)
+    # The trees with none of the attributes are dropped, and the input is not modified
+    assert len(result) == trees.dbh.notna().sum()
+    pd.testing.assert_frame_equal(trees, original)
+
+
+def test_height_allometric_fills_missing_heights():
+    trees = make_trees(4)
+    trees["height"] = [10.0, np.nan, np.nan, 12.0]
+    trees["height_allometric"] = [20.0, 21.0, np.nan, 22.0]
+    trees["dbh"] = [30.0, 31.0, np.nan, 32.0]
+
+    result = ensure_height_is_present(trees)
+
+    pd.testing.assert_frame_equal(result, ensure_height_is_present_loc(trees.copy()))
+    assert result.height.tolist() == [10.0, 21.0, 12.0]
+
+
+def test_dbh_fills_missing_heights():
+    trees = make_trees(2)
+    trees["height"] = np.nan
+    trees["height_allometric"] = np.nan
+    trees["dbh"] = [30.0, np.nan]
+
+    result = ensure_height_is_present(trees)
+
+    pd.testing.assert_frame_equal(result, ensure_height_is_present_loc(trees.copy()))
+    assert result.height.tolist() == pytest.approx(
+        [1.3 + np.exp(-0.3136489123372108 + 0.84623571 * np.log(30.0))]
+    )
+
+
+def test_trees_without_any_height_are_dropped():
+    trees = make_trees(3)
+    trees["height"] = np.nan
+    trees["height_allometric"] = np.nan
+    trees["dbh"] = np.nan
+
+    result = ensure_height_is_present(trees)
+
+    pd.testing.assert_frame_equal(result, ensure_height_is_present_loc(trees.copy()))
+    assert result.empty
+    assert list(result.columns) == list(trees.columns)
+
+
+def test_other_height_column():
+    trees = make_trees(1000).rename(columns={"height": "height_m"})
+
+    result = ensure_height_is_present(trees, height_col="height_m")
+
+    # The previous implementation found the missing heights from the height column, whatever
+    # height_col was, so it is compared on trees where both columns hold the same values
+    expected = ensure_height_is_present_loc(
+        trees.assign(height=trees.height_m), height_col="height_m"
+    ).drop(columns="height")
+    pd.testing.assert_frame_equal(result, expected)
+    assert "height" not in result.columns
+    assert result.height_m.notna().all()
@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""
+Completion log shared by the workflow utilities.
+
+The completion log is an append-only JSON Lines file, with one line per completed project phase,
+appended by the log-completion step of the workflows. So that reading it doesn't get slower as it
+grows, the log is periodically compacted into a snapshot file next to it, which holds the set of
+completed phases of each project and the position in the log up to which it is complete. Reading
+the log then only parses the snapshot and the lines appended after it. The log itself is never
+rewritten, so it keeps the full history.
+
+All access to the log is coordinated with a lock on the log file, so that appends from parallel
+pods and compaction are safe.
+
+Usage:
+    python completion_log.py append <log_path> <project_name> <phase> [--workflow-name NAME]
+    python completion_log.py compact <log_path>
+"""
+
+import argparse
+import fcntl
+import json
+import os
+import sys
+from datetime import datetime, timezone
+from typing import Dict, Optional, Set, Tuple
+
+# Suffix of the snapshot file, which is written next to the log
+SNAPSHOT_SUFFIX = ".snapshot.json"
+
+# Compact the log when reading it if more than this many bytes were appended since the snapshot.
+# Each line is ~150 bytes, so this is several thousand completions.
+COMPACT_AFTER_BYTES = 1024 * 1024
+
+# Number of bytes before the snapshot position which are saved in the snapshot, to detect a log
+# which was replaced or rewritten after the snapshot was made
+SNAPSHOT_CHECK_BYTES = 256
+
+
+def get_snapshot_path(log_path: str) -> str:
+    """
+    Get the path of the snapshot file of a completion log.
+
+    Args:
+        log_path: Path to JSON Lines completion log
+
+    Returns:
+        Path to the snapshot file
+    """
+    return log_path + SNAPSHOT_SUFFIX
+
+
+def parse_log_line(line: bytes) -> Optional[Tuple[str, str]]:
+    """
+    Parse one line of the completion log.
+
+    Supports both the current 'phase' field and the legacy 'completion_level' field
+    for backward compatibility with existing logs.
+
+    Args:
+        line: Line of the log
+
+    Returns:
+        Tuple of (project_name, phase), or None for an empty line
+
+    Raises:
+        ValueError: If the line is malformed
+    """
+    line = line.strip()
+    if not line:
+        return None
+    try:
+        entry = json.loads(line.decode("utf-8"))
+        project_name = entry["project_name"]
+        # Support both 'phase' (current) and 'completion_level' (legacy)
+        phase = entry.get("phase") or entry.get("completion_level")
+        if phase is None:
+            raise KeyError("Missing 'phase' or 'completion_level' field")
+    except (
+        UnicodeDecodeError,
+        json.JSONDecodeError,
+        KeyError,
+        TypeError,
+        AttributeError,
+    ) as e:
+        raise ValueError(str(e)) from e
+    return project_name, phase
+
+
+def read_log_tail(f, offset: int, completions: Dict[str, Set[str]]) -> int:
+    """
+    Read the lines of the completion log after a position and add them to the completions.
+
+    A last line without a newline is still being written, so it's left for the next read.
+
+    Args:
+        f: Completion log, opened in binary mode
+        offset: Position in the log to start reading at. Must be the start of a line.
+        completions: Dict mapping project_name -> set of completed phases, which is updated
+
+    Returns:
+        Position in the log after the last complete line
+    """
+    f.seek(offset)
+    for line in f:
+        if not line.endswith(b"\n"):
+            break
+        try:
+            parsed = parse_log_line(line)
+        except ValueError as e:
+            print(
+                f"Warning: Skipping malformed line at byte {offset} in completion log: {e}",
+                file=sys.stderr,
+            )
+            parsed = None
+        if parsed is not None:
+            project_name, phase = parsed
+            completions.setdefault(project_name, set()).add(phase)
+        offset += len(line)
+    return offset
+
+
+def read_snapshot(f, log_path: str) -> Tuple[Dict[str, Set[str]], int]:
+    """
+    Read the snapshot of a completion log, if it's still valid for the log.
+
+    Args:
+        f: Completion log, opened in binary mode
+        log_path: Path to JSON Lines completion log
+
+    Returns:
+        Tuple of (completions, position in the log the snapshot is complete up to). If there is no
+        valid snapshot, the completions are empty and the position is 0.
+    """
+    snapshot_path = get_snapshot_path(log_path)
+    if not os.path.exists(snapshot_path):
+        return {}, 0
+    try:
+        with open(snapshot_path, "r") as sf:
+            snapshot = json.loads(sf.read())
+        offset = snapshot["offset"]
+        check = snapshot["check"].encode("latin-1")
+        completions = {
+            name: set(phases) for name, phases in snapshot["completions"].items()
+        }
+    except (OSError, ValueError, KeyError, AttributeError) as e:
+        print(
+            f"Warning: Ignoring unreadable completion log snapshot {snapshot_path}: {e}",
+            file=sys.stderr,
+        )
+        return {}, 0
+
+    # Check the log still has the same content before the snapshot position
+    start = max(0, offset - SNAPSHOT_CHECK_BYTES)
+    f.seek(start)
+    if f.read(offset - start) != check:
+        print(
+            f"Warning: Completion log {log_path} changed since its snapshot was made, "
+            f"reading it in full",
+            file=sys.stderr,
+        )
+        return {}, 0
+    return completions, offset
+
+
+def write_snapshot(
+    f, log_path: str, completions: Dict[str, Set[str]], offset: int
+) -> None:
+    """
+    Write the snapshot of a completion log. The caller must hold an exclusive lock on the log.
+
+    Args:
+        f: Completion log, opened in binary mode
+        log_path: Path to JSON Lines completion log
+        completions: Dict mapping project_name -> set of completed phases
+        offset: Position in the log the completions are complete up to
+    """
+    start = max(0, offset - SNAPSHOT_CHECK_BYTES)
+    f.seek(start)
+    snapshot = {
+        "offset": offset,
+        "check": f.read(offset - start).decode("latin-1"),
+        "completions": {name: list(phases) for name, phases in completions.items()},
+    }
+
+    # Write to a temporary file first, so readers never see a partial snapshot
+    snapshot_path = get_snapshot_path(log_path)
+    tmp_path = f"{snapshot_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as sf:
+        sf.write(json.dumps(snapshot))
+    os.replace(tmp_path, snapshot_path)
+
+
+def compact_completion_log(log_path: str) -> Dict[str, Set[str]]:
+    """
+    Compact the lines appended to the completion log since its snapshot into the snapshot.
+
+    Args:
+        log_path: Path to JSON Lines completion log
+
+    Returns:
+        Dict mapping project_name -> set of completed phases
+    """
+    if not os.path.exists(log_path):
+        return {}
+
+    with open(log_path, "rb") as f:
+        # Exclusive lock so no lines are appended while the snapshot is made
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        completions, offset = read_snapshot(f, log_path)
+        new_offset = read_log_tail(f, offset, completions)
+        if new_offset != offset:
+            write_snapshot(f, log_path, completions, new_offset)
+    return completions
+
+
+def load_completions(log_path: str, compact: bool = True) -> Dict[str, Set[str]]:
+    """
+    Load the completion log and return a lookup table.
+
+    Args:
+        log_path: Path to JSON Lines completion log
+        compact: If True, compact the log when much has been appended since its snapshot. If the
+            snapshot can't be written, e.g. because the log is read-only, the log is still read.
+
+    Returns:
+        Dict mapping project_name -> set of completed phases
+        (e.g., {"project-A": {"metashape", "postprocess"}})
+    """
+    if not os.path.exists(log_path):
+        return {}
+
+    with open(log_path, "rb") as f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_SH)
+        completions, offset = read_snapshot(f, log_path)
+        tail_size = os.fstat(f.fileno()).st_size - offset
+        if not (compact and tail_size > COMPACT_AFTER_BYTES):
+            read_log_tail(f, offset, completions)
+            return completions
+
+    try:
+        return compact_completion_log(log_path)
+    except OSError as e:
+        print(
+            f"Warning: Could not compact completion log {log_path}: {e}",
+            file=sys.stderr,
+        )
+        return load_completions(log_path, compact=False)
+
+
+def append_completion(
+    log_path: str,
+    project_name: str,
+    phase: str,
+    workflow_name: Optional[str] = None,
+) -> Dict[str, str]:
+    """
+    Append a completed project phase to the completion log.
+
+    Args:
+        log_path: Path to JSON Lines completion log. It's created if it doesn't exist.
+        project_name: Project identifier
+        phase: The completed phase (e.g., "metashape", "postprocess")
+        workflow_name: Optional name of the workflow which completed the phase
+
+    Returns:
+        The appended log entry
+    """
+    entry = {
+        "project_name": project_name,
+        "phase": phase,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "workflow_name": workflow_name,
+    }
+    line = json.dumps(entry) + "\n"
+
+    log_dir = os.path.dirname(log_path)
+    if log_dir:
+        os.makedirs(log_dir, exist_ok=True)
+
+    # Append with exclusive lock for concurrency safety
+    with open(log_path, "a") as f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        f.write(line)
+        f.flush()
+    return entry
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Append to or compact a completion log"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    append_parser = subparsers.add_parser(
+        "append", help="Append a completed project phase to the log"
+    )
+    append_parser.add_argument(
+        "log_path",
+        help="Path to completion log file (JSON Lines format). If empty, nothing is logged.",
+    )
+    append_parser.add_argument("project_name", help="Project identifier")
+    append_parser.add_argument(
+        "phase", choices=["metashape", "postprocess"], help="The completed phase"
+    )
+    append_parser.add_argument(
+        "--workflow-name", default=None, help="Name of the workflow, for traceability"
+    )
+
+    compact_parser = subparsers.add_parser(
+        "compact", help="Compact the lines appended since the snapshot into it"
+    )
+    compact_parser.add_argument(
+        "log_path", help="Path to completion log file (JSON Lines format)"
+    )
+
+    args = parser.parse_args()
+
+    if args.command == "append":
+        # Skip if no log path configured
+        if not args.log_path:
+            print("No completion log path configured, skipping")
+            sys.exit(0)
+        entry = append_completion(
+            args.log_path, args.project_name, args.phase, args.workflow_name
+        )
+        print(f"Logged completion: {entry['project_name']} at phase {entry['phase']}")
+    elif args.command == "compact":
+        completions = compact_completion_log(args.log_path)
+        print(
+            f"Compacted completion log with {len(completions)} projects",
+            file=sys.stderr,
+        )
@@ -3,30 +3,299 @@ Database logging utilities for Argo workflows.
 
 Note: The database schema uses column name 'dataset_name' for backward compatibility,
 but this column stores project names (from PROJECT_NAME environment variable).
+
+If a spool directory is configured (--spool-dir or the DB_LOG_SPOOL_DIR environment variable),
+events are appended to a spool file in it instead of being written to the database, and the
+command returns immediately without ever failing. A long-running flusher (the flush action) then
+writes the spooled events to the database in batches, retrying with backoff while the database is
+unavailable. This keeps database latency and outages from failing workflow steps.
 """
 
 import argparse
+import fcntl
+import glob
 import json
 import os
 import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
 
 import psycopg2
+import yaml
+from psycopg2.extras import execute_values
+from psycopg2.pool import ThreadedConnectionPool
 
+# Seconds to wait when connecting to the database before giving up
+CONNECT_TIMEOUT = 10
 
-def get_db_connection():
-    host = os.environ.get("DB_HOST", "")
-    database = os.environ.get("DB_NAME", "")
-    user = os.environ.get("DB_USER", "")
-    password = os.environ.get("DB_PASSWORD", "")
+# Maximum number of connections in the pool used by long-running processes
+POOL_MAX_CONNECTIONS = 4
 
-    try:
-        conn = psycopg2.connect(
-            host=host, database=database, user=user, password=password
+# Connection pool, only created by long-running processes with init_connection_pool(). The pool
+# raises an error instead of waiting when all its connections are in use, so the semaphore makes
+# callers wait for a connection.
+_POOL = None
+_POOL_SEMAPHORE = None
+
+# Name of the file in the spool directory which events are appended to. The flusher renames it to
+# a batch file (batch-*.jsonl) before writing its events to the database.
+SPOOL_FILE = "events.jsonl"
+
+# Seconds between flushes of the spool when following it, and the initial and maximum seconds
+# to wait between attempts while the database is unavailable
+FLUSH_INTERVAL = 30
+FLUSH_BACKOFF_INITIAL = 5
+FLUSH_BACKOFF_MAX = 300
+
+# Database errors which are caused by the events themselves, so retrying won't help
+PERMANENT_DB_ERRORS = (
+    psycopg2.DataError,
+    psycopg2.IntegrityError,
+    psycopg2.ProgrammingError,
+)
+
+# Metrics of each api_call in a step metrics file (*_metrics.yaml, written by automate-metashape),
+# and their column types in the automate_metashape_step_metrics table
+STEP_METRIC_COLUMNS = {
+    "duration_seconds": "double precision",
+    "cpu_percent": "double precision",
+    "cpu_percent_p90": "double precision",
+    "gpu_percent": "double precision",
+    "gpu_percent_p90": "double precision",
+    "cpu_cores_used": "double precision",
+    "cpu_cores_used_p90": "double precision",
+    "cpu_cores_available": "integer",
+    "proc_mem_peak_gb": "double precision",
+    "container_limit_gb": "double precision",
+    "container_used_peak_gb": "double precision",
+    "container_avail_min_gb": "double precision",
+    "sys_total_gb": "double precision",
+    "sys_used_peak_gb": "double precision",
+    "sys_avail_min_gb": "double precision",
+    "gpu_count": "integer",
+    "gpu_model": "character varying(100)",
+    "node_name": "character varying(253)",
+}
+
+# One row per api_call of each workflow step. call_index is the position of the api_call in the
+# metrics file, so re-ingesting a file updates its rows instead of duplicating them.
+STEP_METRICS_TABLE_SQL = f"""
+CREATE TABLE IF NOT EXISTS automate_metashape_step_metrics (
+    id serial PRIMARY KEY,
+    dataset_name character varying(100) NOT NULL,
+    workflow_id character varying(100) NOT NULL,
+    step character varying(50) NOT NULL DEFAULT '',
+    call_index integer NOT NULL,
+    api_call character varying(100) NOT NULL,
+    {", ".join(f"{name} {sql_type}" for name, sql_type in STEP_METRIC_COLUMNS.items())},
+    created_at timestamp without time zone DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (dataset_name, workflow_id, step, call_index)
+)
+"""
+
+
+def get_connection_kwargs():
+    """Get the connection settings from environment variables.
+
+    The settings are pgbouncer-friendly: each write is one transaction and no session state is
+    used, so the logger also works through a pgbouncer in transaction pooling mode.
+
+    Returns:
+        Keyword arguments for psycopg2.connect()
+    """
+    return dict(
+        host=os.environ.get("DB_HOST", ""),
+        port=os.environ.get("DB_PORT", "5432"),
+        database=os.environ.get("DB_NAME", ""),
+        user=os.environ.get("DB_USER", ""),
+        password=os.environ.get("DB_PASSWORD", ""),
+        connect_timeout=CONNECT_TIMEOUT,
+        application_name="argo-db-logger",
+        # Detect connections dropped by the server or network instead of hanging on them
+        keepalives=1,
+        keepalives_idle=30,
+        keepalives_interval=10,
+        keepalives_count=3,
+    )
+
+
+def init_connection_pool(max_connections=POOL_MAX_CONNECTIONS):
+    """Create the connection pool, which is used for all later writes of this process.
+
+    Only worth it for long-running processes which write many times, since each CLI call makes a
+    single write.
+
+    Args:
+        max_connections: Maximum number of connections in the pool
+    """
+    global _POOL, _POOL_SEMAPHORE
+    if _POOL is None:
+        # Only one connection is kept open between uses. Further connections are opened when
+        # writes overlap, and closed again when they are returned to the pool.
+        _POOL = ThreadedConnectionPool(1, max_connections, **get_connection_kwargs())
+        _POOL_SEMAPHORE = threading.BoundedSemaphore(max_connections)
+
+
+@contextmanager
+def db_connection():
+    """Get a connection from the pool if there is one, otherwise open a new connection.
+
+    The transaction is committed when the block exits, or rolled back if it raises.
+
+    Yields:
+        Database connection
+    """
+    if _POOL is None:
+        conn = psycopg2.connect(**get_connection_kwargs())
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+        return
+
+    with _POOL_SEMAPHORE:
+        conn = _POOL.getconn()
+        try:
+            with conn:
+                yield conn
+        finally:
+            # Connections broken by e.g. a server restart are discarded instead of reused
+            _POOL.putconn(conn, close=bool(conn.closed))
+
+
+def insert_initial(cursor, rows):
+    """Insert queued project entries in a single statement.
+
+    Args:
+        cursor: Database cursor
+        rows: List of (dataset, workflow_id) tuples
+    """
+    execute_values(
+        cursor,
+        """
+        INSERT INTO automate_metashape (dataset_name, workflow_id, status)
+        VALUES %s
+        ON CONFLICT (dataset_name, workflow_id) DO NOTHING
+        """,
+        rows,
+        template="(%s, %s, 'queued')",
+        page_size=1000,
+    )
+
+
+def update_start(cursor, rows):
+    """Mark projects as processing in a single statement.
+
+    Args:
+        cursor: Database cursor
+        rows: List of (dataset, workflow_id, timestamp) tuples. A timestamp of None means now.
+    """
+    execute_values(
+        cursor,
+        """
+        UPDATE automate_metashape AS a
+        SET status = 'processing', start_time = v.event_time
+        FROM (VALUES %s) AS v (dataset_name, workflow_id, event_time)
+        WHERE a.dataset_name = v.dataset_name AND a.workflow_id = v.workflow_id
+        """,
+        rows,
+        template="(%s, %s, COALESCE(%s::timestamptz, CURRENT_TIMESTAMP))",
+        page_size=1000,
+    )
+
+
+def update_completion(cursor, rows):
+    """Mark projects as completed or failed in a single statement.
+
+    Args:
+        cursor: Database cursor
+        rows: List of (dataset, workflow_id, status, timestamp) tuples. A timestamp of None means
+            now.
+    """
+    execute_values(
+        cursor,
+        """
+        UPDATE automate_metashape AS a
+        SET status = v.status, finish_time = v.event_time
+        FROM (VALUES %s) AS v (dataset_name, workflow_id, status, event_time)
+        WHERE a.dataset_name = v.dataset_name AND a.workflow_id = v.workflow_id
+        """,
+        rows,
+        template="(%s, %s, %s, COALESCE(%s::timestamptz, CURRENT_TIMESTAMP))",
+        page_size=1000,
+    )
+
+
+def insert_step_metrics(cursor, rows):
+    """Insert or update step metrics rows in a single statement, creating the table if needed.
+
+    Args:
+        cursor: Database cursor
+        rows: List of (dataset, workflow_id, step, call_index, api_call, *metrics) tuples, with
+            the metrics in the order of STEP_METRIC_COLUMNS
+    """
+    cursor.execute(STEP_METRICS_TABLE_SQL)
+    columns = [
+        "dataset_name",
+        "workflow_id",
+        "step",
+        "call_index",
+        "api_call",
+    ] + list(STEP_METRIC_COLUMNS)
+    updates = ", ".join(f"{column} = EXCLUDED.{column}" for column in columns[4:])
+    execute_values(
+        cursor,
+        f"""
+        INSERT INTO automate_metashape_step_metrics ({", ".join(columns)})
+        VALUES %s
+        ON CONFLICT (dataset_name, workflow_id, step, call_index) DO UPDATE SET {updates}
+        """,
+        rows,
+        page_size=1000,
+    )
+
+
+def read_step_metrics(metrics_path):
+    """Read the api_calls of a step metrics file.
+
+    Args:
+        metrics_path: Path to a *_metrics.yaml file, with an "api_calls" list of the metrics of each
+            Metashape API call
+
+    Returns:
+        List of dicts of the metrics of each API call
+    """
+    with open(metrics_path, "r") as f:
+        metrics = yaml.load(f, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader))
+    return (metrics or {}).get("api_calls") or []
+
+
+def get_step_metrics_rows(dataset, workflow_id, step, api_calls):
+    """Convert the api_calls of a step metrics file to rows of the step metrics table.
+
+    Args:
+        dataset: Project name (not dataset name - column name is legacy)
+        workflow_id: Argo workflow ID
+        step: Workflow step the metrics are of (e.g., "match_photos"). None if not known.
+        api_calls: List of dicts of the metrics of each API call, from read_step_metrics()
+
+    Returns:
+        List of rows for insert_step_metrics(). Metrics missing from the file are NULL, and
+        metrics unknown to the table are ignored.
+    """
+    rows = []
+    for call_index, api_call in enumerate(api_calls):
+        metrics = [api_call.get(column) for column in STEP_METRIC_COLUMNS]
+        # An empty gpu_model is written for CPU nodes
+        metrics = [None if value == "" else value for value in metrics]
+        rows.append(
+            (dataset, workflow_id, step or "", call_index, api_call["api_call"])
+            + tuple(metrics)
         )
-        return conn
-    except Exception as e:
-        sys.stderr.write(f"Error connecting to database: {e}\n")
-        sys.exit(1)
+    return rows
 
 
 def log_datasets_initial(datasets, workflow_id):
@@ -36,25 +305,14 @@ def log_datasets_initial(datasets, workflow_id):
         datasets: List of project names (not dataset names - column name is legacy)
         workflow_id: Argo workflow ID
     """
-    conn = get_db_connection()
     try:
-        cursor = conn.cursor()
-        for dataset in datasets:
-            cursor.execute(
-                """
-                INSERT INTO automate_metashape (dataset_name, workflow_id, status)
-                VALUES (%s, %s, %s)
-                ON CONFLICT (dataset_name, workflow_id) DO NOTHING
-                """,
-                (dataset, workflow_id, "queued"),
+        with db_connection() as conn:
+            insert_initial(
+                conn.cursor(), [(dataset, workflow_id) for dataset in datasets]
             )
-        conn.commit()
     except Exception as e:
         sys.stderr.write(f"Error logging to database: {e}\n")
         sys.exit(1)
-    finally:
-        if conn is not None:
-            conn.close()
 
 
 def log_dataset_start(dataset, workflow_id):
@@ -64,24 +322,12 @@ def log_dataset_start(dataset, workflow_id):
         dataset: Project name (not dataset name - column name is legacy)
         workflow_id: Argo workflow ID
     """
-    conn = get_db_connection()
     try:
-        cursor = conn.cursor()
-        cursor.execute(
-            """
-            UPDATE automate_metashape
-            SET status = 'processing', start_time = CURRENT_TIMESTAMP
-            WHERE dataset_name = %s AND workflow_id = %s
-            """,
-            (dataset, workflow_id),
-        )
-        conn.commit()
+        with db_connection() as conn:
+            update_start(conn.cursor(), [(dataset, workflow_id, None)])
     except Exception as e:
         sys.stderr.write(f"Error logging start time: {e}\n")
         sys.exit(1)
-    finally:
-        if conn is not None:
-            conn.close()
 
 
 def log_dataset_completion(dataset, workflow_id, success):
@@ -92,26 +338,276 @@ def log_dataset_completion(dataset, workflow_id, success):
         workflow_id: Argo workflow ID
         success: Boolean indicating success or failure
     """
-    conn = get_db_connection()
     status = "completed" if success else "failed"
 
     try:
-        cursor = conn.cursor()
-        cursor.execute(
-            """
-            UPDATE automate_metashape
-            SET status = %s, finish_time = CURRENT_TIMESTAMP
-            WHERE dataset_name = %s AND workflow_id = %s
-            """,
-            (status, dataset, workflow_id),
-        )
-        conn.commit()
+        with db_connection() as conn:
+            update_completion(conn.cursor(), [(dataset, workflow_id, status, None)])
     except Exception as e:
         sys.stderr.write(f"Error logging completion: {e}\n")
         sys.exit(1)
-    finally:
-        if conn is not None:
-            conn.close()
+
+
+def log_step_metrics(dataset, workflow_id, step, metrics_path):
+    """Log the per-API-call runtime and resource metrics of a workflow step.
+
+    Args:
+        dataset: Project name (not dataset name - column name is legacy)
+        workflow_id: Argo workflow ID
+        step: Workflow step the metrics are of (e.g., "match_photos"). None if not known.
+        metrics_path: Path to the *_metrics.yaml file of the step
+    """
+    try:
+        rows = get_step_metrics_rows(
+            dataset, workflow_id, step, read_step_metrics(metrics_path)
+        )
+        if rows:
+            with db_connection() as conn:
+                insert_step_metrics(conn.cursor(), rows)
+    except Exception as e:
+        sys.stderr.write(f"Error logging step metrics: {e}\n")
+        sys.exit(1)
+    print(f"Logged metrics of {len(rows)} API calls")
+
+
+def read_events(events_path):
+    """Read logging events from a JSON Lines file.
+
+    Each line is an event with an "action" of "log-initial", "log-start", "log-completion", or
+    "log-step-metrics", and the same fields as the CLI arguments of that action: "datasets" for
+    log-initial, "dataset" for the others, "success" for log-completion, and "step" and
+    "metrics_file" for log-step-metrics. Instead of a "metrics_file", log-step-metrics events can
+    have the "api_calls" of the metrics file inline. Events can also have a
+    "workflow_id", which overrides the default, and a "timestamp" (ISO 8601) of when the event
+    happened, which is used instead of the time it's applied.
+
+    Args:
+        events_path: Path to JSON Lines file of events
+
+    Returns:
+        List of events
+    """
+    events = []
+    with open(events_path, "r") as f:
+        for line_num, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                events.append(json.loads(line))
+            except json.JSONDecodeError as e:
+                sys.stderr.write(
+                    f"Warning: Skipping malformed line {line_num} in events file: {e}\n"
+                )
+    return events
+
+
+def apply_events(events, workflow_id=None):
+    """Apply many logging events in a single transaction.
+
+    The events are grouped by action, and each group is written with one statement. Initial
+    entries are written first, then starts, then completions, so a project which is queued,
+    started and completed in the same batch ends up completed. If a project has several events of
+    the same action, the last one is used.
+
+    Args:
+        events: List of events, as described in read_events()
+        workflow_id: Workflow ID of events which don't have one
+
+    Raises:
+        ValueError: If an event has an unknown action or is missing a field
+    """
+    initial = {}
+    start = {}
+    completion = {}
+    step_metrics = []
+    for event in events:
+        action = event.get("action")
+        event_workflow_id = event.get("workflow_id") or workflow_id
+        if not event_workflow_id:
+            raise ValueError(f"Event has no workflow_id: {event}")
+        timestamp = event.get("timestamp")
+        try:
+            if action == "log-initial":
+                for dataset in event["datasets"]:
+                    initial[(dataset, event_workflow_id)] = None
+            elif action == "log-start":
+                start[(event["dataset"], event_workflow_id)] = timestamp
+            elif action == "log-completion":
+                success = str(event["success"]).lower() == "true"
+                completion[(event["dataset"], event_workflow_id)] = (
+                    "completed" if success else "failed",
+                    timestamp,
+                )
+            elif action == "log-step-metrics":
+                api_calls = event.get("api_calls")
+                if api_calls is None:
+                    api_calls = read_step_metrics(event["metrics_file"])
+                step_metrics += get_step_metrics_rows(
+                    event["dataset"], event_workflow_id, event.get("step"), api_calls
+                )
+            else:
+                raise ValueError(f"Unknown action '{action}' in event: {event}")
+        except KeyError as e:
+            raise ValueError(f"Event is missing field {e}: {event}") from e
+
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        if initial:
+            insert_initial(cursor, list(initial))
+        if start:
+            update_start(cursor, [key + (ts,) for key, ts in start.items()])
+        if completion:
+            update_completion(
+                cursor, [key + value for key, value in completion.items()]
+            )
+        if step_metrics:
+            # A file ingested twice in the batch would update the same row twice in a statement
+            unique_rows = {row[:4]: row for row in step_metrics}
+            insert_step_metrics(cursor, list(unique_rows.values()))
+
+
+def spool_event(spool_dir, event):
+    """Append an event to the spool file, for the flusher to write to the database.
+
+    Args:
+        spool_dir: Spool directory, on a volume shared with the flusher
+        event: Event, as described in read_events(). It's given the current time as its timestamp
+            if it has none, so it's logged with the time it happened rather than when it's flushed.
+    """
+    event = dict(event)
+    event.setdefault("timestamp", datetime.now(timezone.utc).isoformat())
+    line = json.dumps(event) + "\n"
+
+    os.makedirs(spool_dir, exist_ok=True)
+    spool_path = os.path.join(spool_dir, SPOOL_FILE)
+    while True:
+        with open(spool_path, "a") as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            # The flusher may have renamed the file between opening and locking it, in which case
+            # the event must go in the new spool file
+            try:
+                current = os.path.samestat(os.fstat(f.fileno()), os.stat(spool_path))
+            except FileNotFoundError:
+                current = False
+            if current:
+                f.write(line)
+                f.flush()
+                return
+
+
+def spool_event_safely(spool_dir, event):
+    """Spool an event, only warning if that fails, since logging must never fail a workflow step.
+
+    Args:
+        spool_dir: Spool directory
+        event: Event, as described in read_events()
+    """
+    try:
+        spool_event(spool_dir, event)
+        print(f"Spooled {event['action']} event")
+    except Exception as e:
+        sys.stderr.write(f"Warning: Could not spool {event['action']} event: {e}\n")
+
+
+def take_spool(spool_dir):
+    """Move the events spooled so far to a new batch file, so new events go to a new spool file.
+
+    Args:
+        spool_dir: Spool directory
+    """
+    spool_path = os.path.join(spool_dir, SPOOL_FILE)
+    if not os.path.exists(spool_path):
+        return
+    with open(spool_path, "a") as f:
+        # Exclusive lock so no event is being appended while the file is renamed
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        if os.path.getsize(spool_path) > 0:
+            batch_path = os.path.join(spool_dir, f"batch-{time.time_ns()}.jsonl")
+            os.rename(spool_path, batch_path)
+
+
+def flush_spool(spool_dir):
+    """Write all spooled events to the database, one transaction per batch, oldest first.
+
+    If the database rejects a batch because of its content, its events are written one at a time,
+    and those which are rejected are set aside in a *.failed file so they don't block later events.
+
+    Args:
+        spool_dir: Spool directory
+
+    Returns:
+        Number of events written
+
+    Raises:
+        psycopg2.Error: If the database is unavailable. Unwritten batches are kept.
+    """
+    if not os.path.isdir(spool_dir):
+        return 0
+
+    # Only one flusher writes at a time, so batches are written once and in order
+    with open(os.path.join(spool_dir, ".flush.lock"), "a") as lock:
+        fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+        take_spool(spool_dir)
+
+        n_events = 0
+        for batch_path in sorted(glob.glob(os.path.join(spool_dir, "batch-*.jsonl"))):
+            events = read_events(batch_path)
+            try:
+                apply_events(events)
+            except (ValueError, *PERMANENT_DB_ERRORS):
+                # Write the events one at a time, to set aside only those which can't be logged
+                failed = []
+                for event in events:
+                    try:
+                        apply_events([event])
+                    except (ValueError, *PERMANENT_DB_ERRORS) as e:
+                        sys.stderr.write(f"Error: Setting aside event {event}: {e}\n")
+                        failed.append(event)
+                if failed:
+                    with open(batch_path + ".failed", "w") as f:
+                        f.writelines(json.dumps(event) + "\n" for event in failed)
+                events = [event for event in events if event not in failed]
+            os.remove(batch_path)
+            n_events += len(events)
+        return n_events
+
+
+def run_flusher(spool_dir, follow=False, interval=FLUSH_INTERVAL, max_attempts=None):
+    """Flush the spool, retrying with exponential backoff while the database is unavailable.
+
+    Args:
+        spool_dir: Spool directory
+        follow: If True, keep flushing the spool every interval seconds until killed
+        interval: Seconds between flushes when following
+        max_attempts: Maximum number of attempts to flush before giving up, if not following.
+            None means no limit.
+
+    Returns:
+        True if the spool was flushed
+    """
+    attempts = 0
+    backoff = FLUSH_BACKOFF_INITIAL
+    while True:
+        try:
+            # Connects to the database, so is retried too
+            init_connection_pool()
+            n_events = flush_spool(spool_dir)
+            if n_events:
+                print(f"Flushed {n_events} events")
+            attempts = 0
+            backoff = FLUSH_BACKOFF_INITIAL
+            if not follow:
+                return True
+            time.sleep(interval)
+        except psycopg2.Error as e:
+            attempts += 1
+            if not follow and max_attempts is not None and attempts >= max_attempts:
+                sys.stderr.write(f"Error flushing spool, giving up: {e}\n")
+                return False
+            sys.stderr.write(f"Error flushing spool, retrying in {backoff} s: {e}\n")
+            time.sleep(backoff)
+            backoff = min(backoff * 2, FLUSH_BACKOFF_MAX)
 
 
 def main():
@@ -119,12 +615,21 @@ def main():
 
     parser.add_argument(
         "action",
-        choices=["log-initial", "log-start", "log-completion"],
+        choices=[
+            "log-initial",
+            "log-start",
+            "log-completion",
+            "log-step-metrics",
+            "log-batch",
+            "flush",
+        ],
         help="Logging action to perform",
     )
 
     parser.add_argument(
-        "--workflow-id", required=True, help="Workflow ID to use in database records"
+        "--workflow-id",
+        help="Workflow ID to use in database records. Required, except for log-batch events "
+        "which all have their own workflow_id.",
     )
 
     parser.add_argument(
@@ -134,9 +639,57 @@ def main():
     parser.add_argument(
         "--success", help="Success status (true/false) for completion logging"
     )
+    parser.add_argument(
+        "--step", help="Workflow step (e.g., match_photos) for step metrics logging"
+    )
+    parser.add_argument(
+        "--metrics-file",
+        help="Step metrics file (*_metrics.yaml) for step metrics logging",
+    )
+    parser.add_argument(
+        "--events-file",
+        help="JSON Lines file of events to apply in one transaction for batch logging",
+    )
+    parser.add_argument(
+        "--spool-dir",
+        default=os.environ.get("DB_LOG_SPOOL_DIR", ""),
+        help="Spool events in this directory instead of writing them to the database, for the "
+        "flush action to write later. Defaults to the DB_LOG_SPOOL_DIR environment variable.",
+    )
+    parser.add_argument(
+        "--follow",
+        action="store_true",
+        help="Keep flushing the spool until killed, instead of flushing it once",
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=FLUSH_INTERVAL,
+        help=f"Seconds between flushes when following the spool (default: {FLUSH_INTERVAL})",
+    )
+    parser.add_argument(
+        "--max-attempts",
+        type=int,
+        default=None,
+        help="Maximum number of attempts to flush the spool once before giving up "
+        "(default: no limit)",
+    )
 
     args = parser.parse_args()
 
+    if args.action == "flush":
+        if not args.spool_dir:
+            sys.stderr.write("Error: --spool-dir is required for flush action\n")
+            sys.exit(1)
+        flushed = run_flusher(
+            args.spool_dir, args.follow, args.interval, args.max_attempts
+        )
+        sys.exit(0 if flushed else 1)
+
+    if args.action != "log-batch" and not args.workflow_id:
+        sys.stderr.write(f"Error: --workflow-id is required for {args.action} action\n")
+        sys.exit(1)
+
     if args.action == "log-initial":
         if not args.datasets_json:
             sys.stderr.write(
@@ -144,13 +697,33 @@ def main():
             )
             sys.exit(1)
         datasets = json.loads(args.datasets_json)
-        log_datasets_initial(datasets, args.workflow_id)
+        if args.spool_dir:
+            spool_event_safely(
+                args.spool_dir,
+                {
+                    "action": "log-initial",
+                    "datasets": datasets,
+                    "workflow_id": args.workflow_id,
+                },
+            )
+        else:
+            log_datasets_initial(datasets, args.workflow_id)
 
     elif args.action == "log-start":
         if not args.dataset:
             sys.stderr.write("Error: --dataset is required for log-start action\n")
             sys.exit(1)
-        log_dataset_start(args.dataset, args.workflow_id)
+        if args.spool_dir:
+            spool_event_safely(
+                args.spool_dir,
+                {
+                    "action": "log-start",
+                    "dataset": args.dataset,
+                    "workflow_id": args.workflow_id,
+                },
+            )
+        else:
+            log_dataset_start(args.dataset, args.workflow_id)
 
     elif args.action == "log-completion":
         if not args.dataset or args.success is None:
@@ -159,7 +732,58 @@ def main():
             )
             sys.exit(1)
         success = args.success.lower() == "true"
-        log_dataset_completion(args.dataset, args.workflow_id, success)
+        if args.spool_dir:
+            spool_event_safely(
+                args.spool_dir,
+                {
+                    "action": "log-completion",
+                    "dataset": args.dataset,
+                    "workflow_id": args.workflow_id,
+                    "success": success,
+                },
+            )
+        else:
+            log_dataset_completion(args.dataset, args.workflow_id, success)
+
+    elif args.action == "log-step-metrics":
+        if not args.dataset or not args.metrics_file:
+            sys.stderr.write(
+                "Error: --dataset and --metrics-file are required for log-step-metrics action\n"
+            )
+            sys.exit(1)
+        if args.spool_dir:
+            # The metrics are spooled inline, since the file may be cleaned up before the flush
+            try:
+                api_calls = read_step_metrics(args.metrics_file)
+            except Exception as e:
+                sys.stderr.write(f"Warning: Could not read step metrics: {e}\n")
+                sys.exit(0)
+            spool_event_safely(
+                args.spool_dir,
+                {
+                    "action": "log-step-metrics",
+                    "dataset": args.dataset,
+                    "workflow_id": args.workflow_id,
+                    "step": args.step,
+                    "api_calls": api_calls,
+                },
+            )
+        else:
+            log_step_metrics(
+                args.dataset, args.workflow_id, args.step, args.metrics_file
+            )
+
+    elif args.action == "log-batch":
+        if not args.events_file:
+            sys.stderr.write("Error: --events-file is required for log-batch action\n")
+            sys.exit(1)
+        try:
+            events = read_events(args.events_file)
+            apply_events(events, args.workflow_id)
+        except Exception as e:
+            sys.stderr.write(f"Error logging batch: {e}\n")
+            sys.exit(1)
+        print(f"Logged {len(events)} events")
 
 
 if __name__ == "__main__":
@@ -22,6 +22,11 @@ Options:
     --skip-if-complete BOOL     Skip projects that already completed the phase specified by --phase
                                 (true or false, default: false). Requires --phase.
     --require-phase PHASE       Only include projects that have completed the given phase
+    --config-cache PATH         Cache parsed config files in this file, so that unchanged configs
+                                are not parsed again on the next run
+    --workers N                 Number of processes to parse config files in
+    --collect-errors            Report all config files which failed together, instead of stopping
+                                at the first one
 
 Output:
     - Always outputs minimal refs to stdout: [{"project_name": "..."}]
@@ -33,10 +38,13 @@ import json
 import os
 import re
 import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import repeat
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Set
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
 
 import yaml
+from completion_log import load_completions
 
 # Regex for valid project names: must start and end with alphanumeric,
 # internal characters can be alphanumeric, dots, hyphens, or underscores
@@ -44,6 +52,61 @@ VALID_PROJECT_NAME_RE = re.compile(
     r"^[a-zA-Z0-9][a-zA-Z0-9._-]*[a-zA-Z0-9]$|^[a-zA-Z0-9]$"
 )
 
+# Use the much faster libyaml-based loader when PyYAML was built with it
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+# Number of threads reading config files at once. Reads from a network share are dominated by
+# latency, so many more threads than CPUs are useful.
+CONFIG_READ_THREADS = 32
+
+# Default number of processes parsing config files, and the number of config files to parse below
+# which starting the processes costs more than it saves
+DEFAULT_PARSE_WORKERS = min(4, os.cpu_count() or 1)
+MIN_CONFIGS_FOR_PROCESS_POOL = 200
+
+# Default GPU resource (full GPU). Can be overridden per-step with MIG resources like:
+# "nvidia.com/mig-1g.5gb", "nvidia.com/mig-2g.10gb", "nvidia.com/mig-3g.20gb"
+DEFAULT_GPU_RESOURCE = "nvidia.com/gpu"
+DEFAULT_GPU_COUNT = 1
+
+# Hardcoded defaults for CPU/memory requests
+DEFAULT_CPU_REQUEST_CPU_MODE = "18"
+DEFAULT_MEMORY_REQUEST_CPU_MODE = "100Gi"
+DEFAULT_CPU_REQUEST_GPU_MODE = "4"
+DEFAULT_MEMORY_REQUEST_GPU_MODE = "16Gi"
+
+# Resources of each workflow step, in the order they are written to the mission parameters.
+# Each entry is (step, fallback steps, gpu mode):
+# - fallback steps: Steps whose argo settings are used, in order, when the step doesn't set one.
+#   These come before the user defaults in argo.defaults and the hardcoded defaults.
+# - gpu mode: "never" for CPU-only steps, "always" for steps which always run on a GPU, or
+#   "optional" for steps which run on a GPU unless the step's gpu_enabled setting is false. GPU
+#   steps get the GPU resource and count, and the GPU mode CPU/memory defaults.
+STEP_RESOURCES = [
+    ("setup", [], "never"),
+    ("match_photos", [], "optional"),
+    ("align_cameras", [], "never"),
+    ("build_depth_maps", [], "always"),
+    ("build_point_cloud", [], "never"),
+    ("build_mesh", [], "optional"),
+    ("build_dem_orthomosaic", [], "never"),
+    ("match_photos_secondary", ["match_photos"], "optional"),
+    ("align_cameras_secondary", ["align_cameras"], "never"),
+    ("finalize", [], "never"),
+]
+
+# Config sections whose enabled flags enable each workflow step. The step runs if any of them is
+# enabled. Setup and finalize always run, so are not included.
+STEP_ENABLED_SECTIONS = {
+    "match_photos": ["match_photos"],
+    "align_cameras": ["align_cameras"],
+    "build_depth_maps": ["build_depth_maps"],
+    "build_point_cloud": ["build_point_cloud"],
+    "build_mesh": ["build_mesh"],
+    # build_dem_orthomosaic runs if either DEM or orthomosaic is enabled
+    "build_dem_orthomosaic": ["build_dem", "build_orthomosaic"],
+}
+
 
 def get_nested(d: Dict[str, Any], keys: List[str], default: Any = None) -> Any:
     """
@@ -104,49 +167,6 @@ def validate_project_name(name: str) -> None:
         )
 
 
-def load_completion_log(log_path: str) -> Dict[str, Set[str]]:
-    """
-    Load completion log and return lookup table.
-
-    Supports both the current 'phase' field and the legacy 'completion_level' field
-    for backward compatibility with existing logs.
-
-    Args:
-        log_path: Path to JSON Lines completion log
-
-    Returns:
-        Dict mapping project_name -> set of completed phases
-        (e.g., {"project-A": {"metashape", "postprocess"}})
-    """
-    completions: Dict[str, Set[str]] = {}
-    if not os.path.exists(log_path):
-        return completions
-
-    with open(log_path, "r") as f:
-        for line_num, line in enumerate(f, 1):
-            line = line.strip()
-            if not line:
-                continue
-            try:
-                entry = json.loads(line)
-                project_name = entry["project_name"]
-                # Support both 'phase' (current) and 'completion_level' (legacy)
-                phase = entry.get("phase") or entry.get("completion_level")
-                if phase is None:
-                    raise KeyError("Missing 'phase' or 'completion_level' field")
-                # Add phase to set of completed phases
-                if project_name not in completions:
-                    completions[project_name] = set()
-                completions[project_name].add(phase)
-            except (json.JSONDecodeError, KeyError) as e:
-                print(
-                    f"Warning: Skipping malformed line {line_num} in completion log: {e}",
-                    file=sys.stderr,
-                )
-
-    return completions
-
-
 def should_skip_project(
     project_name: str,
     completions: Dict[str, Set[str]],
@@ -157,7 +177,7 @@ def should_skip_project(
 
     Args:
         project_name: Project identifier
-        completions: Completion lookup from load_completion_log()
+        completions: Completion lookup from load_completions()
         phase: The phase to check for completion (e.g., "metashape", "postprocess")
 
     Returns:
@@ -177,7 +197,7 @@ def should_include_project(
 
     Args:
         project_name: Project identifier
-        completions: Completion lookup from load_completion_log()
+        completions: Completion lookup from load_completions()
         require_phase: Required phase (e.g., "metashape"). None means no requirement.
 
     Returns:
@@ -190,12 +210,278 @@ def should_include_project(
     return require_phase in completed_phases
 
 
-def process_config_file(config_path: str) -> Dict[str, Any]:
+def load_config(
+    config_path: str, config_cache: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    Load a YAML config file, reusing the parsed config from the cache if the file is unchanged.
+
+    Args:
+        config_path: Path to config file
+        config_cache: Optional cache from load_config_cache(). Parsed configs are added to it.
+
+    Returns:
+        The parsed config
+    """
+    key, text = read_config_text(config_path, config_cache)
+    if text is None:
+        return config_cache[key]
+    config = parse_config_text(text)
+    if config_cache is not None:
+        config_cache[key] = config
+    return config
+
+
+def read_config_text(
+    config_path: str, config_cache: Optional[Dict[str, Any]] = None
+) -> Tuple[Optional[Tuple[str, int, int]], Optional[str]]:
+    """
+    Read a config file, unless the cache already has the parsed config. This only does the file
+    I/O, so that it can be run in threads.
+
+    Args:
+        config_path: Path to config file
+        config_cache: Optional cache from load_config_cache()
+
+    Returns:
+        The cache key of the file (None without a cache), and the contents of the file (None if
+        the parsed config is in the cache)
+    """
+    if config_cache is None:
+        with open(config_path, "r") as cf:
+            return None, cf.read()
+
+    # A file with the same modification time and size is assumed to be unchanged
+    stat = os.stat(config_path)
+    key = (os.path.abspath(config_path), stat.st_mtime_ns, stat.st_size)
+    if key in config_cache:
+        return key, None
+    with open(config_path, "r") as cf:
+        return key, cf.read()
+
+
+def parse_config_text(text: str) -> Any:
+    """
+    Parse the contents of a YAML config file.
+
+    Args:
+        text: Contents of the config file
+
+    Returns:
+        The parsed config
+    """
+    return yaml.load(text, Loader=YAML_LOADER)
+
+
+def capture_exception(func: Callable[..., Any], *args: Any) -> Any:
+    """
+    Call a function, returning any exception it raises instead of raising it. This lets a pool
+    map continue past failed items.
+
+    Args:
+        func: Function to call
+        *args: Arguments to the function
+
+    Returns:
+        The return value of the function, or the exception it raised
+    """
+    try:
+        return func(*args)
+    except Exception as e:
+        return e
+
+
+def load_configs(
+    config_paths: List[str],
+    config_cache: Optional[Dict[str, Any]] = None,
+    n_workers: int = 1,
+) -> List[Any]:
+    """
+    Load many YAML config files in parallel. The files are read in a thread pool, since reading
+    them from a network share is dominated by latency, and then parsed in a process pool if there
+    are enough of them to be worth starting the processes.
+
+    Args:
+        config_paths: Paths to config files
+        config_cache: Optional cache from load_config_cache(). Parsed configs are added to it.
+        n_workers: Number of processes to parse the config files in
+
+    Returns:
+        For each config path, in the same order, the parsed config or the exception raised while
+        reading or parsing it
+    """
+    with ThreadPoolExecutor(CONFIG_READ_THREADS) as executor:
+        reads = list(
+            executor.map(
+                capture_exception,
+                repeat(read_config_text),
+                config_paths,
+                repeat(config_cache),
+            )
+        )
+
+    configs: List[Any] = [None] * len(config_paths)
+    to_parse = []
+    for i, read in enumerate(reads):
+        if isinstance(read, Exception):
+            configs[i] = read
+        elif read[1] is None:
+            configs[i] = config_cache[read[0]]
+        else:
+            to_parse.append(i)
+
+    texts = [reads[i][1] for i in to_parse]
+    if n_workers > 1 and len(texts) >= MIN_CONFIGS_FOR_PROCESS_POOL:
+        with ProcessPoolExecutor(n_workers) as executor:
+            parsed = list(
+                executor.map(
+                    capture_exception,
+                    repeat(parse_config_text),
+                    texts,
+                    chunksize=max(1, len(texts) // (n_workers * 4)),
+                )
+            )
+    else:
+        parsed = [capture_exception(parse_config_text, text) for text in texts]
+
+    for i, config in zip(to_parse, parsed):
+        configs[i] = config
+        if config_cache is not None and not isinstance(config, Exception):
+            config_cache[reads[i][0]] = config
+    return configs
+
+
+def load_config_cache(cache_path: str) -> Dict[str, Any]:
+    """
+    Load the cache of parsed config files. The cache is a JSON file, mapping "path|mtime|size" of
+    each config file to the parsed config, so reading it can't run code and doesn't depend on the
+    Python version.
+
+    Args:
+        cache_path: Path to the cache file. It doesn't need to exist yet.
+
+    Returns:
+        Dict mapping (path, mtime, size) of each config file to the parsed config. Empty if the
+        cache file doesn't exist or can't be read.
+    """
+    if not os.path.exists(cache_path):
+        return {}
+    try:
+        with open(cache_path, "r") as f:
+            cached = json.load(f)
+        config_cache = {}
+        for key, config in cached.items():
+            path, mtime, size = key.rsplit("|", 2)
+            config_cache[(path, int(mtime), int(size))] = config
+        return config_cache
+    except Exception as e:
+        print(
+            f"Warning: Ignoring unreadable config cache {cache_path}: {e}",
+            file=sys.stderr,
+        )
+        return {}
+
+
+def save_config_cache(cache_path: str, config_cache: Dict[str, Any]) -> None:
+    """
+    Save the cache of parsed config files. Only the latest version of each config file is kept.
+    Configs which JSON can't represent exactly, such as those with dates or non-string keys, are
+    not cached, so they are parsed again on the next run.
+
+    Args:
+        cache_path: Path to the cache file
+        config_cache: Cache from load_config_cache(), with any newly parsed configs
+    """
+    latest = {}
+    for key in sorted(config_cache.keys()):
+        latest[key[0]] = key
+
+    cached = {}
+    for key in latest.values():
+        try:
+            config_json = json.dumps(config_cache[key])
+        except (TypeError, ValueError):
+            continue
+        if json.loads(config_json) == config_cache[key]:
+            cached["|".join(map(str, key))] = config_cache[key]
+
+    # Write to a temporary file first, so concurrent runs never read a partial cache
+    os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(cached, f)
+    os.replace(tmp_path, cache_path)
+
+
+def resolve_step_resources(
+    argo_config: Any, step: str, fallback_steps: List[str], gpu_mode: str
+) -> Dict[str, Any]:
+    """
+    Resolve the resource settings of one workflow step. Each setting is the first one which is set
+    of the step's own argo setting, the settings of its fallback steps, the user default from the
+    argo.defaults section, and the hardcoded default.
+
+    Args:
+        argo_config: The argo section of the config
+        step: Name of the step
+        fallback_steps: Steps whose settings are used when the step doesn't set one
+        gpu_mode: "never", "always", or "optional", see STEP_RESOURCES
+
+    Returns:
+        Dictionary of the step's resource parameters, prefixed with the step name
+    """
+    steps = [step] + fallback_steps
+
+    def resolve(setting: str, default: Any) -> Any:
+        for s in steps:
+            value = get_nested(argo_config, [s, setting])
+            if value:
+                return value
+        return get_nested(argo_config, ["defaults", setting]) or default
+
+    resources = {}
+    use_gpu = gpu_mode == "always"
+    if gpu_mode == "optional":
+        # An unset gpu_enabled means the GPU is used, but only the last fallback step's setting
+        # is used as is if it's explicitly set to false
+        use_gpu = None
+        for s in steps[:-1]:
+            value = get_nested(argo_config, [s, "gpu_enabled"])
+            if value:
+                use_gpu = str_to_bool(value)
+                break
+        if use_gpu is None:
+            use_gpu = str_to_bool(
+                get_nested(argo_config, [steps[-1], "gpu_enabled"], True)
+            )
+        resources[f"{step}_use_gpu"] = use_gpu
+
+    if gpu_mode != "never":
+        resources[f"{step}_gpu_resource"] = resolve(
+            "gpu_resource", DEFAULT_GPU_RESOURCE
+        )
+        resources[f"{step}_gpu_count"] = resolve("gpu_count", DEFAULT_GPU_COUNT)
+
+    resources[f"{step}_cpu_request"] = resolve(
+        "cpu_request",
+        DEFAULT_CPU_REQUEST_GPU_MODE if use_gpu else DEFAULT_CPU_REQUEST_CPU_MODE,
+    )
+    resources[f"{step}_memory_request"] = resolve(
+        "memory_request",
+        DEFAULT_MEMORY_REQUEST_GPU_MODE if use_gpu else DEFAULT_MEMORY_REQUEST_CPU_MODE,
+    )
+    return resources
+
+
+def process_config_file(
+    config_path: str, config_cache: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
     """
     Process a single mission config file and extract mission parameters.
 
     Args:
         config_path: Absolute path to config file
+        config_cache: Optional cache of parsed configs from load_config_cache()
 
     Returns:
         Dictionary of mission parameters with enabled flags
@@ -204,9 +490,24 @@ def process_config_file(config_path: str) -> Dict[str, Any]:
         ValueError: If config file uses Phase 1 format (not compatible with step-based workflow)
     """
     # Load config file (expecting absolute path)
-    with open(config_path, "r") as cf:
-        config = yaml.safe_load(cf)
+    config = load_config(config_path, config_cache)
+    return build_mission(config_path, config)
+
 
+def build_mission(config_path: str, config: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Extract mission parameters from a parsed mission config.
+
+    Args:
+        config_path: Absolute path to config file
+        config: The parsed config
+
+    Returns:
+        Dictionary of mission parameters with enabled flags
+
+    Raises:
+        ValueError: If config file uses Phase 1 format (not compatible with step-based workflow)
+    """
     # Validate that this is a Phase 2 config
     # Phase 1 configs have 'alignPhotos' section, Phase 2 has separate 'match_photos' and 'align_cameras'
     if "alignPhotos" in config:
@@ -235,10 +536,8 @@ def process_config_file(config_path: str) -> Dict[str, Any]:
     argo_config = config.get("argo", {})
 
     # Extract imagery download settings from argo section
-    # FUTURE: Could implement download sharing between projects to save bandwidth.
-    # Would require: (1) download coordination/locking, (2) reference counting for cleanup,
-    # (3) handling projects that start days apart. Current approach downloads per-project
-    # to avoid these complexities and prevent storage issues from long-running workflows.
+    # Each project downloads its own copy of the imagery. When IMAGERY_CACHE_DIR is set for
+    # download_imagery.py, projects using the same zip share one download through the cache.
     imagery_downloads = argo_config.get("s3_imagery_zip_download", [])
     # Normalize single string to list
     if isinstance(imagery_downloads, str):
@@ -247,25 +546,6 @@ def process_config_file(config_path: str) -> Dict[str, Any]:
     if imagery_downloads is None:
         imagery_downloads = []
 
-    # Default GPU resource (full GPU). Can be overridden per-step with MIG resources like:
-    # "nvidia.com/mig-1g.5gb", "nvidia.com/mig-2g.10gb", "nvidia.com/mig-3g.20gb"
-    DEFAULT_GPU_RESOURCE = "nvidia.com/gpu"
-    DEFAULT_GPU_COUNT = 1
-
-    # Hardcoded defaults for CPU/memory requests
-    DEFAULT_CPU_REQUEST_CPU_MODE = "18"
-    DEFAULT_MEMORY_REQUEST_CPU_MODE = "100Gi"
-    DEFAULT_CPU_REQUEST_GPU_MODE = "4"
-    DEFAULT_MEMORY_REQUEST_GPU_MODE = "16Gi"
-
-    # Extract user-specified defaults from argo.defaults section (if present)
-    # These sit between step-specific values and hardcoded defaults in the fallback chain
-    user_cpu_default = get_nested(config, ["argo", "defaults", "cpu_request"])
-    user_memory_default = get_nested(config, ["argo", "defaults", "memory_request"])
-    user_gpu_resource_default = get_nested(config, ["argo", "defaults", "gpu_resource"])
-    user_gpu_count_default = get_nested(config, ["argo", "defaults", "gpu_count"])
-
-    # Apply translation logic from implementation plan
     mission = {
         "project_name": project_name,
         "config": config_path,
@@ -274,241 +554,32 @@ def process_config_file(config_path: str) -> Dict[str, Any]:
         "imagery_zip_downloads": imagery_downloads,
         # Boolean flags as lowercase strings for Argo workflow conditionals
         "imagery_download_enabled": str(len(imagery_downloads) > 0).lower(),
-        # Setup step resources
-        "setup_cpu_request": (
-            get_nested(config, ["argo", "setup", "cpu_request"])
-            or user_cpu_default
-            or DEFAULT_CPU_REQUEST_CPU_MODE
-        ),
-        "setup_memory_request": (
-            get_nested(config, ["argo", "setup", "memory_request"])
-            or user_memory_default
-            or DEFAULT_MEMORY_REQUEST_CPU_MODE
-        ),
-        # Step enabled flags (setup and finalize always run, so not included)
-        # Use actual Python booleans (not strings) so they serialize to JSON true/false
-        "match_photos_enabled": str_to_bool(
-            get_nested(config, ["match_photos", "enabled"], False)
-        ),
-        "match_photos_use_gpu": str_to_bool(
-            get_nested(config, ["argo", "match_photos", "gpu_enabled"], True)
-        ),
-        "match_photos_gpu_resource": (
-            get_nested(config, ["argo", "match_photos", "gpu_resource"])
-            or user_gpu_resource_default
-            or DEFAULT_GPU_RESOURCE
-        ),
-        "match_photos_gpu_count": (
-            get_nested(config, ["argo", "match_photos", "gpu_count"])
-            or user_gpu_count_default
-            or DEFAULT_GPU_COUNT
-        ),
-        "match_photos_cpu_request": (
-            get_nested(config, ["argo", "match_photos", "cpu_request"])
-            or user_cpu_default
-            or (
-                DEFAULT_CPU_REQUEST_GPU_MODE
-                if str_to_bool(
-                    get_nested(config, ["argo", "match_photos", "gpu_enabled"], True)
-                )
-                else DEFAULT_CPU_REQUEST_CPU_MODE
-            )
-        ),
-        "match_photos_memory_request": (
-            get_nested(config, ["argo", "match_photos", "memory_request"])
-            or user_memory_default
-            or (
-                DEFAULT_MEMORY_REQUEST_GPU_MODE
-                if str_to_bool(
-                    get_nested(config, ["argo", "match_photos", "gpu_enabled"], True)
-                )
-                else DEFAULT_MEMORY_REQUEST_CPU_MODE
-            )
-        ),
-        "align_cameras_enabled": str_to_bool(
-            get_nested(config, ["align_cameras", "enabled"], False)
-        ),
-        "align_cameras_cpu_request": (
-            get_nested(config, ["argo", "align_cameras", "cpu_request"])
-            or user_cpu_default
-            or DEFAULT_CPU_REQUEST_CPU_MODE
-        ),
-        "align_cameras_memory_request": (
-            get_nested(config, ["argo", "align_cameras", "memory_request"])
-            or user_memory_default
-            or DEFAULT_MEMORY_REQUEST_CPU_MODE
-        ),
-        "build_depth_maps_enabled": str_to_bool(
-            get_nested(config, ["build_depth_maps", "enabled"], False)
-        ),
-        "build_depth_maps_gpu_resource": (
-            get_nested(config, ["argo", "build_depth_maps", "gpu_resource"])
-            or user_gpu_resource_default
-            or DEFAULT_GPU_RESOURCE
-        ),
-        "build_depth_maps_gpu_count": (
-            get_nested(config, ["argo", "build_depth_maps", "gpu_count"])
-            or user_gpu_count_default
-            or DEFAULT_GPU_COUNT
-        ),
-        "build_depth_maps_cpu_request": (
-            get_nested(config, ["argo", "build_depth_maps", "cpu_request"])
-            or user_cpu_default
-            or DEFAULT_CPU_REQUEST_GPU_MODE
-        ),
-        "build_depth_maps_memory_request": (
-            get_nested(config, ["argo", "build_depth_maps", "memory_request"])
-            or user_memory_default
-            or DEFAULT_MEMORY_REQUEST_GPU_MODE
-        ),
-        "build_point_cloud_enabled": str_to_bool(
-            get_nested(config, ["build_point_cloud", "enabled"], False)
-        ),
-        "build_point_cloud_cpu_request": (
-            get_nested(config, ["argo", "build_point_cloud", "cpu_request"])
-            or user_cpu_default
-            or DEFAULT_CPU_REQUEST_CPU_MODE
-        ),
-        "build_point_cloud_memory_request": (
-            get_nested(config, ["argo", "build_point_cloud", "memory_request"])
-            or user_memory_default
-            or DEFAULT_MEMORY_REQUEST_CPU_MODE
-        ),
-        "build_mesh_enabled": str_to_bool(
-            get_nested(config, ["build_mesh", "enabled"], False)
-        ),
-        "build_mesh_use_gpu": str_to_bool(
-            get_nested(config, ["argo", "build_mesh", "gpu_enabled"], True)
-        ),
-        "build_mesh_gpu_resource": (
-            get_nested(config, ["argo", "build_mesh", "gpu_resource"])
-            or user_gpu_resource_default
-            or DEFAULT_GPU_RESOURCE
-        ),
-        "build_mesh_gpu_count": (
-            get_nested(config, ["argo", "build_mesh", "gpu_count"])
-            or user_gpu_count_default
-            or DEFAULT_GPU_COUNT
-        ),
-        "build_mesh_cpu_request": (
-            get_nested(config, ["argo", "build_mesh", "cpu_request"])
-            or user_cpu_default
-            or (
-                DEFAULT_CPU_REQUEST_GPU_MODE
-                if str_to_bool(
-                    get_nested(config, ["argo", "build_mesh", "gpu_enabled"], True)
-                )
-                else DEFAULT_CPU_REQUEST_CPU_MODE
-            )
-        ),
-        "build_mesh_memory_request": (
-            get_nested(config, ["argo", "build_mesh", "memory_request"])
-            or user_memory_default
-            or (
-                DEFAULT_MEMORY_REQUEST_GPU_MODE
-                if str_to_bool(
-                    get_nested(config, ["argo", "build_mesh", "gpu_enabled"], True)
-                )
-                else DEFAULT_MEMORY_REQUEST_CPU_MODE
-            )
-        ),
-        # build_dem_orthomosaic runs if either DEM or orthomosaic is enabled
-        "build_dem_orthomosaic_enabled": (
-            str_to_bool(get_nested(config, ["build_dem", "enabled"], False))
-            or str_to_bool(get_nested(config, ["build_orthomosaic", "enabled"], False))
-        ),
-        "build_dem_orthomosaic_cpu_request": (
-            get_nested(config, ["argo", "build_dem_orthomosaic", "cpu_request"])
-            or user_cpu_default
-            or DEFAULT_CPU_REQUEST_CPU_MODE
-        ),
-        "build_dem_orthomosaic_memory_request": (
-            get_nested(config, ["argo", "build_dem_orthomosaic", "memory_request"])
-            or user_memory_default
-            or DEFAULT_MEMORY_REQUEST_CPU_MODE
-        ),
-        # Secondary photo processing runs if photo_path_secondary is non-empty
-        "match_photos_secondary_enabled": bool(
-            get_nested(config, ["project", "photo_path_secondary"], "")
-        ),
-        # Secondary inherits from primary unless explicitly overridden (4-level fallback)
-        "match_photos_secondary_use_gpu": str_to_bool(
-            get_nested(config, ["argo", "match_photos_secondary", "gpu_enabled"])
-            or get_nested(config, ["argo", "match_photos", "gpu_enabled"], True)
-        ),
-        "match_photos_secondary_gpu_resource": (
-            get_nested(config, ["argo", "match_photos_secondary", "gpu_resource"])
-            or get_nested(config, ["argo", "match_photos", "gpu_resource"])
-            or user_gpu_resource_default
-            or DEFAULT_GPU_RESOURCE
-        ),
-        "match_photos_secondary_gpu_count": (
-            get_nested(config, ["argo", "match_photos_secondary", "gpu_count"])
-            or get_nested(config, ["argo", "match_photos", "gpu_count"])
-            or user_gpu_count_default
-            or DEFAULT_GPU_COUNT
-        ),
-        "match_photos_secondary_cpu_request": (
-            get_nested(config, ["argo", "match_photos_secondary", "cpu_request"])
-            or get_nested(config, ["argo", "match_photos", "cpu_request"])
-            or user_cpu_default
-            or (
-                DEFAULT_CPU_REQUEST_GPU_MODE
-                if str_to_bool(
-                    get_nested(
-                        config, ["argo", "match_photos_secondary", "gpu_enabled"]
-                    )
-                    or get_nested(config, ["argo", "match_photos", "gpu_enabled"], True)
-                )
-                else DEFAULT_CPU_REQUEST_CPU_MODE
-            )
-        ),
-        "match_photos_secondary_memory_request": (
-            get_nested(config, ["argo", "match_photos_secondary", "memory_request"])
-            or get_nested(config, ["argo", "match_photos", "memory_request"])
-            or user_memory_default
-            or (
-                DEFAULT_MEMORY_REQUEST_GPU_MODE
-                if str_to_bool(
-                    get_nested(
-                        config, ["argo", "match_photos_secondary", "gpu_enabled"]
-                    )
-                    or get_nested(config, ["argo", "match_photos", "gpu_enabled"], True)
-                )
-                else DEFAULT_MEMORY_REQUEST_CPU_MODE
-            )
-        ),
-        "align_cameras_secondary_enabled": bool(
-            get_nested(config, ["project", "photo_path_secondary"], "")
-        ),
-        "align_cameras_secondary_cpu_request": (
-            get_nested(config, ["argo", "align_cameras_secondary", "cpu_request"])
-            or get_nested(config, ["argo", "align_cameras", "cpu_request"])
-            or user_cpu_default
-            or DEFAULT_CPU_REQUEST_CPU_MODE
-        ),
-        "align_cameras_secondary_memory_request": (
-            get_nested(config, ["argo", "align_cameras_secondary", "memory_request"])
-            or get_nested(config, ["argo", "align_cameras", "memory_request"])
-            or user_memory_default
-            or DEFAULT_MEMORY_REQUEST_CPU_MODE
-        ),
-        # Finalize step resources
-        "finalize_cpu_request": (
-            get_nested(config, ["argo", "finalize", "cpu_request"])
-            or user_cpu_default
-            or DEFAULT_CPU_REQUEST_CPU_MODE
-        ),
-        "finalize_memory_request": (
-            get_nested(config, ["argo", "finalize", "memory_request"])
-            or user_memory_default
-            or DEFAULT_MEMORY_REQUEST_CPU_MODE
-        ),
-        "s3_imagery_subset_path": get_nested(
-            config, ["argo", "s3_imagery_subset_path"], ""
-        ),
     }
 
+    # Step enabled flags
+    # Use actual Python booleans (not strings) so they serialize to JSON true/false
+    for step, sections in STEP_ENABLED_SECTIONS.items():
+        mission[f"{step}_enabled"] = any(
+            str_to_bool(get_nested(config, [section, "enabled"], False))
+            for section in sections
+        )
+    # Secondary photo processing runs if photo_path_secondary is non-empty
+    secondary_enabled = bool(
+        get_nested(config, ["project", "photo_path_secondary"], "")
+    )
+    mission["match_photos_secondary_enabled"] = secondary_enabled
+    mission["align_cameras_secondary_enabled"] = secondary_enabled
+
+    # Step resources
+    for step, fallback_steps, gpu_mode in STEP_RESOURCES:
+        mission.update(
+            resolve_step_resources(argo_config, step, fallback_steps, gpu_mode)
+        )
+
+    mission["s3_imagery_subset_path"] = get_nested(
+        config, ["argo", "s3_imagery_subset_path"], ""
+    )
+
     return mission
 
 
@@ -519,6 +590,9 @@ def main(
     phase: Optional[str] = None,
     skip_if_complete: bool = False,
     require_phase: Optional[str] = None,
+    config_cache_path: Optional[str] = None,
+    n_workers: int = DEFAULT_PARSE_WORKERS,
+    collect_errors: bool = False,
 ) -> None:
     """
     Main entry point for preprocessing script.
@@ -536,6 +610,14 @@ def main(
             Required when --skip-if-complete is used.
         skip_if_complete: If True, skip projects that already completed the given phase.
         require_phase: Only include projects that have completed this phase.
+        config_cache_path: Optional path to a cache of parsed config files, which is updated with
+            any configs which were parsed.
+        n_workers: Number of processes to parse config files in.
+        collect_errors: If True, process all configs and report every config which failed
+            together, instead of stopping at the first one.
+
+    Raises:
+        RuntimeError: If collect_errors is True and any config could not be processed
     """
     if skip_if_complete and not phase:
         raise ValueError("--phase is required when --skip-if-complete is used")
@@ -543,7 +625,7 @@ def main(
     # Load completion log if needed for skip or require-phase logic
     completions: Dict[str, Set[str]] = {}
     if completion_log and (skip_if_complete or require_phase is not None):
-        completions = load_completion_log(completion_log)
+        completions = load_completions(completion_log)
         print(
             f"Loaded {len(completions)} project completion records from log",
             file=sys.stderr,
@@ -576,51 +658,70 @@ def main(
             else:
                 config_paths.append(os.path.join(config_list_dir, line))
 
-    seen_names = set()
+    config_cache = None
+    if config_cache_path:
+        config_cache = load_config_cache(config_cache_path)
+        n_cached = len(config_cache)
 
-    for config_path in config_paths:
-        try:
-            mission = process_config_file(config_path)
-
-            # Check for duplicate project names
-            name = mission["project_name"]
-            if name in seen_names:
-                print(
-                    f"Warning: Dropping duplicate project '{name}' "
-                    f"from config '{config_path}'",
-                    file=sys.stderr,
-                )
-                continue
-            seen_names.add(name)
-
-            # Check if should skip based on completion status (phase guaranteed non-None by earlier validation)
-            if (
-                skip_if_complete
-                and phase
-                and should_skip_project(name, completions, phase)
-            ):
-                phases = completions.get(name, set())
-                phases_str = ", ".join(sorted(phases)) if phases else "unknown"
-                print(
-                    f"Skipping {name}: already complete (phases: {phases_str})",
-                    file=sys.stderr,
-                )
-                skipped_count += 1
-                continue
+    # Read and parse the configs in parallel, then apply the gates in list order
+    configs = load_configs(config_paths, config_cache, n_workers)
 
-            # Check require-phase gate
-            if not should_include_project(name, completions, require_phase):
-                print(
-                    f"Excluding {name}: required phase '{require_phase}' not met",
-                    file=sys.stderr,
-                )
-                excluded_count += 1
-                continue
+    seen_names = set()
+    errors = []
 
-            missions.append(mission)
+    for config_path, config in zip(config_paths, configs):
+        try:
+            if isinstance(config, Exception):
+                raise config
+            mission = build_mission(config_path, config)
         except Exception as e:
             print(f"Error processing config {config_path}: {e}", file=sys.stderr)
-            raise
+            if not collect_errors:
+                raise
+            errors.append(config_path)
+            continue
+
+        # Check for duplicate project names
+        name = mission["project_name"]
+        if name in seen_names:
+            print(
+                f"Warning: Dropping duplicate project '{name}' "
+                f"from config '{config_path}'",
+                file=sys.stderr,
+            )
+            continue
+        seen_names.add(name)
+
+        # Check if should skip based on completion status (phase guaranteed non-None by earlier validation)
+        if skip_if_complete and phase and should_skip_project(name, completions, phase):
+            phases = completions.get(name, set())
+            phases_str = ", ".join(sorted(phases)) if phases else "unknown"
+            print(
+                f"Skipping {name}: already complete (phases: {phases_str})",
+                file=sys.stderr,
+            )
+            skipped_count += 1
+            continue
+
+        # Check require-phase gate
+        if not should_include_project(name, completions, require_phase):
+            print(
+                f"Excluding {name}: required phase '{require_phase}' not met",
+                file=sys.stderr,
+            )
+            excluded_count += 1
+            continue
+
+        missions.append(mission)
+
+    if config_cache_path and len(config_cache) != n_cached:
+        save_config_cache(config_cache_path, config_cache)
+
+    if errors:
+        raise RuntimeError(
+            f"{len(errors)} of {len(config_paths)} config files could not be processed:\n"
+            + "\n".join(f"  {config_path}" for config_path in errors)
+        )
 
     print(
         f"Processing {len(missions)} projects, "
@@ -704,6 +805,25 @@ Examples:
         default=None,
         help="Only include projects that have completed the given phase",
     )
+    parser.add_argument(
+        "--config-cache",
+        default=None,
+        help="Path to a cache of parsed config files. Configs whose modification time and size "
+        "are unchanged since they were cached are not parsed again.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=DEFAULT_PARSE_WORKERS,
+        help="Number of processes to parse config files in "
+        f"(default: {DEFAULT_PARSE_WORKERS})",
+    )
+    parser.add_argument(
+        "--collect-errors",
+        action="store_true",
+        help="Process all config files and report every one which failed together, instead "
+        "of stopping at the first one",
+    )
 
     args = parser.parse_args()
 
@@ -714,4 +834,7 @@ Examples:
         phase=args.phase,
         skip_if_complete=args.skip_if_complete == "true",
         require_phase=args.require_phase,
+        config_cache_path=args.config_cache,
+        n_workers=args.workers,
+        collect_errors=args.collect_errors,
     )
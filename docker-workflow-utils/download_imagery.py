@@ -2,9 +2,15 @@
 """
 Download and extract imagery zip files from S3 for photogrammetry workflow.
 
-This script downloads zip files containing imagery from S3 using rclone,
-extracts them to a project-specific directory, and cleans up the zip files
-to save space.
+By default, the members of each zip file are streamed directly from S3 into
+a project-specific directory using range requests, so the zip file itself is
+never written to disk. Each member is checked against its CRC before it is
+moved into place, and members which are already extracted are skipped, so an
+interrupted extraction resumes with the missing members. Alternatively, the zip
+files can be downloaded, extracted, and then deleted. Downloads are made in
+chunks which are tracked in a state file, so an interrupted download resumes
+where it stopped, and they are verified against the S3 ETag before use. The
+ETag only applies to the whole zip file, so it is not checked when streaming.
 
 Usage:
     python download_imagery.py
@@ -14,36 +20,66 @@ Environment Variables:
                       Paths should be in format 'bucket/path/to/file.zip' without remote prefix.
                       The S3 connection is configured via the credentials below.
     DOWNLOAD_DIR: Directory for downloads (e.g., '{TEMP_WORKING_DIR}/{workflow_name}/{iteration_id}/photogrammetry/downloaded-raw-imagery')
-    S3_PROVIDER: S3 provider for rclone (e.g., 'Ceph', 'AWS')
     S3_ENDPOINT: S3 endpoint URL
     S3_ACCESS_KEY: S3 access key ID
     S3_SECRET_KEY: S3 secret access key
+    DOWNLOAD_CONCURRENCY: Number of zip files to download and extract at once (default: 2)
+    EXTRACT_MODE: 'stream' to extract directly from S3, or 'download' to download each zip and
+                  then extract it (default: 'stream')
+    EXTRACT_THREADS: Number of members of each zip file streamed at once (default: 8)
+    IMAGERY_CACHE_DIR: If set, extracted zip files are cached in this directory, keyed by their S3
+                       ETag, and hardlinked into DOWNLOAD_DIR. This lets projects which use the same
+                       imagery share one download. It should be on the same volume as DOWNLOAD_DIR.
+    IMAGERY_CACHE_MAX_GB: Size of the cache above which the least recently used entries are
+                          removed (default: 500)
 
 Output:
     Prints the download directory path to stdout on success.
     Exits with non-zero status on failure.
 """
 
+import base64
+import errno
+import fcntl
+import hashlib
+import io
 import json
 import os
+import shutil
+import struct
 import subprocess
 import sys
+import time
+import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import List
-
-
-def get_s3_flags() -> List[str]:
-    """Build common S3 authentication flags for rclone commands."""
-    return [
-        "--s3-provider",
-        os.environ.get("S3_PROVIDER", ""),
-        "--s3-endpoint",
-        os.environ.get("S3_ENDPOINT", ""),
-        "--s3-access-key-id",
-        os.environ.get("S3_ACCESS_KEY", ""),
-        "--s3-secret-access-key",
-        os.environ.get("S3_SECRET_KEY", ""),
-    ]
+from typing import Dict, List, Optional, Set, Tuple
+
+import boto3
+from botocore.config import Config
+
+# How many zip files are downloaded and extracted at once, unless set by DOWNLOAD_CONCURRENCY. While
+# one zip is being extracted, the next one is already downloading.
+DEFAULT_DOWNLOAD_CONCURRENCY = 2
+# How many members of one zip file are streamed from S3 at once, unless set by EXTRACT_THREADS
+DEFAULT_EXTRACT_THREADS = 8
+# Downloads are split into chunks of this size. Only whole chunks are recorded as complete, so at
+# most this much per thread is downloaded again when an interrupted download is resumed.
+DOWNLOAD_CHUNK_SIZE = 64 * 1024 * 1024
+# How many chunks of one file are downloaded at once
+DOWNLOAD_THREADS = 8
+# Part sizes commonly used by S3 clients for multipart uploads, used to verify multipart ETags
+MULTIPART_PART_SIZES_MB = [5, 8, 10, 16, 32, 50, 64, 100, 128, 256, 512]
+# Size of the chunks read from S3 and decompressed when streaming a member
+STREAM_CHUNK_SIZE = 8 * 1024 * 1024
+# The end of central directory record, including a comment of up to 64 KiB, and the zip64 locator
+# which precedes it are always within this many bytes of the end of a zip file
+ZIP_TAIL_BYTES = 22 + 65535 + 20
+# Size of the imagery cache above which entries are evicted, unless set by IMAGERY_CACHE_MAX_GB
+DEFAULT_IMAGERY_CACHE_MAX_GB = 500
+# Written in a cache entry once it is fully extracted, recording the source and size
+CACHE_COMPLETE_FILE = ".complete.json"
 
 
 def extract_filename_from_url(url: str) -> str:
@@ -61,68 +97,270 @@ def extract_filename_from_url(url: str) -> str:
     return url.rstrip("/").split("/")[-1]
 
 
-def download_s3(s3_path: str, download_dir: str) -> str:
+def compute_s3_etags(
+    path: str, part_sizes: List[Optional[int]]
+) -> Dict[Optional[int], str]:
+    """
+    Compute the ETags S3 would assign to a file uploaded in a single part, or in parts of each of
+    the given sizes. The file is read once, however many part sizes there are.
+
+    Args:
+        path: Path to the local file
+        part_sizes: Sizes of the parts in bytes, with None for a single part upload
+
+    Returns:
+        Dict mapping each part size to the ETag, which is the MD5 of the file for a single part, or
+        the MD5 of the concatenated MD5s of the parts followed by the number of parts
+    """
+    size = os.path.getsize(path)
+    # For each part size, the MD5s of the completed parts, the MD5 of the current part, and the
+    # number of bytes in the current part
+    parts = {
+        part_size: ([], hashlib.md5(), 0) for part_size in dict.fromkeys(part_sizes)
+    }
+    with open(path, "rb") as f:
+        while True:
+            block = memoryview(f.read(STREAM_CHUNK_SIZE))
+            if len(block) == 0:
+                break
+            for part_size, (part_md5s, md5, n_bytes) in parts.items():
+                part_length = part_size or max(size, 1)
+                # Split the block at the part boundaries
+                start = 0
+                while start < len(block):
+                    end = min(len(block), start + part_length - n_bytes)
+                    md5.update(block[start:end])
+                    n_bytes += end - start
+                    start = end
+                    if n_bytes == part_length:
+                        part_md5s.append(md5)
+                        md5, n_bytes = hashlib.md5(), 0
+                parts[part_size] = (part_md5s, md5, n_bytes)
+
+    etags = {}
+    for part_size, (part_md5s, md5, n_bytes) in parts.items():
+        # An empty file is a single empty part
+        if n_bytes > 0 or len(part_md5s) == 0:
+            part_md5s.append(md5)
+        if part_size is None:
+            etags[part_size] = part_md5s[0].hexdigest()
+        else:
+            combined = hashlib.md5(b"".join(md5.digest() for md5 in part_md5s))
+            etags[part_size] = f"{combined.hexdigest()}-{len(part_md5s)}"
+    return etags
+
+
+def verify_download(path: str, etag: str, metadata: dict) -> bool:
+    """
+    Check a downloaded file against the checksum S3 has for it.
+
+    Args:
+        path: Path to the downloaded file
+        etag: ETag of the S3 object, without quotes
+        metadata: User metadata of the S3 object. rclone stores the MD5 of files it uploads in
+            multiple parts as 'md5chksum'.
+
+    Returns:
+        True if the file matches, False if it does not match. If the ETag of a multipart upload
+        does not match for any common part size and there is no stored MD5, the file cannot be
+        checked, which is reported and treated as a mismatch.
+    """
+    if "md5chksum" in metadata:
+        expected_md5 = base64.b64decode(metadata["md5chksum"]).hex()
+        return compute_s3_etags(path, [None])[None] == expected_md5
+
+    if "-" not in etag:
+        return compute_s3_etags(path, [None])[None] == etag
+
+    # The part size of a multipart upload is not recorded, so try the sizes which give the same
+    # number of parts, starting with the smallest whole number of MB
+    n_parts = int(etag.split("-")[1])
+    size = os.path.getsize(path)
+    mb = 1024 * 1024
+    candidate_part_sizes = [-(-size // n_parts // mb) * mb] + [
+        part_size_mb * mb for part_size_mb in MULTIPART_PART_SIZES_MB
+    ]
+    candidate_part_sizes = [
+        part_size
+        for part_size in candidate_part_sizes
+        if part_size > 0 and -(-size // part_size) == n_parts
+    ]
+    if (
+        candidate_part_sizes
+        and etag in compute_s3_etags(path, candidate_part_sizes).values()
+    ):
+        return True
+
+    print(
+        f"  WARNING: {path} does not match {etag} for any of the part sizes "
+        f"{[part_size // mb for part_size in dict.fromkeys(candidate_part_sizes)]} MB"
+    )
+    return False
+
+
+def download_s3_chunk(
+    client, bucket: str, key: str, fd: int, start: int, end: int
+) -> None:
+    """
+    Download the bytes in [start, end) of an S3 object into the same position of an open file.
+    """
+    body = client.get_object(Bucket=bucket, Key=key, Range=f"bytes={start}-{end - 1}")[
+        "Body"
+    ]
+    offset = start
+    for piece in body.iter_chunks(STREAM_CHUNK_SIZE):
+        os.pwrite(fd, piece, offset)
+        offset += len(piece)
+    if offset != end:
+        raise IOError(f"Expected {end - start} bytes from {bucket}/{key} at {start}")
+
+
+def download_s3(s3_path: str, download_dir: str, show_progress: bool = True) -> str:
     """
-    Download a file from S3 using rclone.
+    Download a file from S3 in chunks, resuming an earlier interrupted download of the same file.
+    The file is written to a '.part' file, and the chunks which have been downloaded are recorded
+    in a '.state.json' file next to it. The state is discarded if the S3 object has changed since.
+    Once all chunks are downloaded, the file is verified against the S3 ETag and moved into place.
 
     Args:
         s3_path: S3 path to download (format: 'bucket/path/to/file.zip')
         download_dir: Local directory to download to
+        show_progress: Print progress as chunks complete. This should be disabled when several
+            downloads run at once, since their output would be interleaved.
 
     Returns:
         Local path to the downloaded file
 
     Raises:
-        subprocess.CalledProcessError: If download fails
+        ValueError: If the downloaded file does not match the S3 checksum, or cannot be checked
+            against it. The partial download is removed, so the next attempt starts from scratch.
     """
     filename = extract_filename_from_url(s3_path)
     local_path = os.path.join(download_dir, filename)
-
-    # Use rclone's on-the-fly backend syntax (:s3:) which configures the
-    # S3 backend using command-line flags rather than a config file.
-    # This avoids needing a pre-configured remote like "js2s3:".
-    rclone_url = f":s3:{s3_path}"
+    part_path = f"{local_path}.part"
+    state_path = f"{local_path}.state.json"
 
     print(f"Downloading: {s3_path}")
     print(f"  -> {local_path}")
 
-    cmd = [
-        "rclone",
-        "copyto",
-        rclone_url,
-        local_path,
-        "--progress",
-        "--transfers",
-        "8",
-        "--checkers",
-        "8",
-        "--retries",
-        "5",
-        "--retries-sleep",
-        "15s",
-        "--stats",
-        "30s",
-    ] + get_s3_flags()
-
-    subprocess.run(cmd, check=True)
-
-    # Verify download succeeded
-    if not os.path.exists(local_path):
-        raise FileNotFoundError(f"Download completed but file not found: {local_path}")
-
-    file_size = os.path.getsize(local_path)
-    print(f"  Downloaded: {file_size / (1024*1024):.1f} MB")
+    bucket, key = split_s3_path(s3_path)
+    client = get_s3_client(max_pool_connections=DOWNLOAD_THREADS)
+    head = client.head_object(Bucket=bucket, Key=key)
+    size = head["ContentLength"]
+    etag = head["ETag"].strip('"')
+
+    # Resume from an earlier attempt if it was downloading the same version of the object
+    state = {"etag": etag, "size": size, "chunk_size": DOWNLOAD_CHUNK_SIZE}
+    completed_chunks = set()
+    if os.path.exists(state_path) and os.path.exists(part_path):
+        with open(state_path, "r") as f:
+            previous_state = json.load(f)
+        if all(previous_state.get(k) == v for k, v in state.items()):
+            completed_chunks = set(previous_state["completed_chunks"])
+    if len(completed_chunks) == 0:
+        with open(part_path, "wb") as f:
+            f.truncate(size)
+
+    n_chunks = max(1, -(-size // DOWNLOAD_CHUNK_SIZE))
+    missing_chunks = [i for i in range(n_chunks) if i not in completed_chunks]
+    if len(completed_chunks) > 0:
+        print(
+            f"  Resuming: {len(completed_chunks)} of {n_chunks} chunks already downloaded"
+        )
+
+    with open(part_path, "r+b") as f, ThreadPoolExecutor(
+        max_workers=DOWNLOAD_THREADS
+    ) as executor:
+        futures = {
+            executor.submit(
+                download_s3_chunk,
+                client,
+                bucket,
+                key,
+                f.fileno(),
+                i * DOWNLOAD_CHUNK_SIZE,
+                min(size, (i + 1) * DOWNLOAD_CHUNK_SIZE),
+            ): i
+            for i in missing_chunks
+            if size > 0
+        }
+        for future in as_completed(futures):
+            future.result()
+            completed_chunks.add(futures[future])
+
+            # Record progress, replacing the state file atomically so it is never left truncated
+            with open(f"{state_path}.tmp", "w") as state_file:
+                json.dump(
+                    {**state, "completed_chunks": sorted(completed_chunks)}, state_file
+                )
+            os.replace(f"{state_path}.tmp", state_path)
+
+            if show_progress:
+                print(f"  {len(completed_chunks)} of {n_chunks} chunks downloaded")
+
+    if not verify_download(part_path, etag, head.get("Metadata", {})):
+        os.remove(part_path)
+        os.remove(state_path)
+        raise ValueError(f"Downloaded file does not match the checksum of {s3_path}")
+
+    os.replace(part_path, local_path)
+    if os.path.exists(state_path):
+        os.remove(state_path)
+
+    print(f"  Downloaded: {size / (1024*1024):.1f} MB")
 
     return local_path
 
 
-def extract_zip(zip_path: str, extract_dir: str) -> str:
+def is_in_subset(member_name: str, images_subset: Optional[Set[str]]) -> bool:
+    """
+    Check whether a zip member is one of the images to retain.
+
+    Args:
+        member_name: Path of the member within the zip file
+        images_subset: Image IDs to retain, which are the filenames minus the extension. None means
+            all images are retained.
+
+    Returns:
+        Whether the member should be extracted
+    """
+    return images_subset is None or Path(member_name).stem in images_subset
+
+
+def read_images_subset(s3_imagery_subset_path: str, download_dir: str) -> Set[str]:
+    """
+    Download and read the list of images to retain.
+
+    Args:
+        s3_imagery_subset_path: S3 path to a text file with one image ID per line. The image ID is
+            the filename, minus the extension. It contains the mission ID and is assumed to be
+            unique across all zip files.
+        download_dir: Local directory to temporarily download the file to
+
+    Returns:
+        The image IDs to retain
+    """
+    images_subset_file = download_s3(s3_imagery_subset_path, download_dir)
+
+    print(f"Trying to read from {images_subset_file}")
+    with open(images_subset_file, "r") as f:
+        images_subset = {line.strip() for line in f if line.strip()}
+    os.remove(images_subset_file)
+
+    print(f"  {len(images_subset)} images in subset")
+    return images_subset
+
+
+def extract_zip(
+    zip_path: str, extract_dir: str, images_subset: Optional[Set[str]] = None
+) -> str:
     """
     Extract a zip file to the specified directory.
 
     Args:
         zip_path: Path to the zip file
         extract_dir: Directory to extract to
+        images_subset: If provided, only extract the images with these IDs
 
     Returns:
         Path to the extraction directory
@@ -136,12 +374,24 @@ def extract_zip(zip_path: str, extract_dir: str) -> str:
     # Create extraction directory
     os.makedirs(extract_dir, exist_ok=True)
 
-    # Extract using unzip
-    # -o: overwrite without prompting
-    # -q: quiet mode (less verbose, but errors still shown)
-    cmd = ["unzip", "-o", "-q", zip_path, "-d", extract_dir]
+    if images_subset is None:
+        # Extract using unzip
+        # -o: overwrite without prompting
+        # -q: quiet mode (less verbose, but errors still shown)
+        cmd = ["unzip", "-o", "-q", zip_path, "-d", extract_dir]
 
-    subprocess.run(cmd, check=True)
+        subprocess.run(cmd, check=True)
+    else:
+        # The subset can be too large to pass to unzip as arguments, so extract the members which
+        # are in the subset directly
+        with zipfile.ZipFile(zip_path) as zip_file:
+            members = [
+                member
+                for member in zip_file.infolist()
+                if not member.is_dir() and is_in_subset(member.filename, images_subset)
+            ]
+            print(f"  Extracting {len(members)} of {len(zip_file.infolist())} members")
+            zip_file.extractall(extract_dir, members=members)
 
     print(f"  Extraction complete")
 
@@ -160,6 +410,594 @@ def delete_zip(zip_path: str) -> None:
         print(f"  Deleted zip: {zip_path}")
 
 
+def get_s3_client(max_pool_connections: int = 10):
+    """
+    Create a boto3 S3 client from the S3 credentials in the environment.
+
+    Args:
+        max_pool_connections: Maximum number of open connections, which should be at least the
+            number of threads using the client
+
+    Returns:
+        boto3 S3 client
+    """
+    return boto3.client(
+        "s3",
+        endpoint_url=os.environ.get("S3_ENDPOINT", "") or None,
+        aws_access_key_id=os.environ.get("S3_ACCESS_KEY", ""),
+        aws_secret_access_key=os.environ.get("S3_SECRET_KEY", ""),
+        config=Config(
+            max_pool_connections=max_pool_connections,
+            retries={"max_attempts": 5, "mode": "standard"},
+        ),
+    )
+
+
+def split_s3_path(s3_path: str) -> Tuple[str, str]:
+    """
+    Split an S3 path into the bucket and the key.
+
+    Args:
+        s3_path: S3 path in format 'bucket/path/to/file.zip'
+
+    Returns:
+        The bucket (e.g., 'bucket') and key (e.g., 'path/to/file.zip')
+    """
+    bucket, key = s3_path.strip("/").split("/", 1)
+    return bucket, key
+
+
+def read_s3_range(client, bucket: str, key: str, start: int, end: int) -> bytes:
+    """Read the bytes in [start, end) of an S3 object."""
+    response = client.get_object(
+        Bucket=bucket, Key=key, Range=f"bytes={start}-{end - 1}"
+    )
+    return response["Body"].read()
+
+
+def read_s3_zip_members(
+    client, bucket: str, key: str
+) -> List[Tuple[zipfile.ZipInfo, int]]:
+    """
+    Read the list of members of a zip file on S3 from its central directory, without reading the
+    rest of the file.
+
+    Args:
+        client: boto3 S3 client
+        bucket: S3 bucket
+        key: Key of the zip file
+
+    Returns:
+        The members of the zip file in the order they are stored, each with the offset where the
+        member's data ends. The header_offset of each member is the offset of its local file
+        header within the S3 object.
+
+    Raises:
+        zipfile.BadZipFile: If the end of central directory record cannot be found
+    """
+    size = client.head_object(Bucket=bucket, Key=key)["ContentLength"]
+
+    # Find the central directory from the end of central directory record
+    tail_start = max(0, size - ZIP_TAIL_BYTES)
+    tail = read_s3_range(client, bucket, key, tail_start, size)
+    eocd_index = tail.rfind(b"PK\x05\x06")
+    if eocd_index < 0:
+        raise zipfile.BadZipFile(
+            f"End of central directory not found in {bucket}/{key}"
+        )
+    cd_size, cd_offset = struct.unpack("<II", tail[eocd_index + 12 : eocd_index + 20])
+
+    # Large archives store the real values in the zip64 end of central directory record, whose
+    # offset is given by the zip64 locator directly before the end of central directory record
+    if cd_size == 0xFFFFFFFF or cd_offset == 0xFFFFFFFF:
+        locator_index = eocd_index - 20
+        (zip64_eocd_offset,) = struct.unpack(
+            "<Q", tail[locator_index + 8 : locator_index + 16]
+        )
+        zip64_eocd = read_s3_range(
+            client, bucket, key, zip64_eocd_offset, zip64_eocd_offset + 56
+        )
+        cd_size, cd_offset = struct.unpack("<QQ", zip64_eocd[40:56])
+
+    # Parse everything from the start of the central directory to the end of the file. zipfile
+    # treats the missing start of the file like data prepended to the archive, so member offsets
+    # are shifted by cd_offset, which is corrected for below.
+    cd_and_tail = read_s3_range(client, bucket, key, cd_offset, size)
+    with zipfile.ZipFile(io.BytesIO(cd_and_tail)) as zip_file:
+        members = zip_file.infolist()
+
+    for member in members:
+        member.header_offset += cd_offset
+
+    # Each member's local header, data, and data descriptor are followed directly by the next
+    # member, or by the central directory for the last member
+    members = sorted(members, key=lambda member: member.header_offset)
+    end_offsets = [member.header_offset for member in members[1:]] + [cd_offset]
+    return list(zip(members, end_offsets))
+
+
+def is_extracted(path: str, member: zipfile.ZipInfo) -> bool:
+    """
+    Check whether a file is already the extracted member of a zip file, by its size and CRC.
+
+    Args:
+        path: Path of the extracted file, which may not exist
+        member: The zip member
+
+    Returns:
+        Whether the file exists and matches the member
+    """
+    if not os.path.isfile(path) or os.path.getsize(path) != member.file_size:
+        return False
+
+    crc = 0
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(STREAM_CHUNK_SIZE)
+            if len(chunk) == 0:
+                break
+            crc = zlib.crc32(chunk, crc)
+    return crc == member.CRC
+
+
+def extract_s3_zip_member(
+    client,
+    bucket: str,
+    key: str,
+    member: zipfile.ZipInfo,
+    end_offset: int,
+    extract_dir: str,
+) -> int:
+    """
+    Stream one member of a zip file on S3 to its destination file, decompressing it on the fly.
+    The local header and data of the member are read with a single range request. The member is
+    written to a '.part' file, which is only moved into place once its CRC is checked, so an
+    existing destination file is always complete. If it already matches the member, e.g. from an
+    earlier interrupted extraction, it is kept and nothing is read.
+
+    Args:
+        client: boto3 S3 client
+        bucket: S3 bucket
+        key: Key of the zip file
+        member: The member to extract, from `read_s3_zip_members`
+        end_offset: Where the member ends in the zip file, from `read_s3_zip_members`
+        extract_dir: Directory to extract to
+
+    Returns:
+        Number of compressed bytes read from S3, which is 0 if the member was already extracted
+
+    Raises:
+        ValueError: If the member would be written outside of extract_dir
+        NotImplementedError: If the member is neither stored nor deflated
+        zipfile.BadZipFile: If the member's CRC does not match the extracted data
+    """
+    # Don't allow members to be written outside the extraction directory
+    extract_dir = os.path.realpath(extract_dir)
+    output_path = os.path.realpath(os.path.join(extract_dir, member.filename))
+    if not output_path.startswith(extract_dir + os.sep):
+        raise ValueError(f"Zip member {member.filename} is outside {extract_dir}")
+
+    if member.is_dir():
+        os.makedirs(output_path, exist_ok=True)
+        return 0
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+
+    if is_extracted(output_path, member):
+        return 0
+
+    if member.compress_type == zipfile.ZIP_DEFLATED:
+        decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+    elif member.compress_type == zipfile.ZIP_STORED:
+        decompressor = None
+    else:
+        raise NotImplementedError(
+            f"Unsupported compression {member.compress_type} for {member.filename}"
+        )
+
+    body = client.get_object(
+        Bucket=bucket,
+        Key=key,
+        Range=f"bytes={member.header_offset}-{end_offset - 1}",
+    )["Body"]
+
+    # The local file header has a fixed size part followed by the filename and an extra field,
+    # whose length may differ from the one in the central directory
+    header = body.read(30)
+    filename_length, extra_length = struct.unpack("<HH", header[26:30])
+    body.read(filename_length + extra_length)
+
+    part_path = f"{output_path}.part"
+    try:
+        crc = 0
+        remaining = member.compress_size
+        with open(part_path, "wb") as f:
+            while remaining > 0:
+                chunk = body.read(min(remaining, STREAM_CHUNK_SIZE))
+                if len(chunk) == 0:
+                    raise zipfile.BadZipFile(
+                        f"Unexpected end of data for {member.filename} in {bucket}/{key}"
+                    )
+                remaining -= len(chunk)
+                if decompressor is not None:
+                    chunk = decompressor.decompress(chunk)
+                crc = zlib.crc32(chunk, crc)
+                f.write(chunk)
+            if decompressor is not None:
+                chunk = decompressor.flush()
+                crc = zlib.crc32(chunk, crc)
+                f.write(chunk)
+
+        if crc != member.CRC:
+            raise zipfile.BadZipFile(
+                f"CRC mismatch for {member.filename} in {bucket}/{key}"
+            )
+    except BaseException:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise
+    finally:
+        body.close()
+
+    os.replace(part_path, output_path)
+
+    return member.compress_size
+
+
+def stream_extract_zip(
+    s3_path: str,
+    extract_dir: str,
+    n_threads: int,
+    images_subset: Optional[Set[str]] = None,
+) -> int:
+    """
+    Extract a zip file on S3 to the specified directory without downloading the zip file. Members
+    are streamed in parallel using range requests.
+
+    Args:
+        s3_path: S3 path of the zip file (format: 'bucket/path/to/file.zip')
+        extract_dir: Directory to extract to
+        n_threads: Number of members to stream at once
+        images_subset: If provided, only the images with these IDs are read and extracted
+
+    Returns:
+        Number of compressed bytes read from S3
+    """
+    print(f"Streaming: {s3_path}")
+    print(f"  -> {extract_dir}")
+
+    bucket, key = split_s3_path(s3_path)
+    client = get_s3_client(max_pool_connections=n_threads)
+
+    members = read_s3_zip_members(client, bucket, key)
+    n_members = len(members)
+    if images_subset is not None:
+        members = [
+            (member, end_offset)
+            for member, end_offset in members
+            if not member.is_dir() and is_in_subset(member.filename, images_subset)
+        ]
+    print(f"  Extracting {len(members)} of {n_members} members")
+
+    os.makedirs(extract_dir, exist_ok=True)
+
+    with ThreadPoolExecutor(max_workers=n_threads) as executor:
+        n_bytes = sum(
+            executor.map(
+                lambda member_and_end: extract_s3_zip_member(
+                    client, bucket, key, *member_and_end, extract_dir
+                ),
+                members,
+            )
+        )
+
+    print(f"  Extraction complete: {n_bytes / (1024*1024):.1f} MB read")
+
+    return n_bytes
+
+
+def fetch_and_extract_zip(
+    s3_path: str,
+    download_dir: str,
+    extract_dir: str,
+    show_progress: bool = True,
+    extract_mode: str = "stream",
+    n_extract_threads: int = DEFAULT_EXTRACT_THREADS,
+    images_subset: Optional[Set[str]] = None,
+) -> int:
+    """
+    Extract a zip file from S3. The members are either streamed directly from S3, or the zip file
+    is downloaded, extracted and deleted.
+
+    Args:
+        s3_path: S3 path to download (format: 'bucket/path/to/file.zip')
+        download_dir: Local directory to download the zip file to, if it is downloaded
+        extract_dir: Directory to extract to
+        show_progress: Print download progress
+        extract_mode: 'stream' to extract directly from S3 or 'download' to download the zip first
+        n_extract_threads: Number of members to stream at once when streaming
+        images_subset: If provided, only extract the images with these IDs
+
+    Returns:
+        Number of bytes read from S3
+    """
+    if extract_mode == "stream":
+        return stream_extract_zip(
+            s3_path, extract_dir, n_extract_threads, images_subset=images_subset
+        )
+
+    # Download the zip file
+    zip_path = download_s3(s3_path, download_dir, show_progress=show_progress)
+    zip_size = os.path.getsize(zip_path)
+
+    # Extract the zip file
+    extract_zip(zip_path, extract_dir, images_subset=images_subset)
+
+    # Delete the zip file to save space
+    delete_zip(zip_path)
+
+    return zip_size
+
+
+def get_s3_etag(s3_path: str) -> str:
+    """
+    Get the ETag of an S3 object, which changes whenever the object's content changes.
+
+    Args:
+        s3_path: S3 path (format: 'bucket/path/to/file.zip')
+
+    Returns:
+        The ETag, without quotes
+    """
+    bucket, key = split_s3_path(s3_path)
+    return get_s3_client().head_object(Bucket=bucket, Key=key)["ETag"].strip('"')
+
+
+def link_tree(
+    source_dir: str, destination_dir: str, images_subset: Optional[Set[str]] = None
+) -> int:
+    """
+    Recreate the files in one directory in another using hardlinks, falling back to copying when
+    the directories are on different filesystems.
+
+    Args:
+        source_dir: Directory to link files from
+        destination_dir: Directory to link files into
+        images_subset: If provided, only link the images with these IDs
+
+    Returns:
+        Number of files linked or copied
+    """
+    n_files = 0
+    for root, _, filenames in os.walk(source_dir):
+        for filename in filenames:
+            if filename == CACHE_COMPLETE_FILE or not is_in_subset(
+                filename, images_subset
+            ):
+                continue
+
+            source = os.path.join(root, filename)
+            destination = os.path.join(
+                destination_dir, os.path.relpath(source, source_dir)
+            )
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+            if os.path.exists(destination):
+                os.remove(destination)
+
+            try:
+                os.link(source, destination)
+            except OSError as e:
+                if e.errno != errno.EXDEV:
+                    raise
+                shutil.copy2(source, destination)
+            n_files += 1
+
+    return n_files
+
+
+def get_directory_size(directory: str) -> int:
+    """Get the total size in bytes of the files in a directory."""
+    return sum(
+        os.path.getsize(os.path.join(root, filename))
+        for root, _, filenames in os.walk(directory)
+        for filename in filenames
+    )
+
+
+def evict_cache_entries(cache_dir: str, max_bytes: int) -> None:
+    """
+    Remove the least recently used entries of the imagery cache until it is below its size budget.
+    Entries which are being filled or read by another process are locked, and are skipped.
+
+    Args:
+        cache_dir: The imagery cache directory
+        max_bytes: Size budget of the cache in bytes
+    """
+    entries_dir = os.path.join(cache_dir, "entries")
+    entries = []
+    for name in os.listdir(entries_dir):
+        complete_file = os.path.join(entries_dir, name, CACHE_COMPLETE_FILE)
+        # The entries are listed without locking them, so an entry may be evicted by another
+        # process (or not be complete yet) while it is read
+        try:
+            with open(complete_file, "r") as f:
+                n_bytes = json.load(f)["n_bytes"]
+            # The complete file is touched each time the entry is used
+            entries.append((os.path.getmtime(complete_file), name, n_bytes))
+        except FileNotFoundError:
+            continue
+
+    total_bytes = sum(n_bytes for _, _, n_bytes in entries)
+    for _, name, n_bytes in sorted(entries):
+        if total_bytes <= max_bytes:
+            break
+
+        with open(os.path.join(cache_dir, "locks", f"{name}.lock"), "w") as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                continue
+            # Remove the complete file first so a partly removed entry is never used. If it is
+            # already gone, another process evicted the entry since it was listed.
+            try:
+                os.remove(os.path.join(entries_dir, name, CACHE_COMPLETE_FILE))
+            except FileNotFoundError:
+                pass
+            else:
+                print(f"  Evicting cache entry {name} ({n_bytes / (1024**3):.1f} GB)")
+                shutil.rmtree(os.path.join(entries_dir, name))
+        total_bytes -= n_bytes
+
+
+def extract_zip_with_cache(
+    s3_path: str,
+    extract_dir: str,
+    cache_dir: str,
+    cache_max_bytes: int,
+    show_progress: bool = True,
+    extract_mode: str = "stream",
+    n_extract_threads: int = DEFAULT_EXTRACT_THREADS,
+    images_subset: Optional[Set[str]] = None,
+) -> int:
+    """
+    Extract a zip file from S3 through the imagery cache. The cache entry is keyed by the ETag of
+    the zip file, so it is shared by every project which uses the same imagery and is refetched if
+    the zip file changes. The entry is filled at most once, since concurrent processes wait on a
+    lock for the entry, and its files are then hardlinked into the extraction directory.
+
+    Args:
+        s3_path: S3 path to download (format: 'bucket/path/to/file.zip')
+        extract_dir: Directory to extract to
+        cache_dir: The imagery cache directory
+        cache_max_bytes: Size budget of the cache in bytes
+        show_progress: Print download progress
+        extract_mode: 'stream' to extract directly from S3 or 'download' to download the zip first
+        n_extract_threads: Number of members to stream at once when streaming
+        images_subset: If provided, only extract the images with these IDs. The full zip file is
+            still cached.
+
+    Returns:
+        Number of bytes read from S3, which is 0 if the zip file was already cached
+
+    Raises:
+        RuntimeError: If no files could be linked from a cache entry which has files
+    """
+    etag = get_s3_etag(s3_path)
+    entry_name = hashlib.sha256(etag.encode()).hexdigest()[:32]
+    entry_dir = os.path.join(cache_dir, "entries", entry_name)
+    complete_file = os.path.join(entry_dir, CACHE_COMPLETE_FILE)
+    os.makedirs(os.path.join(cache_dir, "entries"), exist_ok=True)
+    os.makedirs(os.path.join(cache_dir, "locks"), exist_ok=True)
+
+    n_bytes_read = 0
+    with open(os.path.join(cache_dir, "locks", f"{entry_name}.lock"), "w") as lock:
+        # Hold the lock exclusively while the entry may need to be filled, and until its files are
+        # linked. Downgrading to a shared lock is not atomic, so the entry could be evicted in
+        # between. Linking usually only creates hardlinks, so other processes are not held up long.
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        if os.path.exists(complete_file):
+            print(f"Cache hit: {s3_path} (ETag {etag})")
+        else:
+            print(f"Cache miss: {s3_path} (ETag {etag})")
+            # Remove anything left by a fill which was interrupted. When streaming, files which
+            # already match their member's size and CRC are kept instead, so only the missing
+            # members are fetched.
+            if extract_mode != "stream":
+                shutil.rmtree(entry_dir, ignore_errors=True)
+            entry_download_dir = os.path.join(cache_dir, "downloads", entry_name)
+            os.makedirs(entry_download_dir, exist_ok=True)
+            n_bytes_read = fetch_and_extract_zip(
+                s3_path,
+                entry_download_dir,
+                entry_dir,
+                show_progress=show_progress,
+                extract_mode=extract_mode,
+                n_extract_threads=n_extract_threads,
+            )
+            shutil.rmtree(entry_download_dir, ignore_errors=True)
+            with open(complete_file, "w") as f:
+                json.dump(
+                    {
+                        "s3_path": s3_path,
+                        "etag": etag,
+                        "n_bytes": get_directory_size(entry_dir),
+                    },
+                    f,
+                )
+
+        with open(complete_file, "r") as f:
+            entry_n_bytes = json.load(f)["n_bytes"]
+        os.utime(complete_file)
+        n_files = link_tree(entry_dir, extract_dir, images_subset=images_subset)
+        # With a subset of images, the zip file may legitimately contain none of them
+        if n_files == 0 and entry_n_bytes > 0 and images_subset is None:
+            raise RuntimeError(
+                f"No files linked from cache entry {entry_name} for {s3_path}"
+            )
+        print(f"  Linked {n_files} files from cache -> {extract_dir}")
+
+    evict_cache_entries(cache_dir, cache_max_bytes)
+
+    return n_bytes_read
+
+
+def process_zip(
+    s3_path: str,
+    download_dir: str,
+    show_progress: bool = True,
+    extract_mode: str = "stream",
+    n_extract_threads: int = DEFAULT_EXTRACT_THREADS,
+    images_subset: Optional[Set[str]] = None,
+    cache_dir: Optional[str] = None,
+    cache_max_bytes: int = DEFAULT_IMAGERY_CACHE_MAX_GB * 1024**3,
+) -> int:
+    """
+    Extract a zip file from S3 into a folder named after the zip, either directly or through the
+    imagery cache.
+
+    Args:
+        s3_path: S3 path to download (format: 'bucket/path/to/file.zip')
+        download_dir: Local directory to download and extract to
+        show_progress: Print download progress
+        extract_mode: 'stream' to extract directly from S3 or 'download' to download the zip first
+        n_extract_threads: Number of members to stream at once when streaming
+        images_subset: If provided, only extract the images with these IDs
+        cache_dir: If provided, extract through the imagery cache in this directory
+        cache_max_bytes: Size budget of the imagery cache in bytes
+
+    Returns:
+        Number of bytes read from S3
+    """
+    # Determine extraction folder name (filename without .zip extension)
+    filename = extract_filename_from_url(s3_path)
+    if filename.lower().endswith(".zip"):
+        folder_name = filename[:-4]
+    else:
+        folder_name = filename
+    extract_dir = os.path.join(download_dir, folder_name)
+
+    if cache_dir is not None:
+        return extract_zip_with_cache(
+            s3_path,
+            extract_dir,
+            cache_dir,
+            cache_max_bytes,
+            show_progress=show_progress,
+            extract_mode=extract_mode,
+            n_extract_threads=n_extract_threads,
+            images_subset=images_subset,
+        )
+
+    return fetch_and_extract_zip(
+        s3_path,
+        download_dir,
+        extract_dir,
+        show_progress=show_progress,
+        extract_mode=extract_mode,
+        n_extract_threads=n_extract_threads,
+        images_subset=images_subset,
+    )
+
+
 def main() -> None:
     """Main entry point for download script."""
     print("=" * 60)
@@ -201,64 +1039,83 @@ def main() -> None:
     print(f"Download directory: {download_dir}")
     print(f"Paths to download: {len(imagery_urls)}")
 
-    # Process each S3 path
-    failed_paths = []
-    for i, s3_path in enumerate(imagery_urls, 1):
-        print(f"\n[{i}/{len(imagery_urls)}] Processing: {s3_path}")
-
-        try:
-            # Download the zip file
-            zip_path = download_s3(s3_path, download_dir)
-
-            # Determine extraction folder name (filename without .zip extension)
-            filename = extract_filename_from_url(s3_path)
-            if filename.lower().endswith(".zip"):
-                folder_name = filename[:-4]
-            else:
-                folder_name = filename
-            extract_dir = os.path.join(download_dir, folder_name)
-
-            # Extract the zip file
-            extract_zip(zip_path, extract_dir)
-
-            # Delete the zip file to save space
-            delete_zip(zip_path)
-
-            print(f"  Successfully processed: {s3_path}")
-
-        except subprocess.CalledProcessError as e:
-            print(f"ERROR: Command failed for {s3_path}: {e}")
-            failed_paths.append(s3_path)
-        except FileNotFoundError as e:
-            print(f"ERROR: File not found for {s3_path}: {e}")
-            failed_paths.append(s3_path)
-        except Exception as e:
-            print(f"ERROR: Unexpected error for {s3_path}: {e}")
-            failed_paths.append(s3_path)
+    download_concurrency = int(
+        os.environ.get("DOWNLOAD_CONCURRENCY", DEFAULT_DOWNLOAD_CONCURRENCY)
+    )
+    extract_mode = os.environ.get("EXTRACT_MODE", "stream")
+    if extract_mode not in ("stream", "download"):
+        print(
+            f"ERROR: EXTRACT_MODE must be 'stream' or 'download', got: {extract_mode}"
+        )
+        sys.exit(1)
+    n_extract_threads = int(os.environ.get("EXTRACT_THREADS", DEFAULT_EXTRACT_THREADS))
+    cache_dir = os.environ.get("IMAGERY_CACHE_DIR", "") or None
+    cache_max_bytes = int(
+        float(os.environ.get("IMAGERY_CACHE_MAX_GB", DEFAULT_IMAGERY_CACHE_MAX_GB))
+        * 1024**3
+    )
+    print(f"Concurrent downloads: {download_concurrency}")
+    print(f"Extract mode: {extract_mode}")
+    print(f"Imagery cache: {cache_dir}")
 
     s3_imagery_subset_path = os.environ.get("S3_IMAGERY_SUBSET_PATH", "").strip('"')
 
-    # Remove downloaded images not explicitly marked for inclusion if requested
+    # Only extract images explicitly marked for inclusion if requested. The subset is read before
+    # extracting, so that excluded images are never written, or when streaming, never downloaded.
+    images_subset = None
     if s3_imagery_subset_path != "":
-        # If a path to a file on S3 is provided, attempt to download the corresponding file.
-        # This file is a list of images IDs which are the filename, minus the extension. The image
-        # ID contains the mission ID and is assumed to be unique across all files.
-        images_subset_file = download_s3(s3_imagery_subset_path, download_dir)
+        try:
+            images_subset = read_images_subset(s3_imagery_subset_path, download_dir)
+        except Exception as e:
+            print(f"ERROR: Failed to read imagery subset {s3_imagery_subset_path}: {e}")
+            sys.exit(1)
 
-        print(f"Trying to read from {images_subset_file}")
-        # Read which image_ids to retain
-        with open(images_subset_file, "r") as f:
-            images_subset = [line.strip() for line in f if line.strip()]
+    # Process the S3 paths concurrently. Each worker downloads and then extracts one zip, so the
+    # extraction of one zip overlaps with the download of the next.
+    failed_paths = []
+    n_completed = 0
+    total_bytes = 0
+    start_time = time.time()
+    with ThreadPoolExecutor(max_workers=download_concurrency) as executor:
+        futures = {
+            executor.submit(
+                process_zip,
+                s3_path,
+                download_dir,
+                show_progress=download_concurrency == 1,
+                extract_mode=extract_mode,
+                n_extract_threads=n_extract_threads,
+                images_subset=images_subset,
+                cache_dir=cache_dir,
+                cache_max_bytes=cache_max_bytes,
+            ): s3_path
+            for s3_path in imagery_urls
+        }
 
-        # Read all downloaded files
-        downloaded_files = [f for f in Path(download_dir).rglob("*") if f.is_file()]
+        for future in as_completed(futures):
+            s3_path = futures[future]
+            n_completed += 1
 
-        # Exclude any files not in the inclusion list
-        files_to_delete = [f for f in downloaded_files if f.stem not in images_subset]
+            try:
+                total_bytes += future.result()
+                print(f"  Successfully processed: {s3_path}")
+            except subprocess.CalledProcessError as e:
+                print(f"ERROR: Command failed for {s3_path}: {e}")
+                failed_paths.append(s3_path)
+            except FileNotFoundError as e:
+                print(f"ERROR: File not found for {s3_path}: {e}")
+                failed_paths.append(s3_path)
+            except Exception as e:
+                print(f"ERROR: Unexpected error for {s3_path}: {e}")
+                failed_paths.append(s3_path)
 
-        print(f"Removing {len(files_to_delete)} files not in subset")
-        for f in files_to_delete:
-            os.remove(f)
+            # Aggregate progress across all concurrent downloads
+            elapsed = time.time() - start_time
+            total_mb = total_bytes / (1024 * 1024)
+            print(
+                f"[{n_completed}/{len(imagery_urls)}] {total_mb:.1f} MB downloaded and "
+                f"extracted in {elapsed:.0f}s ({total_mb / max(elapsed, 1e-6):.1f} MB/s)"
+            )
 
     # Report results
     print("\n" + "=" * 60)
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Benchmark the pairing steps of pair_missions.py on synthetic missions.
+
+Generates missions clustered around sites, so that several hn and lo missions share
+an area, with detailed footprints like those derived from image footprints, and a
+few invalid (self-intersecting) footprints and missing values. Then times
+find_valid_pairs and the full run_pairing (pairing, polygons, and filters).
+
+Usage:
+    # 10k synthetic missions:
+    python benchmark_pair_missions.py --n-missions 10000
+
+    # Spread the missions over several UTM zones, and save them for reuse:
+    python benchmark_pair_missions.py --n-missions 10000 --zones \
+        --save-missions synthetic-missions.gpkg
+
+    # Real compiled mission metadata instead of synthetic missions:
+    python benchmark_pair_missions.py --missions metadata-missions-compiled.gpkg
+
+Requirements:
+    - geopandas, pandas, numpy, shapely, pyproj
+"""
+
+import argparse
+import os
+import time
+from contextlib import redirect_stderr, redirect_stdout
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+from pair_missions import GEOGRAPHIC_CRS, find_valid_pairs, run_pairing
+
+# Average number of missions per site
+MISSIONS_PER_SITE = 6
+
+# Centre of the synthetic sites, and their spread in degrees of longitude
+SITES_LON = -121.5
+SITES_LAT = 39.0
+SITES_SPAN_DEG = 3.0
+
+# Fraction of missions with an invalid (bow-tie) footprint
+INVALID_FRACTION = 0.005
+
+
+def make_synthetic_missions(n_missions, seed=0, zones=False):
+    """
+    Generate synthetic missions with the columns pair_missions.py reads.
+
+    Args:
+        n_missions: Number of missions
+        seed: Seed of the random generator, so the same missions are generated
+        zones: Spread the sites over three times the longitude range, which spans
+            several UTM zones
+
+    Returns:
+        GeoDataFrame of missions in GEOGRAPHIC_CRS
+    """
+    rng = np.random.default_rng(seed)
+
+    # Cluster the missions around sites so that several hn and lo missions overlap
+    n_sites = max(1, n_missions // MISSIONS_PER_SITE)
+    lon_span = SITES_SPAN_DEG * (3 if zones else 1)
+    site_lon = SITES_LON + rng.uniform(-lon_span, lon_span, n_sites)
+    site_lat = SITES_LAT + rng.uniform(-SITES_SPAN_DEG / 2, SITES_SPAN_DEG / 2, n_sites)
+    site = rng.integers(0, n_sites, n_missions)
+    lon = site_lon[site] + rng.normal(0, 0.004, n_missions)
+    lat = site_lat[site] + rng.normal(0, 0.004, n_missions)
+    w = rng.uniform(0.002, 0.012, n_missions)
+    h = rng.uniform(0.002, 0.012, n_missions)
+
+    # Rounded rectangles with many vertices, like real footprints
+    geoms = shapely.buffer(
+        shapely.box(lon - w * 0.8, lat - h * 0.8, lon + w * 0.8, lat + h * 0.8),
+        np.minimum(w, h) * 0.2,
+        quad_segs=64,
+    )
+    geoms = shapely.segmentize(geoms, 0.0002)
+    n_invalid = max(1, int(n_missions * INVALID_FRACTION))
+    for i in rng.choice(n_missions, n_invalid, replace=False):
+        geoms[i] = shapely.Polygon(
+            [
+                (lon[i] - w[i], lat[i] - h[i]),
+                (lon[i] + w[i], lat[i] + h[i]),
+                (lon[i] + w[i], lat[i] - h[i]),
+                (lon[i] - w[i], lat[i] + h[i]),
+            ]
+        )
+
+    # Roughly half hn and half lo missions, with some which are neither
+    kind = rng.random(n_missions)
+    agl = np.where(
+        kind < 0.45,
+        rng.uniform(100, 160, n_missions),
+        rng.uniform(60, 120, n_missions),
+    )
+    pitch = np.where(
+        kind < 0.45,
+        rng.uniform(-10, 10, n_missions),
+        rng.uniform(18, 38, n_missions) * rng.choice([-1, 1], n_missions),
+    )
+    pitch[kind > 0.95] = rng.uniform(10, 18, (kind > 0.95).sum())
+    fidelity = rng.uniform(30, 100, n_missions)
+    fidelity[rng.random(n_missions) < 0.1] = np.nan
+    agl[rng.random(n_missions) < 0.02] = np.nan
+
+    dates = pd.Timestamp("2018-01-01") + pd.to_timedelta(
+        rng.integers(0, 8 * 365, n_missions), unit="D"
+    )
+    dates = pd.Series(dates.strftime("%Y-%m-%d"))
+    dates[rng.random(n_missions) < 0.02] = None
+
+    return gpd.GeoDataFrame(
+        {
+            "mission_id": [f"{i:06d}" for i in range(n_missions)],
+            "earliest_date_derived": dates,
+            "agl_mean": agl,
+            "camera_pitch_derived": pitch,
+            "agl_fidelity": fidelity,
+        },
+        geometry=geoms,
+        crs=GEOGRAPHIC_CRS,
+    )
+
+
+def time_best(func, repeats):
+    """Run func repeats times, returning the shortest time in seconds and the result."""
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the pairing steps of pair_missions.py",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument(
+        "--n-missions",
+        type=int,
+        default=10000,
+        help="Number of synthetic missions (default: 10000)",
+    )
+    parser.add_argument(
+        "--seed", type=int, default=0, help="Seed for the synthetic missions"
+    )
+    parser.add_argument(
+        "--zones",
+        action="store_true",
+        help="Spread the synthetic missions over several UTM zones",
+    )
+    parser.add_argument(
+        "--missions",
+        help="Benchmark on this missions file (e.g. metadata-missions-compiled.gpkg) "
+        "instead of synthetic missions",
+    )
+    parser.add_argument(
+        "--save-missions",
+        help="Save the synthetic missions to this GeoPackage",
+    )
+    parser.add_argument(
+        "--repeats",
+        type=int,
+        default=3,
+        help="Number of runs of each step; the fastest is reported (default: 3)",
+    )
+    args = parser.parse_args()
+
+    if args.missions:
+        missions = gpd.read_file(os.path.expanduser(args.missions))
+    else:
+        missions = make_synthetic_missions(args.n_missions, args.seed, args.zones)
+        if args.save_missions:
+            missions.to_file(os.path.expanduser(args.save_missions), driver="GPKG")
+
+    # The pairing steps print their progress, which is kept out of the results
+    with open(os.devnull, "w") as devnull:
+        with redirect_stdout(devnull), redirect_stderr(devnull):
+            find_time, pairs = time_best(
+                lambda: find_valid_pairs(missions), args.repeats
+            )
+            run_time, (filtered_pairs, _, _) = time_best(
+                lambda: run_pairing(missions), args.repeats
+            )
+
+    print(f"Missions: {len(missions)}")
+    print(f"find_valid_pairs: {find_time:.2f} s ({len(pairs)} valid pairs)")
+    print(f"run_pairing: {run_time:.2f} s ({len(filtered_pairs)} pairs after filters)")
+
+
+if __name__ == "__main__":
+    main()
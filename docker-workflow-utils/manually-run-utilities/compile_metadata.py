@@ -6,6 +6,12 @@ Iterates over missions in S3, downloads each mission's metadata files using
 rclone, concatenates them (adding a mission_id column), and uploads the
 compiled files back to S3.
 
+The files are read in parallel as batches of Arrow records, which are streamed
+into the compiled GeoPackages, so memory use is bounded by a few batches per read
+worker, rather than by the size of the files or of the whole catalogue. The schema
+of the compiled files (the union of the columns of all files) is determined up
+front, from the schemas of the files.
+
 Usage:
     python compile_metadata.py \
         --bucket ofo-public \
@@ -24,7 +30,7 @@ Usage:
         --missions 000016 000017
 
 Requirements:
-    - rclone, geopandas, pandas
+    - rclone, pyogrio (>= 0.8, with GDAL >= 3.8), pyarrow
     - rclone remote configured via environment variables (see below)
 
 Environment variables for rclone (configures the js2s3 remote without a config file):
@@ -39,22 +45,48 @@ Environment variables for rclone (configures the js2s3 remote without a config f
 import argparse
 import glob
 import os
+import queue
 import subprocess
 import sys
 import tempfile
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
 
 try:
-    import geopandas as gpd
-    import pandas as pd
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyogrio
+    from pyogrio.raw import open_arrow
 except ImportError:
     print(
-        "Error: geopandas and pandas required. Install with: pip install geopandas pandas",
+        "Error: pyogrio and pyarrow required. Install with: pip install pyogrio pyarrow",
         file=sys.stderr,
     )
     sys.exit(1)
 
 RCLONE_REMOTE = "js2s3"
 
+# Number of metadata files read in parallel
+READ_WORKERS = 8
+
+# Number of rows read from a metadata file at a time
+READ_BATCH_ROWS = 16384
+
+# Number of batches of each file which are read ahead of the batches being written
+READ_AHEAD_BATCHES = 2
+
+# Number of rows written to the compiled GeoPackage at a time
+WRITE_BATCH_ROWS = 65536
+
+# Name of the geometry column in the compiled files
+GEOMETRY_NAME = "geometry"
+
+# Time zone offset at the end of a datetime as GDAL formats it, e.g.
+# "2023-05-01T10:00:00-07:00" or "2023-05-01T17:00:00Z"
+TZ_OFFSET_PATTERN = r"(?P<offset>Z|[+-]\d\d:\d\d)$"
+
 
 def rclone_copy(src, dst, includes=None):
     """Run an rclone copy command with optional --include filters."""
@@ -90,17 +122,356 @@ def discover_missions(bucket, missions_prefix):
     return sorted(rclone_lsf(remote_path, dirs_only=True))
 
 
-def collect_metadata(bucket, missions_prefix, mission_ids, tmpdir):
+def get_file_mission_id(path):
+    """Get the mission ID of a per-mission metadata file from its name."""
+    return os.path.basename(path).split("_")[0]
+
+
+def read_file_schema(path):
+    """
+    Read the schema of a metadata file, without reading its features.
+
+    Returns a dict with the Arrow schema of the attribute columns (keyed "schema"),
+    and the "geometry_type" and "crs" of the file.
+    """
+    with open_arrow(path, use_pyarrow=True) as (meta, reader):
+        schema = reader.schema
+    geometry_name = meta["geometry_name"] or "wkb_geometry"
+    schema = schema.remove(schema.get_field_index(geometry_name))
+
+    # GDAL labels all datetimes as UTC when reading them as Arrow, including those
+    # without a time zone (like the local capture times), so the time zones are
+    # determined from the datetimes as they are stored
+    datetime_names = [f.name for f in schema if pa.types.is_timestamp(f.type)]
+    if datetime_names:
+        offsets = read_datetime_offsets(path, datetime_names)
+        for name in datetime_names:
+            i = schema.get_field_index(name)
+            unit = schema.field(name).type.unit
+            schema = schema.set(
+                i, schema.field(name).with_type(get_datetime_type(unit, offsets[name]))
+            )
+
+    return {
+        "schema": schema,
+        "geometry_type": meta["geometry_type"],
+        "crs": meta["crs"],
+    }
+
+
+def read_datetime_offsets(path, names):
+    """
+    Read the time zone offsets of the given datetime columns of a metadata file.
+
+    Returns a dict mapping each column to the set of offsets in it, such as
+    "-07:00", with None for datetimes without a time zone. UTC is "+00:00".
+    """
+    with open_arrow(
+        path,
+        columns=names,
+        read_geometry=False,
+        datetime_as_string=True,
+        use_pyarrow=True,
+    ) as (_, reader):
+        table = reader.read_all()
+
+    offsets = {}
+    for name in names:
+        matches = pc.extract_regex(table.column(name).drop_null(), TZ_OFFSET_PATTERN)
+        values = pc.unique(pc.struct_field(matches, "offset")).to_pylist()
+        offsets[name] = {"+00:00" if v == "Z" else v for v in values}
+    return offsets
+
+
+def get_datetime_type(unit, offsets):
     """
-    Download and concatenate metadata files across all missions.
+    Get the Arrow type to compile datetimes with the given time zone offsets as: a
+    naive timestamp, a timestamp with the one offset, or the datetimes as strings
+    if they have different offsets (or some have no time zone).
+    """
+    if not offsets or offsets == {None}:
+        return pa.timestamp(unit)
+    if len(offsets) == 1:
+        (offset,) = offsets
+        return pa.timestamp(unit, tz="UTC" if offset == "+00:00" else offset)
+    return pa.string()
+
+
+def unify_field_types(types):
+    """
+    Get a type which values of all the given Arrow types can be cast to: the widest
+    of compatible types (e.g. int64 and double -> double), or string otherwise
+    (including datetimes with different time zones).
+    """
+    types = list(dict.fromkeys(types))
+    if len(types) == 1:
+        return types[0]
+    try:
+        return (
+            pa.unify_schemas(
+                [pa.schema([pa.field("f", t)]) for t in types],
+                promote_options="permissive",
+            )
+            .field("f")
+            .type
+        )
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return pa.string()
+
+
+def unify_file_schemas(file_schemas):
+    """
+    Determine the schema of the compiled file from the schemas of all files: the
+    union of their columns (in order of first appearance, after mission_id), with
+    unified types.
+
+    Args:
+        file_schemas: List of schemas from read_file_schema()
+
+    Returns:
+        Tuple of (Arrow schema of the attribute columns, geometry type, CRS)
+
+    Raises:
+        ValueError: If the files have different CRSs
+    """
+    field_types = {"mission_id": [pa.string()]}
+    for file_schema in file_schemas:
+        for field in file_schema["schema"]:
+            field_types.setdefault(field.name, []).append(field.type)
+    schema = pa.schema(
+        [
+            pa.field(name, unify_field_types(types))
+            for name, types in field_types.items()
+        ]
+    )
+
+    geometry_types = {s["geometry_type"] for s in file_schemas}
+    geometry_type = geometry_types.pop() if len(geometry_types) == 1 else "Unknown"
+
+    crss = {s["crs"] for s in file_schemas}
+    if len(crss) > 1:
+        raise ValueError(f"Cannot compile metadata files with different CRSs: {crss}")
+
+    return schema, geometry_type, crss.pop()
+
+
+def conform_batch(path, batch, schema, geometry_name):
+    """
+    Conform a batch of records of a metadata file to the schema of the compiled file:
+    a mission_id column (from the file name, if the file has none), missing columns
+    filled with nulls, and the geometry (as WKB) in the last column.
+    """
+    columns = []
+    for field in schema:
+        if field.name in batch.schema.names:
+            column = batch.column(field.name)
+            # Casting the timestamps which GDAL labels as UTC keeps the same instants
+            # for datetimes with a time zone, and the same wall times for naive ones
+            if column.type != field.type:
+                column = column.cast(field.type)
+        elif field.name == "mission_id":
+            column = pa.array([get_file_mission_id(path)] * batch.num_rows)
+        else:
+            column = pa.nulls(batch.num_rows, field.type)
+        columns.append(column)
+    columns.append(batch.column(geometry_name).cast(pa.binary()))
+
+    return pa.RecordBatch.from_arrays(
+        columns, schema=schema.append(pa.field(GEOMETRY_NAME, pa.binary()))
+    )
+
+
+def read_file_batches(path, schema):
+    """
+    Read a metadata file in batches of up to READ_BATCH_ROWS records, conformed to
+    the schema of the compiled file (see conform_batch).
+    """
+    with ExitStack() as stack:
+        meta, reader = stack.enter_context(
+            open_arrow(path, use_pyarrow=True, batch_size=READ_BATCH_ROWS)
+        )
+        geometry_name = meta["geometry_name"] or "wkb_geometry"
+
+        # Datetimes compiled as strings are read again as they are stored, since
+        # their Arrow timestamps have lost the time zones
+        datetime_string_names = [
+            field.name
+            for field in schema
+            if pa.types.is_string(field.type)
+            and field.name in reader.schema.names
+            and pa.types.is_timestamp(reader.schema.field(field.name).type)
+        ]
+        string_batches = None
+        if datetime_string_names:
+            _, string_reader = stack.enter_context(
+                open_arrow(
+                    path,
+                    columns=datetime_string_names,
+                    read_geometry=False,
+                    datetime_as_string=True,
+                    use_pyarrow=True,
+                    batch_size=READ_BATCH_ROWS,
+                )
+            )
+            string_batches = iter(string_reader)
+
+        for batch in reader:
+            if string_batches is not None:
+                string_batch = next(string_batches)
+                if string_batch.num_rows != batch.num_rows:
+                    raise ValueError(
+                        f"Datetimes of {path} were read in different batches"
+                    )
+                for name in datetime_string_names:
+                    batch = batch.set_column(
+                        batch.schema.get_field_index(name),
+                        name,
+                        string_batch.column(name),
+                    )
+            yield conform_batch(path, batch, schema, geometry_name)
+
+
+def read_files_in_order(read_batches, paths, n_workers):
+    """
+    Yield (path, batch) for the batches of each file in order, followed by
+    (path, None) once the file has been read. read_batches(path) yields the batches
+    of a file. The next n_workers files are read in parallel threads, each at most
+    READ_AHEAD_BATCHES batches ahead, so memory use doesn't depend on the file sizes.
+    """
+    stop = threading.Event()
+    end_of_file = object()
+
+    def put(batches_queue, item):
+        # Give up if the consumer has stopped, instead of blocking forever
+        while not stop.is_set():
+            try:
+                batches_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def read_file(path, batches_queue):
+        try:
+            for batch in read_batches(path):
+                if not put(batches_queue, batch):
+                    return
+            put(batches_queue, end_of_file)
+        except Exception as e:
+            put(batches_queue, e)
+
+    with ThreadPoolExecutor(n_workers) as executor:
+        paths = iter(paths)
+        pending = deque()
+
+        def read_next_file():
+            path = next(paths, None)
+            if path is not None:
+                batches_queue = queue.Queue(READ_AHEAD_BATCHES)
+                executor.submit(read_file, path, batches_queue)
+                pending.append((path, batches_queue))
+
+        try:
+            # Only n_workers files are pending, so each of them has a thread
+            for _ in range(n_workers):
+                read_next_file()
+            while pending:
+                path, batches_queue = pending.popleft()
+                while True:
+                    item = batches_queue.get()
+                    if item is end_of_file:
+                        break
+                    if isinstance(item, Exception):
+                        raise item
+                    yield path, item
+                yield path, None
+                read_next_file()
+        finally:
+            stop.set()
+
+
+def compile_files(paths, output_path, label, n_workers=READ_WORKERS):
+    """
+    Compile metadata files into a single GeoPackage, reading them in parallel and
+    appending them to the output in batches of about WRITE_BATCH_ROWS rows.
+
+    Args:
+        paths: Paths of the per-mission metadata files, in the order to compile them
+        output_path: Path of the compiled GeoPackage. It's overwritten if it exists.
+        label: Kind of metadata, for progress messages (e.g. "image-metadata")
+        n_workers: Number of files to read in parallel
+
+    Returns:
+        Tuple of (number of rows, number of columns) of the compiled file
+    """
+    with ThreadPoolExecutor(n_workers) as executor:
+        file_schemas = list(executor.map(read_file_schema, paths))
+    schema, geometry_type, crs = unify_file_schemas(file_schemas)
+
+    if os.path.exists(output_path):
+        os.remove(output_path)
+    layer = os.path.splitext(os.path.basename(output_path))[0]
+
+    output_schema = schema.append(pa.field(GEOMETRY_NAME, pa.binary()))
+    n_rows = 0
+    file_rows = 0
+    batch = []
+    batch_rows = 0
+
+    def write_batch():
+        pyogrio.write_arrow(
+            pa.Table.from_batches(batch, schema=output_schema),
+            output_path,
+            layer=layer,
+            driver="GPKG",
+            geometry_name=GEOMETRY_NAME,
+            geometry_type=geometry_type,
+            crs=crs,
+            append=os.path.exists(output_path),
+        )
+
+    file_batches = read_files_in_order(
+        lambda path: read_file_batches(path, schema), paths, n_workers
+    )
+    for path, record_batch in file_batches:
+        if record_batch is None:
+            print(
+                f"  {get_file_mission_id(path)} {label}: {file_rows} rows",
+                file=sys.stderr,
+            )
+            file_rows = 0
+            continue
+        batch.append(record_batch)
+        batch_rows += record_batch.num_rows
+        file_rows += record_batch.num_rows
+        n_rows += record_batch.num_rows
+        if batch_rows >= WRITE_BATCH_ROWS:
+            write_batch()
+            batch = []
+            batch_rows = 0
+    # Write the remaining rows, or an empty layer if there are none
+    if batch or n_rows == 0:
+        write_batch()
+
+    # Columns as read back by geopandas: the attribute columns and the geometry
+    return n_rows, len(schema) + 1
+
+
+def collect_metadata(
+    bucket, missions_prefix, mission_ids, tmpdir, n_workers=READ_WORKERS
+):
+    """
+    Download and compile metadata files across all missions.
 
     Uses a single rclone copy with --include filters to download all matching
-    files in parallel, then reads and concatenates them locally.
+    files in parallel, then reads them in parallel and streams them into compiled
+    GeoPackages in tmpdir.
 
     If specific mission_ids are provided, downloads only those missions'
     metadata. Otherwise downloads all metadata files matching the pattern.
 
-    Returns (missions_gdf, images_gdf) — either may be None if no data found.
+    Returns (missions_compiled, images_compiled) — each a tuple of (path, number of
+    rows, number of columns) of the compiled GeoPackage, or None if no data found.
     """
     remote_path = f"{RCLONE_REMOTE}:{bucket}/{missions_prefix}/"
 
@@ -118,10 +489,7 @@ def collect_metadata(bucket, missions_prefix, mission_ids, tmpdir):
     print(f"\nDownloading metadata files...", file=sys.stderr)
     rclone_copy(remote_path, tmpdir, includes=includes)
 
-    # Read downloaded files
-    mission_gdfs = []
-    image_gdfs = []
-
+    # Compile downloaded files
     mission_files = sorted(
         glob.glob(os.path.join(tmpdir, "*/metadata-mission/*_mission-metadata.gpkg"))
     )
@@ -129,32 +497,19 @@ def collect_metadata(bucket, missions_prefix, mission_ids, tmpdir):
         glob.glob(os.path.join(tmpdir, "*/metadata-images/*_image-metadata.gpkg"))
     )
 
-    for f in mission_files:
-        mission_id = os.path.basename(f).split("_")[0]
-        gdf = gpd.read_file(f)
-        if "mission_id" not in gdf.columns:
-            gdf.insert(0, "mission_id", mission_id)
-        mission_gdfs.append(gdf)
-        print(f"  {mission_id} mission-metadata: {len(gdf)} rows", file=sys.stderr)
-
-    for f in image_files:
-        mission_id = os.path.basename(f).split("_")[0]
-        gdf = gpd.read_file(f)
-        if "mission_id" not in gdf.columns:
-            gdf.insert(0, "mission_id", mission_id)
-        image_gdfs.append(gdf)
-        print(f"  {mission_id} image-metadata: {len(gdf)} rows", file=sys.stderr)
-
-    missions_compiled = (
-        gpd.GeoDataFrame(pd.concat(mission_gdfs, ignore_index=True))
-        if mission_gdfs
-        else None
-    )
-    images_compiled = (
-        gpd.GeoDataFrame(pd.concat(image_gdfs, ignore_index=True))
-        if image_gdfs
-        else None
-    )
+    missions_compiled = None
+    if mission_files:
+        path = os.path.join(tmpdir, "metadata-missions-compiled.gpkg")
+        missions_compiled = (path,) + compile_files(
+            mission_files, path, "mission-metadata", n_workers
+        )
+
+    images_compiled = None
+    if image_files:
+        path = os.path.join(tmpdir, "metadata-images-compiled.gpkg")
+        images_compiled = (path,) + compile_files(
+            image_files, path, "image-metadata", n_workers
+        )
 
     return missions_compiled, images_compiled
 
@@ -180,6 +535,12 @@ def main():
         action="store_true",
         help="Compile and print summary without uploading",
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=READ_WORKERS,
+        help=f"Number of metadata files to read in parallel (default: {READ_WORKERS})",
+    )
 
     args = parser.parse_args()
 
@@ -201,16 +562,14 @@ def main():
     with tempfile.TemporaryDirectory() as tmpdir:
         # Download and collect all metadata
         missions_compiled, images_compiled = collect_metadata(
-            args.bucket, args.missions_prefix, mission_ids, tmpdir
+            args.bucket, args.missions_prefix, mission_ids, tmpdir, args.workers
         )
 
         # Save and upload
         if missions_compiled is not None:
-            local_path = os.path.join(tmpdir, "metadata-missions-compiled.gpkg")
-            missions_compiled.to_file(local_path, driver="GPKG")
+            local_path, n_rows, n_columns = missions_compiled
             print(
-                f"\nMissions compiled: {len(missions_compiled)} rows, "
-                f"{len(missions_compiled.columns)} columns",
+                f"\nMissions compiled: {n_rows} rows, {n_columns} columns",
                 file=sys.stderr,
             )
             if not args.dry_run:
@@ -221,11 +580,9 @@ def main():
             print("\nNo mission metadata found", file=sys.stderr)
 
         if images_compiled is not None:
-            local_path = os.path.join(tmpdir, "metadata-images-compiled.gpkg")
-            images_compiled.to_file(local_path, driver="GPKG")
+            local_path, n_rows, n_columns = images_compiled
             print(
-                f"\nImages compiled: {len(images_compiled)} rows, "
-                f"{len(images_compiled.columns)} columns",
+                f"\nImages compiled: {n_rows} rows, {n_columns} columns",
                 file=sys.stderr,
             )
             if not args.dry_run:
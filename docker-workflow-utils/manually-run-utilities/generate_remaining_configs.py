@@ -12,10 +12,13 @@ Note: Use config-specific completion log files (e.g., completion-log-default.jso
 """
 
 import argparse
-import json
 import os
 import sys
 
+# The completion log module is shared with the workflow utilities in the parent directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from completion_log import load_completions  # noqa: E402
+
 
 def main():
     parser = argparse.ArgumentParser(
@@ -38,26 +41,15 @@ def main():
     args = parser.parse_args()
 
     # Load completion log (assumed to be config-specific)
-    completed = set()
-    if os.path.exists(args.completion_log):
-        with open(args.completion_log) as f:
-            for line in f:
-                line = line.strip()
-                if not line:
-                    continue
-                try:
-                    entry = json.loads(line)
-                    # Support both 'phase' (current) and 'completion_level' (legacy)
-                    phase = entry.get("phase") or entry.get("completion_level")
-                    # Check completion phase based on --phase argument
-                    if args.phase == "metashape":
-                        # Skip if any completion (metashape or postprocess)
-                        completed.add(entry["project_name"])
-                    elif args.phase == "postprocess" and phase == "postprocess":
-                        # Skip only if postprocess complete
-                        completed.add(entry["project_name"])
-                except (json.JSONDecodeError, KeyError):
-                    continue
+    completions = load_completions(args.completion_log)
+    if args.phase == "metashape":
+        # Skip if any completion (metashape or postprocess)
+        completed = set(completions)
+    else:
+        # Skip only if postprocess complete
+        completed = {
+            name for name, phases in completions.items() if "postprocess" in phases
+        }
 
     # Read config list and filter
     config_list_dir = os.path.dirname(args.config_list)
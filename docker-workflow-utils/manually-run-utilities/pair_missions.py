@@ -27,8 +27,16 @@ Usage:
         --bucket ofo-public \
         --missions-prefix drone/missions_03
 
+    # Incremental: only re-pair missions which are new or changed since the last run
+    # (add --full-recompute to re-pair everything):
+    python pair_missions.py \
+        --local-missions metadata-missions-compiled.gpkg \
+        --local-images metadata-images-compiled.gpkg \
+        --local-output-composites-folder ./output \
+        --pairing-state ~/repo-data-local/tmp/pairing-state.pkl
+
 Requirements:
-    - geopandas, pandas, numpy, shapely
+    - geopandas, pandas, numpy, shapely, pyproj
     - boto3 (only when using --bucket)
 
 Environment variables for S3:
@@ -38,14 +46,20 @@ Environment variables for S3:
 """
 
 import argparse
+import hashlib
 import os
+import pickle
 import sys
 import tempfile
 from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 
 import geopandas as gpd
 import numpy as np
 import pandas as pd
+import shapely
+from pyproj import Transformer
 from shapely.validation import make_valid
 
 # ---------------------------------------------------------------------------
@@ -78,8 +92,24 @@ MIN_OVERLAP_HA = 2.0
 # Buffer (metres) applied to hn footprint when cropping the lo polygon
 LO_BUFFER_M = 100
 
-# Projected CRS used for area calculations and buffering (metres)
-WORKING_CRS = "EPSG:32610"
+# CRS of the outputs. Area calculations and buffering (metres) are done in the local
+# UTM zone of each mission, determined from its footprint centroid.
+GEOGRAPHIC_CRS = "EPSG:4326"
+
+# Number of threads used to process the missions of different UTM zones in parallel
+ZONE_WORKERS = min(8, os.cpu_count() or 1)
+
+# Mission columns the pairing depends on, besides the footprint. A mission is
+# re-paired when any of them change.
+PAIRING_COLUMNS = [
+    "earliest_date_derived",
+    "agl_mean",
+    "camera_pitch_derived",
+    "agl_fidelity",
+]
+
+# Version of the pairing state format. A state of another version is ignored.
+PAIRING_STATE_VERSION = 1
 
 # Subset-filter: fraction of area to consider one footprint "entirely a subset"
 SUBSET_AREA_THRESHOLD = 0.99
@@ -106,6 +136,8 @@ WITHIN_YEAR_AREA_MARGIN = 0.10
 #     local_images="~/repo-data-local/tmp/metadata-images-compiled.gpkg",
 #     local_output_composites_folder="./output",
 #     s3_upload_composites_folder=None,
+#     pairing_state=None,
+#     full_recompute=False,
 # )
 
 
@@ -143,51 +175,211 @@ def upload_s3_file(client, bucket, key, local_path):
 
 
 # ---------------------------------------------------------------------------
-# Classification
+# Local UTM projection
 # ---------------------------------------------------------------------------
 
 
-def classify_mission(row):
-    """Return 'hn', 'lo', or None based on configurable thresholds."""
-    alt = row.get("agl_mean")
-    pitch = row.get("camera_pitch_derived")
-    fidelity = row.get("agl_fidelity")
+def lonlat_to_utm_epsg(lon, lat):
+    """
+    Calculate UTM zone EPSG codes from arrays of lon/lat coordinates.
 
-    if pd.isna(alt) or pd.isna(pitch):
-        return None
+    Returns:
+        Array of EPSG codes (int) for the UTM zones
+    """
+    utm_zone = (np.floor((np.asarray(lon) + 180) / 6) % 60 + 1).astype(int)
 
-    # Fidelity check (allow NaN fidelity to pass if we don't have it)
-    if pd.notna(fidelity) and fidelity < MIN_FIDELITY:
-        return None
+    # Northern hemisphere: 32600 + zone, Southern: 32700 + zone
+    return np.where(np.asarray(lat) >= 0, 32600 + utm_zone, 32700 + utm_zone)
 
-    pitch = abs(float(pitch))
 
-    if (
-        HN_ALTITUDE_MIN <= alt <= HN_ALTITUDE_MAX
-        and HN_PITCH_MIN <= pitch <= HN_PITCH_MAX
-    ):
-        return "hn"
-    if (
-        LO_ALTITUDE_MIN <= alt <= LO_ALTITUDE_MAX
-        and LO_PITCH_MIN <= pitch <= LO_PITCH_MAX
-    ):
-        return "lo"
+def get_utm_epsg(geoms):
+    """
+    Get the UTM zone EPSG code of each geometry (in lon/lat) from its centroid.
+    """
+    centroids = shapely.centroid(geoms)
+    return lonlat_to_utm_epsg(shapely.get_x(centroids), shapely.get_y(centroids))
+
+
+@lru_cache(maxsize=None)
+def get_utm_transformer(epsg, inverse=False):
+    """
+    Get a (cached) transformer from lon/lat to a UTM zone, or back if inverse.
+    """
+    utm_crs = f"EPSG:{epsg}"
+    if inverse:
+        return Transformer.from_crs(utm_crs, GEOGRAPHIC_CRS, always_xy=True)
+    return Transformer.from_crs(GEOGRAPHIC_CRS, utm_crs, always_xy=True)
+
+
+def to_utm(geoms, epsg):
+    """Project an array of lon/lat geometries to a UTM zone."""
+    transformer = get_utm_transformer(epsg)
+    return shapely.transform(geoms, transformer.transform, interleaved=False)
+
+
+def to_utm_unique(geoms, keys, epsg):
+    """
+    Project an array of lon/lat geometries to a UTM zone, where geometries with the
+    same key (e.g. the footprint of a mission in several pairs) are the same and are
+    only projected once.
+    """
+    _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    return to_utm(geoms[first], epsg)[inverse]
+
 
-    return None
+def from_utm(geoms, epsg):
+    """Project an array of geometries in a UTM zone back to lon/lat."""
+    transformer = get_utm_transformer(epsg, inverse=True)
+    return shapely.transform(geoms, transformer.transform, interleaved=False)
+
+
+def map_utm_zones(func, utm_epsg, *arrays, n_workers=ZONE_WORKERS):
+    """
+    Split arrays into groups by UTM zone, and call func(epsg, *group_arrays) for each
+    zone in parallel threads (projection and shapely operations release the GIL).
+
+    Args:
+        func: Function returning a tuple of arrays aligned with the group arrays
+        utm_epsg: Array of UTM zone EPSG codes, one per element of the arrays. Must
+            not be empty.
+        *arrays: Arrays to split by zone
+        n_workers: Number of threads
+
+    Returns:
+        Tuple of the arrays returned by func for all zones, reassembled in the
+        original order
+    """
+    utm_epsg = np.asarray(utm_epsg)
+    zones = {epsg: np.flatnonzero(utm_epsg == epsg) for epsg in np.unique(utm_epsg)}
+
+    def run_zone(epsg):
+        positions = zones[epsg]
+        return func(epsg, *(np.asarray(a)[positions] for a in arrays))
+
+    with ThreadPoolExecutor(min(n_workers, len(zones))) as executor:
+        zone_results = list(executor.map(run_zone, zones))
+
+    results = [np.empty(len(utm_epsg), dtype=r.dtype) for r in zone_results[0]]
+    for positions, zone_result in zip(zones.values(), zone_results):
+        for result, zone_values in zip(results, zone_result):
+            result[positions] = zone_values
+    return tuple(results)
+
+
+# ---------------------------------------------------------------------------
+# Classification
+# ---------------------------------------------------------------------------
+
+
+def get_classification_criteria():
+    """
+    Get the classification thresholds defined by the constants above, as a dict which
+    can be modified and passed to classify_missions / find_valid_pairs (e.g. to run a
+    parameter sweep over the same loaded missions).
+    """
+    return {
+        "hn_altitude_min": HN_ALTITUDE_MIN,
+        "hn_altitude_max": HN_ALTITUDE_MAX,
+        "hn_pitch_min": HN_PITCH_MIN,
+        "hn_pitch_max": HN_PITCH_MAX,
+        "lo_altitude_min": LO_ALTITUDE_MIN,
+        "lo_altitude_max": LO_ALTITUDE_MAX,
+        "lo_pitch_min": LO_PITCH_MIN,
+        "lo_pitch_max": LO_PITCH_MAX,
+        "min_fidelity": MIN_FIDELITY,
+    }
+
+
+def classify_missions(missions, criteria=None):
+    """
+    Classify each mission as 'hn', 'lo', or None based on its altitude, pitch, and
+    terrain-follow fidelity.
+
+    Args:
+        missions: DataFrame of missions with agl_mean, camera_pitch_derived, and
+            agl_fidelity columns (missing columns are treated as all-NaN)
+        criteria: Dict of classification thresholds, as returned by
+            get_classification_criteria(). Defaults to the module constants.
+
+    Returns:
+        Series of 'hn', 'lo', or None, aligned with missions
+    """
+    if criteria is None:
+        criteria = get_classification_criteria()
+
+    def get_numeric(col):
+        if col not in missions.columns:
+            return np.full(len(missions), np.nan)
+        return pd.to_numeric(missions[col], errors="coerce").to_numpy(dtype=float)
+
+    alt = get_numeric("agl_mean")
+    pitch = np.abs(get_numeric("camera_pitch_derived"))
+    fidelity = get_numeric("agl_fidelity")
+
+    # Missions without altitude or pitch are never classified (comparisons with NaN are
+    # False). Allow NaN fidelity to pass if we don't have it.
+    fidelity_ok = np.isnan(fidelity) | (fidelity >= criteria["min_fidelity"])
+    is_hn = (
+        fidelity_ok
+        & (alt >= criteria["hn_altitude_min"])
+        & (alt <= criteria["hn_altitude_max"])
+        & (pitch >= criteria["hn_pitch_min"])
+        & (pitch <= criteria["hn_pitch_max"])
+    )
+    is_lo = (
+        fidelity_ok
+        & (alt >= criteria["lo_altitude_min"])
+        & (alt <= criteria["lo_altitude_max"])
+        & (pitch >= criteria["lo_pitch_min"])
+        & (pitch <= criteria["lo_pitch_max"])
+    )
+
+    mission_type = np.select([is_hn, is_lo], ["hn", "lo"], default=None)
+    return pd.Series(mission_type, index=missions.index, dtype=object)
 
 
 # ---------------------------------------------------------------------------
 # Pairing logic
 # ---------------------------------------------------------------------------
 
+# Shapely type IDs of Polygon and MultiPolygon
+POLYGON_TYPE_IDS = [3, 6]
+
 
-def find_valid_pairs(missions_gdf):
+def make_valid_polygons(geoms):
+    """
+    Repair invalid polygons, keeping only the polygonal parts of the repaired
+    geometries (as gpd.overlay does). Repairs which leave no polygonal part
+    become None.
+    """
+    geoms = np.array(geoms, dtype=object)
+    invalid = ~shapely.is_valid(geoms) & ~shapely.is_missing(geoms)
+    for i in np.flatnonzero(invalid):
+        geom = make_valid(geoms[i])
+        if geom.geom_type == "GeometryCollection":
+            polys = [
+                g for g in geom.geoms if g.geom_type in ("Polygon", "MultiPolygon")
+            ]
+            geom = shapely.union_all(polys) if polys else None
+        geoms[i] = geom
+    return geoms
+
+
+def find_valid_pairs(missions_gdf, criteria=None, only_missions=None):
     """
     Classify missions then find all valid hn–lo pairs.
 
+    criteria is an optional dict of classification thresholds (see
+    get_classification_criteria); the module constants are used by default.
+    If only_missions (a set of mission IDs) is given, only the pairs involving
+    those missions are found.
+
     Returns a DataFrame with one row per valid pair, including:
       hn_mission_id, lo_mission_id, overlap_area_ha, date_diff_days,
-      hn_geom (original), lo_geom (original), intersection_geom
+      hn_geom (original), lo_geom (original), intersection_geom,
+      hn_utm_epsg, lo_utm_epsg (UTM zones of the missions)
+    Geometries are in GEOGRAPHIC_CRS; the overlap area is computed in the UTM zone
+    of the hn mission.
     """
     missions = missions_gdf.copy()
 
@@ -202,7 +394,7 @@ def find_valid_pairs(missions_gdf):
             missions[col] = pd.to_numeric(missions[col], errors="coerce")
 
     # Classify
-    missions["_type"] = missions.apply(classify_mission, axis=1)
+    missions["_type"] = classify_missions(missions, criteria)
 
     hn = missions[missions["_type"] == "hn"].copy()
     lo = missions[missions["_type"] == "lo"].copy()
@@ -217,58 +409,110 @@ def find_valid_pairs(missions_gdf):
         print("No valid pairs possible — one side is empty.", file=sys.stderr)
         return pd.DataFrame()
 
-    # Project to metre-based CRS for area / buffer calculations
-    hn = hn.to_crs(WORKING_CRS)
-    lo = lo.to_crs(WORKING_CRS)
-
-    # Build pairs via spatial overlay (intersection)
-    pairs = gpd.overlay(
-        hn[["mission_id", "earliest_date_derived", "geometry"]].rename(
-            columns={
-                "mission_id": "hn_mission_id",
-                "earliest_date_derived": "hn_date",
-                "geometry": "geometry",
-            }
-        ),
-        lo[["mission_id", "earliest_date_derived", "geometry"]].rename(
-            columns={
-                "mission_id": "lo_mission_id",
-                "earliest_date_derived": "lo_date",
-                "geometry": "geometry",
-            }
-        ),
-        how="intersection",
-        keep_geom_type=False,
-    )
+    # Missions without a footprint can't be paired
+    hn = hn[~(hn.geometry.is_empty | hn.geometry.isna())]
+    lo = lo[~(lo.geometry.is_empty | lo.geometry.isna())]
+    hn = hn.to_crs(GEOGRAPHIC_CRS).reset_index(drop=True)
+    lo = lo.to_crs(GEOGRAPHIC_CRS).reset_index(drop=True)
+    hn_utm_epsg = get_utm_epsg(hn.geometry.values)
+    lo_utm_epsg = get_utm_epsg(lo.geometry.values)
+
+    # Candidate pairs: bulk query of an R-tree of the lo footprints with the hn
+    # footprints. Invalid footprints are repaired first, as gpd.overlay does.
+    hn_valid = make_valid_polygons(hn.geometry.values)
+    lo_valid = make_valid_polygons(lo.geometry.values)
+    if only_missions is None:
+        hn_idx, lo_idx = shapely.STRtree(lo_valid).query(
+            hn_valid, predicate="intersects"
+        )
+    else:
+        # Query the lo R-tree with the given hn footprints, and an hn R-tree with
+        # the given lo footprints
+        hn_query = np.flatnonzero(hn["mission_id"].isin(only_missions))
+        lo_query = np.flatnonzero(lo["mission_id"].isin(only_missions))
+        i, lo_found = shapely.STRtree(lo_valid).query(
+            hn_valid[hn_query], predicate="intersects"
+        )
+        i_lo, hn_found = shapely.STRtree(hn_valid).query(
+            lo_valid[lo_query], predicate="intersects"
+        )
+        candidates = np.unique(
+            np.concatenate(
+                [
+                    np.column_stack([hn_query[i], lo_found]),
+                    np.column_stack([hn_found, lo_query[i_lo]]),
+                ]
+            ),
+            axis=0,
+        )
+        hn_idx, lo_idx = candidates[:, 0], candidates[:, 1]
+    order = np.lexsort((lo_idx, hn_idx))
+    hn_idx, lo_idx = hn_idx[order], lo_idx[order]
 
-    if pairs.empty:
+    if hn_idx.size == 0:
         print("No spatially overlapping hn–lo pairs found.", file=sys.stderr)
         return pd.DataFrame()
 
-    # Compute overlap area in hectares
-    pairs["overlap_area_ha"] = pairs.geometry.area / 1e4
+    # Filter by date difference before computing any intersections, since most
+    # candidates are too far apart in time
+    hn_date = hn["earliest_date_derived"].values[hn_idx]
+    lo_date = lo["earliest_date_derived"].values[lo_idx]
+    date_diff_days = pd.Series(hn_date - lo_date).abs().dt.days
+    keep = (date_diff_days.isna() | (date_diff_days <= MAX_DATE_DIFF_DAYS)).values
+    hn_idx, lo_idx, date_diff_days = hn_idx[keep], lo_idx[keep], date_diff_days[keep]
+    print(
+        f"Overlapping pairs within {MAX_DATE_DIFF_DAYS}-day window: {len(hn_idx)}",
+        file=sys.stderr,
+    )
 
-    # Filter by minimum overlap
-    pairs = pairs[pairs["overlap_area_ha"] >= MIN_OVERLAP_HA].copy()
-    print(f"Pairs with >= {MIN_OVERLAP_HA} ha overlap: {len(pairs)}", file=sys.stderr)
+    if hn_idx.size == 0:
+        return pd.DataFrame()
 
-    # Filter by date difference
-    pairs["date_diff_days"] = (pairs["hn_date"] - pairs["lo_date"]).abs().dt.days
-    pairs = pairs[
-        pairs["date_diff_days"].isna() | (pairs["date_diff_days"] <= MAX_DATE_DIFF_DAYS)
-    ].copy()
-    print(
-        f"Pairs within {MAX_DATE_DIFF_DAYS}-day window: {len(pairs)}", file=sys.stderr
+    # Intersect the remaining candidates in the UTM zone of the hn mission, and
+    # filter by minimum overlap (hectares)
+    def intersect_zone(epsg, hn_geoms, lo_geoms, hn_keys, lo_keys):
+        intersections = shapely.intersection(
+            to_utm_unique(hn_geoms, hn_keys, epsg),
+            to_utm_unique(lo_geoms, lo_keys, epsg),
+        )
+        polygonal = np.isin(
+            shapely.get_type_id(intersections), POLYGON_TYPE_IDS
+        ) & ~shapely.is_valid(intersections)
+        intersections[polygonal] = shapely.make_valid(intersections[polygonal])
+        return from_utm(intersections, epsg), shapely.area(intersections) / 1e4
+
+    intersections, overlap_area_ha = map_utm_zones(
+        intersect_zone,
+        hn_utm_epsg[hn_idx],
+        hn_valid[hn_idx],
+        lo_valid[lo_idx],
+        hn_idx,
+        lo_idx,
     )
+    keep = overlap_area_ha >= MIN_OVERLAP_HA
+    hn_idx, lo_idx = hn_idx[keep], lo_idx[keep]
+    print(f"Pairs with >= {MIN_OVERLAP_HA} ha overlap: {keep.sum()}", file=sys.stderr)
 
-    if pairs.empty:
+    if hn_idx.size == 0:
         return pd.DataFrame()
 
-    # Attach original (projected) geometries for polygon cropping
-    hn_geom = hn.set_index("mission_id")["geometry"].rename("hn_geom")
-    lo_geom = lo.set_index("mission_id")["geometry"].rename("lo_geom")
-    pairs = pairs.merge(hn_geom, left_on="hn_mission_id", right_index=True)
-    pairs = pairs.merge(lo_geom, left_on="lo_mission_id", right_index=True)
+    pairs = gpd.GeoDataFrame(
+        {
+            "hn_mission_id": hn["mission_id"].values[hn_idx],
+            "hn_date": hn["earliest_date_derived"].values[hn_idx],
+            "lo_mission_id": lo["mission_id"].values[lo_idx],
+            "lo_date": lo["earliest_date_derived"].values[lo_idx],
+            "geometry": intersections[keep],
+            "overlap_area_ha": overlap_area_ha[keep],
+            "date_diff_days": date_diff_days.values[keep],
+            # Original geometries for polygon cropping
+            "hn_geom": gpd.GeoSeries(hn.geometry.values[hn_idx], crs=GEOGRAPHIC_CRS),
+            "lo_geom": gpd.GeoSeries(lo.geometry.values[lo_idx], crs=GEOGRAPHIC_CRS),
+            "hn_utm_epsg": hn_utm_epsg[hn_idx],
+            "lo_utm_epsg": lo_utm_epsg[lo_idx],
+        },
+        crs=GEOGRAPHIC_CRS,
+    )
 
     # Sort: largest overlap first, then smallest date diff — used for tie-breaking
     pairs = pairs.sort_values(
@@ -288,75 +532,153 @@ def build_pair_polygons(pairs):
     - hn polygon = intersection(hn_footprint, lo_footprint)
     - lo polygon = intersection(lo_footprint, hn_footprint.buffer(LO_BUFFER_M))
 
-    Returns a GeoDataFrame with columns:
-      composite_id, mission_type ('hn'/'lo'), mission_id, date, area_m2, geometry
-    """
-    rows = []
-    for idx, row in pairs.iterrows():
-        composite_id = row["composite_id"]
-        hn_fp = make_valid(row["hn_geom"])
-        lo_fp = make_valid(row["lo_geom"])
-
-        hn_poly = hn_fp.intersection(lo_fp)
-        lo_poly = lo_fp.intersection(hn_fp.buffer(LO_BUFFER_M))
-
-        rows.append(
-            {
-                "composite_id": composite_id,
-                "mission_type": "hn",
-                "mission_id": row["hn_mission_id"],
-                "date": row["hn_date"],
-                "area_m2": hn_poly.area,
-                "geometry": hn_poly,
-            }
+    Each polygon is computed in the UTM zone of its own mission, so a mission's
+    polygons in different pairings are always measured the same way.
+
+    Returns a GeoDataFrame (in GEOGRAPHIC_CRS) with columns:
+      composite_id, mission_type ('hn'/'lo'), mission_id, date, utm_epsg, area_m2,
+      geometry
+    """
+    hn_fp = make_valid_array(pairs["hn_geom"].values)
+    lo_fp = make_valid_array(pairs["lo_geom"].values)
+    hn_ids = pairs["hn_mission_id"].values
+    lo_ids = pairs["lo_mission_id"].values
+
+    def crop_hn_zone(epsg, hn_geoms, lo_geoms, hn_keys, lo_keys):
+        hn_poly = shapely.intersection(
+            to_utm_unique(hn_geoms, hn_keys, epsg),
+            to_utm_unique(lo_geoms, lo_keys, epsg),
         )
-        rows.append(
-            {
-                "composite_id": composite_id,
-                "mission_type": "lo",
-                "mission_id": row["lo_mission_id"],
-                "date": row["lo_date"],
-                "area_m2": lo_poly.area,
-                "geometry": lo_poly,
-            }
+        return from_utm(hn_poly, epsg), shapely.area(hn_poly)
+
+    def crop_lo_zone(epsg, lo_geoms, hn_geoms, lo_keys, hn_keys):
+        # Buffer each hn footprint once, rather than once per pair
+        _, first, inverse = np.unique(hn_keys, return_index=True, return_inverse=True)
+        hn_buffered = shapely.buffer(to_utm(hn_geoms[first], epsg), LO_BUFFER_M)
+        lo_poly = shapely.intersection(
+            to_utm_unique(lo_geoms, lo_keys, epsg), hn_buffered[inverse]
         )
+        return from_utm(lo_poly, epsg), shapely.area(lo_poly)
 
-    return gpd.GeoDataFrame(rows, crs=WORKING_CRS)
+    hn_poly, hn_area = map_utm_zones(
+        crop_hn_zone, pairs["hn_utm_epsg"], hn_fp, lo_fp, hn_ids, lo_ids
+    )
+    lo_poly, lo_area = map_utm_zones(
+        crop_lo_zone, pairs["lo_utm_epsg"], lo_fp, hn_fp, lo_ids, hn_ids
+    )
+
+    hn_rows = pd.DataFrame(
+        {
+            "composite_id": pairs["composite_id"].values,
+            "mission_type": "hn",
+            "mission_id": pairs["hn_mission_id"].values,
+            "date": pairs["hn_date"].values,
+            "utm_epsg": pairs["hn_utm_epsg"].values,
+            "area_m2": hn_area,
+            "geometry": hn_poly,
+        }
+    )
+    lo_rows = pd.DataFrame(
+        {
+            "composite_id": pairs["composite_id"].values,
+            "mission_type": "lo",
+            "mission_id": pairs["lo_mission_id"].values,
+            "date": pairs["lo_date"].values,
+            "utm_epsg": pairs["lo_utm_epsg"].values,
+            "area_m2": lo_area,
+            "geometry": lo_poly,
+        }
+    )
+
+    # Interleave the rows: the hn then lo polygon of each pair
+    rows = pd.concat([hn_rows, lo_rows]).sort_index(kind="stable")
+    return gpd.GeoDataFrame(rows.reset_index(drop=True), crs=GEOGRAPHIC_CRS)
+
+
+def make_valid_array(geoms):
+    """
+    Repair invalid geometries (as shapely.validation.make_valid does, leaving valid
+    geometries untouched), returning a new object array.
+    """
+    geoms = np.array(geoms, dtype=object)
+    invalid = ~shapely.is_valid(geoms) & ~shapely.is_missing(geoms)
+    geoms[invalid] = shapely.make_valid(geoms[invalid])
+    return geoms
 
 
-def filter_subset_pairs(pairs, pair_polygons):
+def group_index_pairs(keys, ordered=True):
+    """
+    Get the positions of all pairs of distinct rows which share the same key, in a
+    single pass over the groups of rows.
+
+    Args:
+        keys: Array of keys (e.g. mission IDs), one per row. Rows with a missing key
+            are never paired.
+        ordered: If True, return both (i, j) and (j, i) for each pair of rows,
+            otherwise only i < j
+
+    Returns:
+        Tuple of (i, j) position arrays, sorted by i then j
+    """
+    positions = pd.DataFrame({"key": np.asarray(keys), "pos": np.arange(len(keys))})
+    # Rows alone in their group can't form pairs
+    group_size = positions.groupby("key")["pos"].transform("size")
+    positions = positions[group_size > 1]
+
+    candidates = positions.merge(positions, on="key", suffixes=("_i", "_j"))
+    i = candidates["pos_i"].to_numpy()
+    j = candidates["pos_j"].to_numpy()
+    keep = i != j if ordered else i < j
+    i, j = i[keep], j[keep]
+    order = np.lexsort((j, i))
+    return i[order], j[order]
+
+
+def find_subset_pairs(pair_polygons):
+    """
+    Find pairs where a mission's cropped footprint is entirely a subset of its
+    cropped footprint in a different pairing.
+
+    Returns a set of composite IDs.
+    """
+    # Candidate (smaller, larger) footprints of the same mission in different pairings
+    i, j = group_index_pairs(pair_polygons["mission_id"].values)
+    area = pair_polygons["area_m2"].to_numpy(dtype=float)
+    ai, aj = area[i], area[j]
+    # Only check if footprint i is the smaller one, and not too similar in size to
+    # consider a subset
+    candidate = (ai > 0) & (ai < aj) & (ai < SUBSET_SIZE_RATIO * aj)
+    i, j = i[candidate], j[candidate]
+
+    # Both footprints are of the same mission, so in the same UTM zone
+    def overlap_zone(epsg, gi, gj):
+        nonempty = ~(shapely.is_empty(gj) | shapely.is_missing(gj))
+        overlap_area = np.zeros(len(gi))
+        overlap_area[nonempty] = shapely.area(
+            shapely.intersection(to_utm(gi[nonempty], epsg), to_utm(gj[nonempty], epsg))
+        )
+        return (overlap_area,)
+
+    is_subset = np.zeros(len(i), dtype=bool)
+    if len(i):
+        geoms = make_valid_array(pair_polygons.geometry.values)
+        utm_epsg = pair_polygons["utm_epsg"].values
+        (overlap_area,) = map_utm_zones(overlap_zone, utm_epsg[i], geoms[i], geoms[j])
+        is_subset = overlap_area / area[i] >= SUBSET_AREA_THRESHOLD
+
+    return set(pair_polygons["composite_id"].values[i[is_subset]])
+
+
+def filter_subset_pairs(pairs, pair_polygons, pairs_to_drop=None):
     """
     Remove pairs where a mission's cropped footprint is entirely a subset of
     its cropped footprint in a different pairing.  When this occurs, keep only
     the pairing that gives that mission the larger footprint.
-    """
-    pairs_to_drop = set()
-
-    for mission_id in pair_polygons["mission_id"].unique():
-        rows = pair_polygons[pair_polygons["mission_id"] == mission_id]
-        if len(rows) <= 1:
-            continue
 
-        idxs = rows.index.tolist()
-        for i in range(len(idxs)):
-            ai = rows.loc[idxs[i], "area_m2"]
-            if ai <= 0:
-                continue
-            gi = make_valid(rows.loc[idxs[i], "geometry"])
-            for j in range(len(idxs)):
-                if i == j:
-                    continue
-                aj = rows.loc[idxs[j], "area_m2"]
-                if ai >= aj:
-                    continue  # only check if gi is the smaller one
-                if ai >= SUBSET_SIZE_RATIO * aj:
-                    continue  # too similar in size to consider a subset
-                gj = make_valid(rows.loc[idxs[j], "geometry"])
-                if gj.is_empty:
-                    continue
-                if gi.intersection(gj).area / ai >= SUBSET_AREA_THRESHOLD:
-                    pairs_to_drop.add(rows.loc[idxs[i], "composite_id"])
-                    break  # already dropping this pair, no need to check more
+    pairs_to_drop can be given if already known (see find_subset_pairs).
+    """
+    if pairs_to_drop is None:
+        pairs_to_drop = find_subset_pairs(pair_polygons)
 
     if pairs_to_drop:
         print(
@@ -373,15 +695,13 @@ def filter_subset_pairs(pairs, pair_polygons):
     return pairs, pair_polygons
 
 
-def filter_prefer_within_year(pairs, pair_polygons):
+def find_cross_year_pairs(pairs, pair_polygons):
     """
-    For missions appearing in multiple pairs, prefer within-year pairings
-    (date_diff_days < WITHIN_YEAR_DAYS).  Drop cross-year pairings unless the
-    mission's cropped footprint in the cross-year pairing is more than
-    WITHIN_YEAR_AREA_MARGIN larger than its largest within-year footprint.
-    """
-    pairs_to_drop = set()
+    Find cross-year pairings to drop in favour of within-year pairings of the same
+    mission (see filter_prefer_within_year).
 
+    Returns a set of composite IDs.
+    """
     # Merge date_diff_days onto pair_polygons for easy lookup
     pp = pair_polygons.merge(
         pairs[["composite_id", "date_diff_days"]],
@@ -389,26 +709,28 @@ def filter_prefer_within_year(pairs, pair_polygons):
         how="left",
     )
 
-    for mission_id in pp["mission_id"].unique():
-        rows = pp[pp["mission_id"] == mission_id]
-        if len(rows) <= 1:
-            continue
+    within = pp["date_diff_days"].notna() & (pp["date_diff_days"] < WITHIN_YEAR_DAYS)
 
-        within = rows[
-            rows["date_diff_days"].notna() & (rows["date_diff_days"] < WITHIN_YEAR_DAYS)
-        ]
-        cross = rows[
-            rows["date_diff_days"].isna() | (rows["date_diff_days"] >= WITHIN_YEAR_DAYS)
-        ]
+    # Largest within-year footprint of each mission (NaN if it has none)
+    best_within_area = (
+        pp["area_m2"].where(within).groupby(pp["mission_id"]).transform("max")
+    )
 
-        if within.empty or cross.empty:
-            continue
+    drop = ~within & (pp["area_m2"] <= best_within_area * (1 + WITHIN_YEAR_AREA_MARGIN))
+    return set(pp.loc[drop, "composite_id"])
 
-        best_within_area = within["area_m2"].max()
 
-        for _, crow in cross.iterrows():
-            if crow["area_m2"] <= best_within_area * (1 + WITHIN_YEAR_AREA_MARGIN):
-                pairs_to_drop.add(crow["composite_id"])
+def filter_prefer_within_year(pairs, pair_polygons, pairs_to_drop=None):
+    """
+    For missions appearing in multiple pairs, prefer within-year pairings
+    (date_diff_days < WITHIN_YEAR_DAYS).  Drop cross-year pairings unless the
+    mission's cropped footprint in the cross-year pairing is more than
+    WITHIN_YEAR_AREA_MARGIN larger than its largest within-year footprint.
+
+    pairs_to_drop can be given if already known (see find_cross_year_pairs).
+    """
+    if pairs_to_drop is None:
+        pairs_to_drop = find_cross_year_pairs(pairs, pair_polygons)
 
     if pairs_to_drop:
         print(
@@ -428,25 +750,75 @@ def select_images(pair_polygons, images_gdf):
     """
     Select images that fall within each pair polygon.
 
-    Returns a GeoDataFrame of images with composite_id and mission_type attached.
+    Each pair polygon is only tested against the images of its own mission, in the
+    mission's UTM zone, so only the images of paired missions are reprojected and
+    tested.
+
+    Returns a GeoDataFrame (in GEOGRAPHIC_CRS) of images with composite_id and
+    mission_type attached.
     """
-    images = images_gdf.to_crs(WORKING_CRS)
+    images = images_gdf[images_gdf["mission_id"].isin(pair_polygons["mission_id"])]
+    images = images.to_crs(GEOGRAPHIC_CRS)
+    lon = shapely.get_x(images.geometry.values)
+    lat = shapely.get_y(images.geometry.values)
+    mission_image_positions = images.groupby("mission_id").indices
+
+    def select_zone(epsg, polygon_positions):
+        polygons = to_utm(pair_polygons.geometry.values[polygon_positions], epsg)
+        shapely.prepare(polygons)
+        mission_ids = pair_polygons["mission_id"].values[polygon_positions]
+
+        # Project the images of the zone's missions, in one batch
+        zone_mission_ids = [
+            m for m in pd.unique(mission_ids) if m in mission_image_positions
+        ]
+        if not zone_mission_ids:
+            return [], []
+        positions = [mission_image_positions[m] for m in zone_mission_ids]
+        x, y = get_utm_transformer(epsg).transform(
+            lon[np.concatenate(positions)], lat[np.concatenate(positions)]
+        )
+        splits = np.cumsum([len(p) for p in positions])[:-1]
+        zone_images = {
+            m: (p, mx, my)
+            for m, p, mx, my in zip(
+                zone_mission_ids, positions, np.split(x, splits), np.split(y, splits)
+            )
+        }
 
-    # Spatial join: each image matched to the pair polygon(s) it falls within
-    selected = gpd.sjoin(
-        images,
-        pair_polygons[
-            ["composite_id", "mission_type", "mission_id", "geometry"]
-        ].rename(columns={"mission_id": "pair_mission_id"}),
-        how="inner",
-        predicate="within",
-    )
+        image_idx = []
+        polygon_idx = []
+        for k, mission_id, polygon in zip(polygon_positions, mission_ids, polygons):
+            if mission_id not in zone_images or polygon is None:
+                continue
+            positions, mx, my = zone_images[mission_id]
+            # Points strictly inside the polygon, as for the "within" predicate
+            inside = positions[shapely.contains_xy(polygon, mx, my)]
+            image_idx.append(inside)
+            polygon_idx.append(np.full(len(inside), k))
+        return image_idx, polygon_idx
+
+    # Each mission's polygons are all in its UTM zone
+    zones = pair_polygons.groupby("utm_epsg").indices
+    with ThreadPoolExecutor(max(1, min(ZONE_WORKERS, len(zones)))) as executor:
+        zone_results = list(executor.map(select_zone, zones, zones.values()))
+
+    image_positions = [a for image_idx, _ in zone_results for a in image_idx]
+    polygon_positions = [a for _, polygon_idx in zone_results for a in polygon_idx]
+    if image_positions:
+        image_positions = np.concatenate(image_positions)
+        polygon_positions = np.concatenate(polygon_positions)
+    else:
+        image_positions = polygon_positions = np.array([], dtype=int)
 
-    # Keep only images whose mission_id matches the pair's mission_id
-    selected = selected[selected["mission_id"] == selected["pair_mission_id"]].copy()
-    selected.drop(
-        columns=["index_right", "pair_mission_id"], errors="ignore", inplace=True
-    )
+    # Order by image then pair polygon, as a spatial join would
+    order = np.lexsort((polygon_positions, image_positions))
+    image_positions = image_positions[order]
+    polygon_positions = polygon_positions[order]
+
+    selected = images.iloc[image_positions].copy()
+    selected["composite_id"] = pair_polygons["composite_id"].values[polygon_positions]
+    selected["mission_type"] = pair_polygons["mission_type"].values[polygon_positions]
 
     return selected
 
@@ -470,13 +842,13 @@ def report_duplications(pairs):
 
     print("\n=== Duplication report ===", file=sys.stderr)
 
-    hn_overlap_cache = {}
+    hn_overlap_cache = _compute_partner_overlaps(
+        pairs, "hn_mission_id", "lo_mission_id", "lo_geom", "hn_utm_epsg"
+    )
+    hn_partners = pairs.groupby("hn_mission_id")["lo_mission_id"].agg(list)
     for mission_id, count in sorted(multi_hn.items()):
-        partner_rows = pairs[pairs["hn_mission_id"] == mission_id]
-        partners = partner_rows["lo_mission_id"].tolist()
-        partner_geoms = partner_rows["lo_geom"].tolist()
-        overlaps = _compute_partner_overlaps(partner_geoms, partners)
-        hn_overlap_cache[mission_id] = overlaps
+        partners = hn_partners[mission_id]
+        overlaps = hn_overlap_cache[mission_id]
         dup_type = "same-area" if _is_same_area(overlaps) else "different-area"
         overlap_str = ", ".join(f"{a}–{b}: {pct:.0f}%" for a, b, pct in overlaps)
         print(
@@ -486,13 +858,13 @@ def report_duplications(pairs):
             file=sys.stderr,
         )
 
-    lo_overlap_cache = {}
+    lo_overlap_cache = _compute_partner_overlaps(
+        pairs, "lo_mission_id", "hn_mission_id", "hn_geom", "lo_utm_epsg"
+    )
+    lo_partners = pairs.groupby("lo_mission_id")["hn_mission_id"].agg(list)
     for mission_id, count in sorted(multi_lo.items()):
-        partner_rows = pairs[pairs["lo_mission_id"] == mission_id]
-        partners = partner_rows["hn_mission_id"].tolist()
-        partner_geoms = partner_rows["hn_geom"].tolist()
-        overlaps = _compute_partner_overlaps(partner_geoms, partners)
-        lo_overlap_cache[mission_id] = overlaps
+        partners = lo_partners[mission_id]
+        overlaps = lo_overlap_cache[mission_id]
         dup_type = "same-area" if _is_same_area(overlaps) else "different-area"
         overlap_str = ", ".join(f"{a}–{b}: {pct:.0f}%" for a, b, pct in overlaps)
         print(
@@ -521,25 +893,56 @@ def report_duplications(pairs):
     )
 
 
-def _compute_partner_overlaps(geoms, labels):
+def _compute_partner_overlaps(
+    pairs, mission_col, partner_col, partner_geom_col, zone_col
+):
     """
-    Compute pairwise overlap percentages between partner geometries.
+    For each mission appearing in multiple pairs, compute pairwise overlap
+    percentages between the footprints of its partners, in the mission's UTM zone
+    (zone_col).
 
-    Returns a list of (label_i, label_j, overlap_pct) tuples for all pairs,
-    where overlap_pct is intersection area / smaller geometry area * 100.
+    Returns a dict mapping mission ID -> list of (partner_i, partner_j, overlap_pct)
+    tuples for all pairs of its partners, where overlap_pct is intersection area /
+    smaller geometry area * 100.
     """
-    overlaps = []
-    for i in range(len(geoms)):
-        for j in range(i + 1, len(geoms)):
-            g1 = make_valid(geoms[i])
-            g2 = make_valid(geoms[j])
-            if g1.is_empty or g2.is_empty:
-                overlaps.append((labels[i], labels[j], 0.0))
-                continue
-            inter = g1.intersection(g2).area
-            smaller = min(g1.area, g2.area)
-            pct = (inter / smaller * 100) if smaller > 0 else 0.0
-            overlaps.append((labels[i], labels[j], pct))
+    i, j = group_index_pairs(pairs[mission_col].values, ordered=False)
+    if len(i) == 0:
+        return {}
+
+    def overlap_pct_zone(epsg, g1, g2, keys1, keys2):
+        g1 = to_utm_unique(g1, keys1, epsg)
+        g2 = to_utm_unique(g2, keys2, epsg)
+        nonempty = ~(
+            shapely.is_empty(g1)
+            | shapely.is_empty(g2)
+            | shapely.is_missing(g1)
+            | shapely.is_missing(g2)
+        )
+        inter = np.zeros(len(g1))
+        inter[nonempty] = shapely.area(shapely.intersection(g1[nonempty], g2[nonempty]))
+        smaller = np.minimum(shapely.area(g1), shapely.area(g2))
+        pct = np.zeros(len(g1))
+        positive = nonempty & (smaller > 0)
+        pct[positive] = inter[positive] / smaller[positive] * 100
+        return (pct,)
+
+    geoms = make_valid_array(pairs[partner_geom_col].values)
+    partners = pairs[partner_col].values
+    (pct,) = map_utm_zones(
+        overlap_pct_zone,
+        pairs[zone_col].values[i],
+        geoms[i],
+        geoms[j],
+        partners[i],
+        partners[j],
+    )
+
+    mission_ids = pairs[mission_col].values
+    overlaps = {}
+    for mission_id, label_i, label_j, overlap_pct in zip(
+        mission_ids[i], partners[i], partners[j], pct
+    ):
+        overlaps.setdefault(mission_id, []).append((label_i, label_j, overlap_pct))
     return overlaps
 
 
@@ -548,6 +951,308 @@ def _is_same_area(overlaps):
     return any(pct > 25 for _, _, pct in overlaps)
 
 
+# ---------------------------------------------------------------------------
+# Incremental pairing
+# ---------------------------------------------------------------------------
+
+
+def get_pairing_settings(criteria):
+    """
+    Get all the settings the pairing results depend on. A pairing state saved with
+    other settings can't be reused.
+    """
+    return {
+        "criteria": criteria,
+        "max_date_diff_days": MAX_DATE_DIFF_DAYS,
+        "min_overlap_ha": MIN_OVERLAP_HA,
+        "lo_buffer_m": LO_BUFFER_M,
+        "subset_area_threshold": SUBSET_AREA_THRESHOLD,
+        "subset_size_ratio": SUBSET_SIZE_RATIO,
+        "within_year_days": WITHIN_YEAR_DAYS,
+        "within_year_area_margin": WITHIN_YEAR_AREA_MARGIN,
+    }
+
+
+def get_mission_fingerprints(missions_gdf):
+    """
+    Get a fingerprint of the footprint and PAIRING_COLUMNS of each mission, to
+    detect new and changed missions.
+
+    Returns a dict mapping mission ID -> fingerprint.
+    """
+    footprints = shapely.to_wkb(missions_gdf.geometry.values)
+    columns = [
+        missions_gdf[col].values for col in PAIRING_COLUMNS if col in missions_gdf
+    ]
+
+    fingerprints = {}
+    for mission_id, footprint, *values in zip(
+        missions_gdf["mission_id"].values, footprints, *columns
+    ):
+        fingerprint = hashlib.blake2b(footprint or b"", digest_size=16)
+        fingerprint.update("\x1f".join(map(str, values)).encode())
+        fingerprints[mission_id] = fingerprint.hexdigest()
+    return fingerprints
+
+
+def load_pairing_state(state_path):
+    """
+    Load the pairing state saved by a previous run.
+
+    Returns the state dict, or None if the file doesn't exist, can't be read, or is
+    of another version.
+    """
+    if not os.path.exists(state_path):
+        return None
+    try:
+        with open(state_path, "rb") as f:
+            state = pickle.load(f)
+    except Exception as e:
+        print(
+            f"Warning: Ignoring unreadable pairing state {state_path}: {e}",
+            file=sys.stderr,
+        )
+        return None
+    if state.get("version") != PAIRING_STATE_VERSION:
+        print(
+            f"Ignoring pairing state {state_path} of another version",
+            file=sys.stderr,
+        )
+        return None
+    return state
+
+
+def save_pairing_state(state_path, state):
+    """Save the pairing state for the next run."""
+    # Write to a temporary file first, so a failed run never leaves a partial state
+    os.makedirs(os.path.dirname(os.path.abspath(state_path)), exist_ok=True)
+    tmp_path = f"{state_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(state, f)
+    os.replace(tmp_path, state_path)
+    print(f"Saved pairing state to {state_path}", file=sys.stderr)
+
+
+def _missions_touching(pairs, mission_ids):
+    """Boolean mask of the pairs with either mission in mission_ids."""
+    return pairs["hn_mission_id"].isin(mission_ids) | pairs["lo_mission_id"].isin(
+        mission_ids
+    )
+
+
+def _pair_missions(pairs):
+    """Set of the mission IDs in pairs."""
+    if pairs.empty:
+        return set()
+    return set(pairs["hn_mission_id"]) | set(pairs["lo_mission_id"])
+
+
+def run_pairing(missions_gdf, state=None, criteria=None):
+    """
+    Find the valid hn–lo pairs, build their polygons, and filter them, reusing the
+    results of a previous run for the missions which haven't changed since.
+
+    With a state, only the candidate pairs involving new or changed missions are
+    computed, and the subset and within-year filters are only re-run for the pairs
+    whose outcome can depend on the missions affected by the change. The results are
+    the same as those of a full recompute (without a state).
+
+    Args:
+        missions_gdf: GeoDataFrame of all missions
+        state: Pairing state saved by a previous run (see load_pairing_state), or
+            None to pair all missions from scratch
+        criteria: Optional dict of classification thresholds (see
+            get_classification_criteria)
+
+    Returns:
+        Tuple of (pairs, pair_polygons, state): the pairs and their polygons which
+        pass the filters (empty if there are no valid pairs), and the pairing state
+        to save for the next run
+    """
+    if criteria is None:
+        criteria = get_classification_criteria()
+    settings = get_pairing_settings(criteria)
+    fingerprints = get_mission_fingerprints(missions_gdf)
+
+    if state is not None and state["settings"] != settings:
+        print(
+            "Pairing settings changed since the pairing state was saved, "
+            "re-pairing all missions",
+            file=sys.stderr,
+        )
+        state = None
+
+    # ---- Valid pairs ------------------------------------------------------
+    if state is None:
+        all_pairs = find_valid_pairs(missions_gdf, criteria)
+    else:
+        old_fingerprints = state["fingerprints"]
+        changed = {m for m, fp in fingerprints.items() if old_fingerprints.get(m) != fp}
+        removed = set(old_fingerprints) - set(fingerprints)
+        print(
+            f"Pairing state: {len(changed)} new or changed and {len(removed)} "
+            f"removed missions since the last run",
+            file=sys.stderr,
+        )
+        stale = changed | removed
+
+        old_pairs = state["pairs"]
+        if old_pairs.empty:
+            kept_pairs = old_pairs
+            dropped_pairs = old_pairs
+        else:
+            is_stale = _missions_touching(old_pairs, stale)
+            kept_pairs = old_pairs[~is_stale].copy()
+            dropped_pairs = old_pairs[is_stale]
+
+            # Footprints aren't saved in the state, as they're unchanged
+            footprints = missions_gdf.to_crs(GEOGRAPHIC_CRS).set_index("mission_id")
+            footprints = footprints.geometry[~footprints.index.duplicated()]
+            for mission_type in ["hn", "lo"]:
+                kept_pairs[f"{mission_type}_geom"] = gpd.GeoSeries(
+                    footprints.reindex(kept_pairs[f"{mission_type}_mission_id"]).values,
+                    index=kept_pairs.index,
+                    crs=GEOGRAPHIC_CRS,
+                )
+
+        new_pairs = pd.DataFrame()
+        if changed:
+            new_pairs = find_valid_pairs(missions_gdf, criteria, only_missions=changed)
+
+        parts = [p for p in [kept_pairs, new_pairs] if not p.empty]
+        all_pairs = pd.concat(parts) if parts else pd.DataFrame()
+
+    if all_pairs.empty:
+        state = {
+            "version": PAIRING_STATE_VERSION,
+            "settings": settings,
+            "fingerprints": fingerprints,
+            "pairs": pd.DataFrame(),
+            "pair_polygons": pd.DataFrame(),
+            "subset_pairs": set(),
+            "cross_year_pairs": set(),
+        }
+        return pd.DataFrame(), pd.DataFrame(), state
+
+    if state is not None:
+        # Same order as a full recompute: largest overlap first, then smallest date
+        # diff, then the order of the missions
+        mission_order = pd.Series(
+            np.arange(len(missions_gdf)), index=missions_gdf["mission_id"].values
+        )
+        mission_order = mission_order[~mission_order.index.duplicated()]
+        all_pairs = (
+            all_pairs.assign(
+                _hn_order=all_pairs["hn_mission_id"].map(mission_order).values,
+                _lo_order=all_pairs["lo_mission_id"].map(mission_order).values,
+            )
+            .sort_values(
+                ["overlap_area_ha", "date_diff_days", "_hn_order", "_lo_order"],
+                ascending=[False, True, True, True],
+                kind="stable",
+            )
+            .drop(columns=["_hn_order", "_lo_order"])
+            .reset_index(drop=True)
+        )
+
+    print(f"\nFound {len(all_pairs)} valid pairs", file=sys.stderr)
+    report_duplications(all_pairs)
+
+    # ---- Build output polygons --------------------------------------------
+    if state is None:
+        all_polygons = build_pair_polygons(all_pairs)
+    else:
+        kept_polygons = state["pair_polygons"]
+        if not kept_polygons.empty:
+            kept_polygons = kept_polygons[
+                kept_polygons["composite_id"].isin(kept_pairs["composite_id"])
+            ]
+        polygons = [kept_polygons]
+        if not new_pairs.empty:
+            polygons.append(build_pair_polygons(new_pairs))
+        all_polygons = pd.concat([p for p in polygons if not p.empty])
+
+        # The hn then lo polygon of each pair, in the order of the pairs
+        pair_order = pd.Series(
+            np.arange(len(all_pairs)), index=all_pairs["composite_id"].values
+        )
+        all_polygons = (
+            all_polygons.assign(
+                _order=all_polygons["composite_id"].map(pair_order).values
+            )
+            .sort_values(["_order", "mission_type"], kind="stable")
+            .drop(columns="_order")
+            .reset_index(drop=True)
+        )
+
+    # ---- Filter subset pairs and prefer within-year pairings --------------
+    if state is None:
+        subset_pairs = find_subset_pairs(all_polygons)
+        is_subset = all_polygons["composite_id"].isin(subset_pairs)
+        cross_year_pairs = find_cross_year_pairs(
+            all_pairs[~all_pairs["composite_id"].isin(subset_pairs)],
+            all_polygons[~is_subset],
+        )
+    else:
+        # Missions whose set of pairings changed
+        affected = stale | _pair_missions(dropped_pairs)
+        if not new_pairs.empty:
+            affected |= _pair_missions(new_pairs)
+
+        # Whether a pair is a subset pairing depends on all pairings of its missions
+        touching = all_pairs[_missions_touching(all_pairs, affected)]
+        subset_missions = _pair_missions(touching)
+        recomputed = set(touching["composite_id"])
+        subset_pairs = (state["subset_pairs"] - recomputed) | (
+            find_subset_pairs(
+                all_polygons[all_polygons["mission_id"].isin(subset_missions)]
+            )
+            & recomputed
+        )
+        subset_pairs &= set(all_pairs["composite_id"])
+
+        # Whether a pair is dropped in favour of a within-year pairing depends on all
+        # remaining pairings of its missions, which may have changed for any mission
+        # paired with an affected mission
+        surviving_pairs = all_pairs[~all_pairs["composite_id"].isin(subset_pairs)]
+        surviving_polygons = all_polygons[
+            ~all_polygons["composite_id"].isin(subset_pairs)
+        ]
+        touching = all_pairs[_missions_touching(all_pairs, affected | subset_missions)]
+        cross_year_missions = _pair_missions(touching)
+        recomputed = set(touching["composite_id"])
+        cross_year_pairs = (state["cross_year_pairs"] - recomputed) | (
+            find_cross_year_pairs(
+                surviving_pairs,
+                surviving_polygons[
+                    surviving_polygons["mission_id"].isin(cross_year_missions)
+                ],
+            )
+            & recomputed
+        )
+        cross_year_pairs &= set(surviving_pairs["composite_id"])
+
+    pairs, pair_polygons = filter_subset_pairs(all_pairs, all_polygons, subset_pairs)
+    pairs, pair_polygons = filter_prefer_within_year(
+        pairs, pair_polygons, cross_year_pairs
+    )
+
+    # Footprints are left out of the saved pairs, as they're in the missions
+    saved_pairs = all_pairs.copy()
+    saved_pairs["hn_geom"] = None
+    saved_pairs["lo_geom"] = None
+    state = {
+        "version": PAIRING_STATE_VERSION,
+        "settings": settings,
+        "fingerprints": fingerprints,
+        "pairs": saved_pairs,
+        "pair_polygons": all_polygons,
+        "subset_pairs": subset_pairs,
+        "cross_year_pairs": cross_year_pairs,
+    }
+    return pairs, pair_polygons, state
+
+
 # ---------------------------------------------------------------------------
 # Main
 # ---------------------------------------------------------------------------
@@ -587,6 +1292,19 @@ def main():
         "Requires --bucket.",
     )
 
+    # Incremental pairing
+    parser.add_argument(
+        "--pairing-state",
+        help="Local file to keep the pairing state in between runs. Only missions "
+        "which are new or changed since the last run are then re-paired.",
+    )
+    parser.add_argument(
+        "--full-recompute",
+        action="store_true",
+        help="Ignore the saved pairing state and re-pair all missions (the state is "
+        "still saved for the next run)",
+    )
+
     args = parser.parse_args()
 
     # Expand ~ in paths
@@ -598,6 +1316,8 @@ def main():
         args.local_output_composites_folder = os.path.expanduser(
             args.local_output_composites_folder
         )
+    if args.pairing_state:
+        args.pairing_state = os.path.expanduser(args.pairing_state)
 
     # Validate args
     using_s3 = args.bucket and args.missions_prefix
@@ -634,26 +1354,22 @@ def main():
         file=sys.stderr,
     )
 
-    # ---- Find pairs -------------------------------------------------------
-    pairs = find_valid_pairs(missions_gdf)
-    if pairs.empty:
-        print("No valid pairs found. Exiting.", file=sys.stderr)
-        sys.exit(0)
-
-    print(f"\nFound {len(pairs)} valid pairs", file=sys.stderr)
-    report_duplications(pairs)
+    # ---- Find, crop, and filter pairs -------------------------------------
+    state = None
+    if args.pairing_state and not args.full_recompute:
+        state = load_pairing_state(args.pairing_state)
 
-    # ---- Build output polygons --------------------------------------------
-    pair_polygons = build_pair_polygons(pairs)
+    pairs, pair_polygons, state = run_pairing(missions_gdf, state)
 
-    # ---- Filter subset pairs ----------------------------------------------
-    pairs, pair_polygons = filter_subset_pairs(pairs, pair_polygons)
+    if args.pairing_state:
+        save_pairing_state(args.pairing_state, state)
 
-    # ---- Prefer within-year pairings --------------------------------------
-    pairs, pair_polygons = filter_prefer_within_year(pairs, pair_polygons)
+    if pairs.empty:
+        print("No valid pairs found. Exiting.", file=sys.stderr)
+        sys.exit(0)
 
-    # Back to geographic CRS for output
-    pair_polygons_out = pair_polygons.to_crs("EPSG:4326")
+    # Already in geographic CRS for output
+    pair_polygons_out = pair_polygons
 
     print(
         f"\nPair polygons: {len(pair_polygons_out)} rows "
@@ -663,7 +1379,7 @@ def main():
 
     # ---- Select images ----------------------------------------------------
     selected_images = select_images(pair_polygons, images_gdf)
-    selected_images_out = selected_images.to_crs("EPSG:4326")
+    selected_images_out = selected_images
 
     print(f"Selected images: {len(selected_images_out)} rows", file=sys.stderr)
 
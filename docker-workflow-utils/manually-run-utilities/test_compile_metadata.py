@@ -0,0 +1,140 @@
+import sqlite3
+import threading
+import time
+
+import compile_metadata
+import geopandas as gpd
+import pandas as pd
+import pytest
+from compile_metadata import compile_files, read_files_in_order
+from shapely.geometry import Point
+
+# GDAL warns that datetimes with a time zone are non-conformant in a GeoPackage
+pytestmark = pytest.mark.filterwarnings("ignore:Non-conformant content")
+
+
+def write_metadata(tmp_path, mission_id, datetimes):
+    """Write an image metadata file with the given datetimes, returning its path."""
+    path = tmp_path / f"{mission_id}_image-metadata.gpkg"
+    gpd.GeoDataFrame(
+        {"datetime_local": datetimes},
+        geometry=[Point(0, 0)] * len(datetimes),
+        crs=32610,
+    ).to_file(path, driver="GPKG")
+    return path
+
+
+def read_stored_datetimes(path):
+    """Read the datetimes of a compiled file as they are stored in the GeoPackage."""
+    with sqlite3.connect(path) as conn:
+        return [
+            row[0]
+            for row in conn.execute(
+                f'SELECT datetime_local FROM "{path.stem}" ORDER BY fid'
+            )
+        ]
+
+
+def compile_datetimes(tmp_path, datetimes_by_mission):
+    paths = [
+        write_metadata(tmp_path, mission_id, pd.to_datetime(datetimes))
+        for mission_id, datetimes in datetimes_by_mission.items()
+    ]
+    output_path = tmp_path / "metadata-images-compiled.gpkg"
+    compile_files(paths, output_path, "image-metadata", n_workers=2)
+    return read_stored_datetimes(output_path)
+
+
+def test_naive_datetimes_are_kept(tmp_path):
+    stored = compile_datetimes(
+        tmp_path, {"000001": ["2023-05-01 10:00"], "000002": ["2023-05-02 11:30"]}
+    )
+    assert stored == ["2023-05-01T10:00:00", "2023-05-02T11:30:00"]
+
+
+def test_datetime_offsets_are_kept(tmp_path):
+    stored = compile_datetimes(
+        tmp_path,
+        {"000001": ["2023-05-01 10:00-07:00"], "000002": ["2023-05-02 11:30-07:00"]},
+    )
+    assert stored == ["2023-05-01T10:00:00-07:00", "2023-05-02T11:30:00-07:00"]
+
+    compiled = gpd.read_file(tmp_path / "metadata-images-compiled.gpkg")
+    assert compiled.datetime_local.iloc[0] == pd.Timestamp("2023-05-01 10:00-07:00")
+
+
+def test_utc_datetimes_are_kept(tmp_path):
+    stored = compile_datetimes(tmp_path, {"000001": ["2023-05-01 10:00Z"]})
+    assert stored == ["2023-05-01T10:00:00Z"]
+
+
+def test_mixed_time_zones_are_kept_as_strings(tmp_path):
+    stored = compile_datetimes(
+        tmp_path,
+        {
+            "000001": ["2023-05-01 10:00-07:00"],
+            "000002": ["2023-05-02 11:30+02:00"],
+            "000003": ["2023-05-03 12:00"],
+        },
+    )
+    assert stored == [
+        "2023-05-01T10:00:00-07:00",
+        "2023-05-02T11:30:00+02:00",
+        "2023-05-03T12:00:00",
+    ]
+
+
+def test_files_are_read_in_batches(tmp_path, monkeypatch):
+    monkeypatch.setattr(compile_metadata, "READ_BATCH_ROWS", 2)
+    monkeypatch.setattr(compile_metadata, "WRITE_BATCH_ROWS", 3)
+    datetimes = {
+        "000001": [f"2023-05-01 1{i}:00-07:00" for i in range(5)],
+        "000002": [],
+        "000003": [f"2023-05-03 1{i}:00" for i in range(3)],
+    }
+    stored = compile_datetimes(tmp_path, datetimes)
+    assert stored == [f"2023-05-01T1{i}:00:00-07:00" for i in range(5)] + [
+        f"2023-05-03T1{i}:00:00" for i in range(3)
+    ]
+
+    compiled = gpd.read_file(tmp_path / "metadata-images-compiled.gpkg")
+    assert compiled.mission_id.tolist() == ["000001"] * 5 + ["000003"] * 3
+
+
+def test_read_ahead_is_bounded():
+    n_read = {}
+    lock = threading.Lock()
+
+    def read_batches(path):
+        for i in range(20):
+            with lock:
+                n_read[path] = i + 1
+            yield i
+
+    n_workers = 2
+    # The batches in the queue of each file being read, and one being put into it
+    max_read_ahead = n_workers * (compile_metadata.READ_AHEAD_BATCHES + 1)
+    n_consumed = 0
+    ends_of_files = []
+    for path, batch in read_files_in_order(read_batches, ["a", "b", "c"], n_workers):
+        # Give the other threads time to read ahead as far as they can
+        time.sleep(0.002)
+        if batch is None:
+            ends_of_files.append(path)
+            continue
+        n_consumed += 1
+        with lock:
+            assert sum(n_read.values()) - n_consumed <= max_read_ahead
+
+    assert ends_of_files == ["a", "b", "c"]
+    assert n_consumed == 3 * 20
+
+
+def test_read_errors_are_raised():
+    def read_batches(path):
+        yield 1
+        if path == "b":
+            raise OSError("unreadable")
+
+    with pytest.raises(OSError, match="unreadable"):
+        list(read_files_in_order(read_batches, ["a", "b", "c"], n_workers=2))
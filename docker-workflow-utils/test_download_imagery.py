@@ -0,0 +1,345 @@
+import fcntl
+import hashlib
+import io
+import os
+import struct
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import download_imagery
+import pytest
+from download_imagery import (
+    CACHE_COMPLETE_FILE,
+    evict_cache_entries,
+    extract_zip_with_cache,
+    read_s3_zip_members,
+    stream_extract_zip,
+)
+
+BUCKET = "bucket"
+KEY = "missions/000001_images.zip"
+
+# Members of the test zip file, each stored or deflated
+MEMBERS = {
+    "000001/": (b"", zipfile.ZIP_STORED),
+    "000001/000001_a.JPG": (bytes(range(256)) * 400, zipfile.ZIP_STORED),
+    "000001/000001_b.JPG": (b"forest canopy " * 5000, zipfile.ZIP_DEFLATED),
+    "000001/000001_c.JPG": (b"", zipfile.ZIP_DEFLATED),
+}
+
+
+class FakeBody:
+    """The streaming body of an S3 get_object response."""
+
+    def __init__(self, data: bytes):
+        self._file = io.BytesIO(data)
+
+    def read(self, size=-1):
+        return self._file.read(size)
+
+    def iter_chunks(self, chunk_size):
+        while chunk := self._file.read(chunk_size):
+            yield chunk
+
+    def close(self):
+        self._file.close()
+
+
+class FakeS3Client:
+    """The head_object and get_object calls of a boto3 S3 client, serving objects in memory."""
+
+    def __init__(self, objects):
+        self.objects = objects
+        self.ranges = []
+
+    def head_object(self, Bucket, Key):
+        data = self.objects[f"{Bucket}/{Key}"]
+        return {
+            "ContentLength": len(data),
+            "ETag": f'"{hashlib.md5(data).hexdigest()}"',
+            "Metadata": {},
+        }
+
+    def get_object(self, Bucket, Key, Range):
+        data = self.objects[f"{Bucket}/{Key}"]
+        start, end = (int(i) for i in Range[len("bytes=") :].split("-"))
+        self.ranges.append((start, end + 1))
+        return {"Body": FakeBody(data[start : end + 1])}
+
+
+def make_zip(members=MEMBERS, force_zip64=False):
+    """Write a zip file in memory, optionally with zip64 local headers."""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as zip_file:
+        for name, (data, compress_type) in members.items():
+            info = zipfile.ZipInfo(name, date_time=(2023, 5, 1, 10, 0, 0))
+            info.compress_type = compress_type
+            if info.is_dir():
+                zip_file.writestr(info, data)
+                continue
+            with zip_file.open(info, "w", force_zip64=force_zip64) as f:
+                f.write(data)
+    return buffer.getvalue()
+
+
+def make_large_zip(monkeypatch):
+    """
+    Write a zip file in memory laid out like one larger than 4 GiB, where the sizes and offsets of
+    the members and of the central directory are only in zip64 fields.
+    """
+    with monkeypatch.context() as m:
+        m.setattr(zipfile, "ZIP64_LIMIT", 0)
+        data = bytearray(make_zip(force_zip64=True))
+
+    # zipfile only defers the central directory to the zip64 record when it is really too large
+    eocd_index = data.rfind(b"PK\x05\x06")
+    data[eocd_index + 12 : eocd_index + 20] = struct.pack("<II", 0xFFFFFFFF, 0xFFFFFFFF)
+    return bytes(data)
+
+
+def extract(monkeypatch, tmp_path, data, images_subset=None):
+    """Stream a zip file from a fake S3 client, returning the client."""
+    client = FakeS3Client({f"{BUCKET}/{KEY}": data})
+    monkeypatch.setattr(
+        download_imagery, "get_s3_client", lambda max_pool_connections=10: client
+    )
+    stream_extract_zip(f"{BUCKET}/{KEY}", str(tmp_path / "extracted"), 2, images_subset)
+    return client
+
+
+def read_files(root):
+    """Read every file below a directory, keyed by its path relative to the directory."""
+    return {
+        path.relative_to(root).as_posix(): path.read_bytes()
+        for path in root.rglob("*")
+        if path.is_file()
+    }
+
+
+def expected_files(names=None):
+    return {
+        name: data
+        for name, (data, _) in MEMBERS.items()
+        if not name.endswith("/") and (names is None or name in names)
+    }
+
+
+@pytest.mark.parametrize("force_zip64", [False, True])
+def test_stream_extract_zip(monkeypatch, tmp_path, force_zip64):
+    data = make_zip(force_zip64=force_zip64)
+    extract(monkeypatch, tmp_path, data)
+
+    assert read_files(tmp_path / "extracted") == expected_files()
+    assert (tmp_path / "extracted" / "000001").is_dir()
+
+
+def test_zip64_central_directory(monkeypatch, tmp_path):
+    data = make_large_zip(monkeypatch)
+    client = FakeS3Client({f"{BUCKET}/{KEY}": data})
+
+    members = read_s3_zip_members(client, BUCKET, KEY)
+
+    # The zip64 end of central directory record is read to find the central directory
+    zip64_eocd_offset = data.rfind(b"PK\x06\x06")
+    assert (zip64_eocd_offset, zip64_eocd_offset + 56) in client.ranges
+    with zipfile.ZipFile(io.BytesIO(data)) as zip_file:
+        expected = zip_file.infolist()
+    assert [(m.filename, m.header_offset) for m, _ in members] == [
+        (m.filename, m.header_offset) for m in expected
+    ]
+    # Each member ends where the next one starts
+    assert [end for _, end in members[:-1]] == [m.header_offset for m in expected[1:]]
+
+    extract(monkeypatch, tmp_path, data)
+    assert read_files(tmp_path / "extracted") == expected_files()
+
+
+def test_images_subset(monkeypatch, tmp_path):
+    data = make_zip()
+    client = extract(monkeypatch, tmp_path, data, images_subset={"000001_b"})
+
+    assert read_files(tmp_path / "extracted") == expected_files({"000001/000001_b.JPG"})
+
+    # Besides the end of the file and the central directory, only the member in the subset is read
+    with zipfile.ZipFile(io.BytesIO(data)) as zip_file:
+        member = zip_file.getinfo("000001/000001_b.JPG")
+    member_ranges = [r for r in client.ranges if r[1] < len(data)]
+    assert [start for start, _ in member_ranges] == [member.header_offset]
+
+
+def test_crc_mismatch(monkeypatch, tmp_path):
+    data = bytearray(make_zip())
+    # Corrupt the data of the stored member
+    index = data.find(bytes(range(256)))
+    data[index] ^= 0xFF
+
+    with pytest.raises(zipfile.BadZipFile, match="CRC mismatch"):
+        extract(monkeypatch, tmp_path, bytes(data))
+
+    # Neither the corrupt member nor its partial file are left behind
+    extracted = read_files(tmp_path / "extracted")
+    assert "000001/000001_a.JPG" not in extracted
+    assert not any(name.endswith(".part") for name in extracted)
+
+
+def test_retry_only_fetches_missing_members(monkeypatch, tmp_path):
+    data = make_zip()
+    extract(monkeypatch, tmp_path, data)
+
+    # A member which was never extracted, and one whose file does not match it
+    Path(tmp_path, "extracted", "000001", "000001_a.JPG").unlink()
+    b_path = Path(tmp_path, "extracted", "000001", "000001_b.JPG")
+    b_path.write_bytes(bytes(len(b_path.read_bytes())))
+
+    client = extract(monkeypatch, tmp_path, data)
+
+    assert read_files(tmp_path / "extracted") == expected_files()
+    with zipfile.ZipFile(io.BytesIO(data)) as zip_file:
+        refetched = [
+            zip_file.getinfo(name).header_offset
+            for name in ["000001/000001_a.JPG", "000001/000001_b.JPG"]
+        ]
+    member_ranges = [r for r in client.ranges if r[1] < len(data)]
+    assert sorted(start for start, _ in member_ranges) == refetched
+
+
+def test_member_outside_extract_dir(monkeypatch, tmp_path):
+    data = make_zip({"../000001_a.JPG": (b"outside", zipfile.ZIP_STORED)})
+
+    with pytest.raises(ValueError, match="outside"):
+        extract(monkeypatch, tmp_path, data)
+
+    assert not Path(tmp_path, "000001_a.JPG").exists()
+
+
+class FakeFetch:
+    """Stands in for fetch_and_extract_zip, writing the given files with a delay after each."""
+
+    def __init__(self, files, delay=0.0, fail=False):
+        self.files = files
+        self.delay = delay
+        self.fail = fail
+        self.n_calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, s3_path, download_dir, extract_dir, **kwargs):
+        with self._lock:
+            self.n_calls += 1
+        for i, (name, data) in enumerate(self.files.items()):
+            path = Path(extract_dir, name)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(data)
+            time.sleep(self.delay)
+            if self.fail and i == 0:
+                raise ConnectionError("interrupted")
+        return sum(len(data) for data in self.files.values())
+
+
+def use_fake_s3(monkeypatch, fetch, etags=None):
+    """Replace the S3 calls of the cache, with every S3 path having the same ETag by default."""
+    monkeypatch.setattr(download_imagery, "fetch_and_extract_zip", fetch)
+    monkeypatch.setattr(
+        download_imagery,
+        "get_s3_etag",
+        lambda s3_path: (etags or {}).get(s3_path, "etag-1"),
+    )
+
+
+def extract_with_cache(tmp_path, project, s3_path=f"{BUCKET}/{KEY}", **kwargs):
+    return extract_zip_with_cache(
+        s3_path,
+        str(tmp_path / project),
+        str(tmp_path / "cache"),
+        1024**3,
+        **kwargs,
+    )
+
+
+def test_cache_concurrent_fetches(monkeypatch, tmp_path):
+    fetch = FakeFetch(expected_files(), delay=0.05)
+    use_fake_s3(monkeypatch, fetch)
+
+    projects = [f"project-{i}" for i in range(4)]
+    with ThreadPoolExecutor(max_workers=len(projects)) as executor:
+        n_bytes = list(
+            executor.map(
+                lambda project: extract_with_cache(tmp_path, project), projects
+            )
+        )
+
+    # The zip file is fetched by one of the projects, and the others wait for it
+    assert fetch.n_calls == 1
+    assert sorted(n_bytes)[:-1] == [0, 0, 0] and max(n_bytes) > 0
+    for project in projects:
+        assert read_files(tmp_path / project) == expected_files()
+
+
+def test_cache_hit_after_miss(monkeypatch, tmp_path):
+    fetch = FakeFetch(expected_files())
+    use_fake_s3(monkeypatch, fetch)
+
+    assert extract_with_cache(tmp_path, "project-1") > 0
+    assert extract_with_cache(tmp_path, "project-2") == 0
+
+    assert fetch.n_calls == 1
+    assert read_files(tmp_path / "project-2") == expected_files()
+    # The files are hardlinked from the cache rather than copied
+    name = "000001/000001_a.JPG"
+    assert Path(tmp_path, "project-1", name).samefile(Path(tmp_path, "project-2", name))
+
+
+def test_cache_eviction_keeps_locked_and_newest_entries(monkeypatch, tmp_path):
+    files = {"000001/000001_a.JPG": bytes(1000)}
+    s3_paths = {name: f"{BUCKET}/missions/{name}.zip" for name in ["old", "mid", "new"]}
+    use_fake_s3(
+        monkeypatch,
+        FakeFetch(files),
+        etags={s3_path: name for name, s3_path in s3_paths.items()},
+    )
+
+    entry_names = {}
+    entries_dir = tmp_path / "cache" / "entries"
+    for age, (name, s3_path) in zip([3000, 2000, 1000], s3_paths.items()):
+        extract_with_cache(tmp_path, name, s3_path)
+        (entry_name,) = {p.name for p in entries_dir.iterdir()} - set(
+            entry_names.values()
+        )
+        entry_names[name] = entry_name
+        complete_file = entries_dir / entry_name / CACHE_COMPLETE_FILE
+        mtime = time.time() - age
+        os.utime(complete_file, (mtime, mtime))
+
+    # Another process is reading the oldest entry, so the next oldest one is evicted instead
+    lock_path = tmp_path / "cache" / "locks" / f"{entry_names['old']}.lock"
+    with open(lock_path, "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        evict_cache_entries(str(tmp_path / "cache"), max_bytes=2000)
+
+    assert {p.name for p in entries_dir.iterdir()} == {
+        entry_names["old"],
+        entry_names["new"],
+    }
+    # Projects keep their hardlinked files when an entry is evicted
+    assert read_files(tmp_path / "mid") == files
+
+
+def test_cache_interrupted_fill(monkeypatch, tmp_path):
+    use_fake_s3(monkeypatch, FakeFetch({"stale.JPG": b"stale"}, fail=True))
+    with pytest.raises(ConnectionError):
+        extract_with_cache(tmp_path, "project-1", extract_mode="download")
+
+    # The entry is never marked complete, so it is not used
+    (entry_dir,) = (tmp_path / "cache" / "entries").iterdir()
+    assert not (entry_dir / CACHE_COMPLETE_FILE).exists()
+
+    # The next attempt refills the entry, which is not blocked by the lock of the failed one
+    fetch = FakeFetch(expected_files())
+    use_fake_s3(monkeypatch, fetch)
+    assert extract_with_cache(tmp_path, "project-2", extract_mode="download") > 0
+
+    assert fetch.n_calls == 1
+    assert (entry_dir / CACHE_COMPLETE_FILE).exists()
+    assert read_files(tmp_path / "project-2") == expected_files()